@@ -2,22 +2,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from core.finance_queries import get_expenses, get_income, get_investments, get_accounts, get_exchange_rates, get_budgets
+from core.finance_queries import get_expenses, get_income, get_investments_total, get_accounts, get_exchange_rates, get_budgets, get_net_worth_series
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
+from core import analytics
 import datetime
 
 # --- Setup ---
 setup_navigation()
 st.title("💰 Financial Overview")
 
-# --- Data Loading ---
-with st.spinner("Loading financial data..."):
-    expenses_df = get_expenses()
-    income_df = get_income()
-    investments_df = get_investments()
-    accounts_df = get_accounts()
-    rates = get_exchange_rates()
-
 # --- Currency Config ---
 display_currency = st.session_state.get('currency', 'EUR')
 conversion_rate = st.session_state.get('conversion_rate', 1.0)
@@ -50,42 +44,38 @@ elif filter_type == "Custom Range":
     start_date = st.sidebar.date_input("Start Date", start_of_year)
     end_date = st.sidebar.date_input("End Date", today)
 
-# Apply Filters
-filtered_expenses = pd.DataFrame()
-filtered_income = pd.DataFrame()
+# --- Data Loading ---
+# Only fetch the window we render: the selected period plus the 6-month cash flow trend.
+trend_start = (pd.Timestamp(today.replace(day=1)) - pd.DateOffset(months=5)).date()
+fetch_start = min(start_date, trend_start)
+fetch_end = max(end_date, today)
 
-if not expenses_df.empty:
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-    expenses_df['amount_eur'] = expenses_df.get('amount_eur', expenses_df['amount']).fillna(expenses_df['amount'])
-    filtered_expenses = expenses_df[(expenses_df['date'].dt.date >= start_date) & (expenses_df['date'].dt.date <= end_date)].copy()
+with st.spinner("Loading financial data..."):
+    expenses_df = get_expenses(fetch_start, fetch_end, columns=['date', 'amount', 'amount_eur', 'description', 'vendor', 'category', 'account'])
+    income_df = get_income(fetch_start, fetch_end, columns=['date', 'amount', 'amount_eur', 'source'])
+    accounts_df = get_accounts()
+    rates = st.session_state.get('exchange_rates') or get_exchange_rates()
 
-if not income_df.empty:
-    income_df['date'] = pd.to_datetime(income_df['date'])
-    income_df['amount_eur'] = income_df.get('amount_eur', income_df['amount']).fillna(income_df['amount'])
-    filtered_income = income_df[(income_df['date'].dt.date >= start_date) & (income_df['date'].dt.date <= end_date)].copy()
+# Apply Filters
+expenses_df = analytics.normalize_transactions(expenses_df)
+income_df = analytics.normalize_transactions(income_df)
+filtered_expenses = analytics.filter_period(expenses_df, start_date, end_date)
+filtered_income = analytics.filter_period(income_df, start_date, end_date)
+# The queries behind these frames, keying the analytics memo for this data version
+overview_key = ('overview', fetch_start, fetch_end, start_date, end_date)
 
 # --- High-Level KPIs (Global / Current State) ---
 # 1. Net Worth (Accounts + Investments)
-total_accounts_eur = 0
-if not accounts_df.empty:
-    for index, row in accounts_df.iterrows():
-        currency = row.get('currency', 'EUR')
-        balance = row['balance']
-        rate = rates.get(currency, 1.0)
-        total_accounts_eur += balance * rate
+total_invested_eur = get_investments_total()
 
-total_invested_eur = 0
-if not investments_df.empty:
-    investments_df['amount_eur'] = investments_df.get('amount_eur', investments_df['amount']).fillna(investments_df['amount'])
-    total_invested_eur = investments_df['amount_eur'].sum()
-
-net_worth_eur = total_accounts_eur + total_invested_eur
+net_worth_eur = analytics.net_worth(accounts_df, rates, total_invested_eur)
 
 # 2. Period Metrics (Based on Filter)
-period_income_eur = filtered_income['amount_eur'].sum() if not filtered_income.empty else 0
-period_expenses_eur = filtered_expenses['amount_eur'].sum() if not filtered_expenses.empty else 0
-period_savings_eur = period_income_eur - period_expenses_eur
-period_savings_rate = (period_savings_eur / period_income_eur * 100) if period_income_eur > 0 else 0
+totals = analytics.period_totals(filtered_expenses, filtered_income)
+period_income_eur = totals['income']
+period_expenses_eur = totals['expenses']
+period_savings_eur = totals['savings']
+period_savings_rate = totals['savings_rate']
 
 # Display KPIs
 col1, col2, col3, col4, col5 = st.columns(5)
@@ -112,33 +102,9 @@ with tab_overview:
     with c1:
         st.subheader("🌊 Cash Flow (Last 6 Months)")
         # Aggregate by month (Global View, ignoring filter for this chart to show trend)
-        cf_data = []
-        today_date = datetime.date.today()
-        for i in range(5, -1, -1):
-            d = today_date - pd.DateOffset(months=i)
-            m = d.month
-            y = d.year
-            label = d.strftime("%b %Y")
-            
-            inc = 0
-            exp = 0
-            
-            if not income_df.empty:
-                mask = (income_df['date'].dt.month == m) & (income_df['date'].dt.year == y)
-                inc = income_df.loc[mask, 'amount_eur'].sum()
-                
-            if not expenses_df.empty:
-                mask = (expenses_df['date'].dt.month == m) & (expenses_df['date'].dt.year == y)
-                exp = expenses_df.loc[mask, 'amount_eur'].sum()
-                
-            cf_data.append({
-                "Month": label,
-                "Income": to_display(inc),
-                "Expenses": to_display(exp),
-                "Net": to_display(inc - exp)
-            })
+        cf_df = analytics.monthly_cash_flow(expenses_df, income_df, months=6, memo_key=overview_key)
+        cf_df[['Income', 'Expenses', 'Net']] = to_display(cf_df[['Income', 'Expenses', 'Net']])
         
-        cf_df = pd.DataFrame(cf_data)
         if not cf_df.empty:
             fig = go.Figure()
             fig.add_trace(go.Bar(x=cf_df['Month'], y=cf_df['Income'], name='Income', marker_color='#238636'))
@@ -168,6 +134,24 @@ with tab_overview:
         else:
             st.text("No recent transactions.")
 
+    st.subheader("📈 Net Worth History")
+    nw_range = st.radio("Range", ["Filter Period", "1 Year", "5 Years", "10 Years"], horizontal=True, label_visibility="collapsed")
+    nw_years = {"1 Year": 1, "5 Years": 5, "10 Years": 10}
+    if nw_range in nw_years:
+        nw_start = today - datetime.timedelta(days=365 * nw_years[nw_range])
+        nw_end = today
+    else:
+        nw_start, nw_end = start_date, end_date
+    
+    nw_df = get_net_worth_series(nw_start, nw_end)
+    if not nw_df.empty:
+        nw_df['net_worth_display'] = to_display(nw_df['net_worth_eur'])
+        fig_nw = px.line(nw_df, x='date', y='net_worth_display', title=f'Net Worth ({display_currency})')
+        fig_nw.update_layout(xaxis_title=None, yaxis_title=None, margin=dict(t=30, b=0, l=0, r=0), height=300)
+        st.plotly_chart(fig_nw, use_container_width=True)
+    else:
+        st.info("No balance history yet. Snapshots are recorded whenever an account balance changes.")
+
 # --- Tab 2: Analysis ---
 with tab_analysis:
     col1, col2 = st.columns(2)
@@ -175,8 +159,9 @@ with tab_analysis:
         st.subheader("Spending Breakdown")
         if not filtered_expenses.empty:
             # Category Pie Chart
-            filtered_expenses['amount_display'] = to_display(filtered_expenses['amount_eur'])
-            fig_cat = px.pie(filtered_expenses, values='amount_display', names='category', title=f'Expenses by Category ({display_currency})', hole=0.4)
+            cat_split = analytics.category_split(filtered_expenses, memo_key=overview_key)
+            cat_split['amount_display'] = to_display(cat_split['amount_eur'])
+            fig_cat = px.pie(cat_split, values='amount_display', names='category', title=f'Expenses by Category ({display_currency})', hole=0.4)
             st.plotly_chart(fig_cat, use_container_width=True)
         else:
             st.info("No expense data for this period.")
@@ -184,15 +169,17 @@ with tab_analysis:
     with col2:
         st.subheader("Income Breakdown")
         if not filtered_income.empty:
-            filtered_income['amount_display'] = to_display(filtered_income['amount_eur'])
-            fig_inc = px.bar(filtered_income, x='source', y='amount_display', title=f'Income by Source ({display_currency})', color='source')
+            source_split = analytics.category_split(filtered_income, by='source', memo_key=overview_key)
+            source_split['amount_display'] = to_display(source_split['amount_eur'])
+            fig_inc = px.bar(source_split, x='source', y='amount_display', title=f'Income by Source ({display_currency})', color='source')
             st.plotly_chart(fig_inc, use_container_width=True)
         else:
             st.info("No income data for this period.")
 
     st.subheader("Daily Spending Trend")
     if not filtered_expenses.empty:
-        daily_spend = filtered_expenses.groupby('date')['amount_display'].sum().reset_index()
+        daily_spend = analytics.daily_totals(filtered_expenses, memo_key=overview_key)
+        daily_spend['amount_display'] = to_display(daily_spend['amount_eur'])
         fig_trend = px.area(daily_spend, x='date', y='amount_display', title=f'Daily Spending Trend ({display_currency})', line_shape='spline')
         st.plotly_chart(fig_trend, use_container_width=True)
 
@@ -201,27 +188,11 @@ with tab_insights:
     st.subheader("🌊 Cash Flow Visualization")
     if not filtered_expenses.empty and not filtered_income.empty:
         # Sankey Logic
-        inc_agg = filtered_income.groupby('source')['amount_eur'].sum().reset_index()
-        exp_agg = filtered_expenses.groupby('category')['amount_eur'].sum().reset_index()
-        
-        income_sources = inc_agg['source'].tolist()
-        expense_cats = exp_agg['category'].tolist()
-        all_nodes = income_sources + ["Budget"] + expense_cats
-        node_indices = {label: i for i, label in enumerate(all_nodes)}
-        
-        sources = []
-        targets = []
-        values = []
-        
-        for _, row in inc_agg.iterrows():
-            sources.append(node_indices[row['source']])
-            targets.append(node_indices["Budget"])
-            values.append(to_display(row['amount_eur']))
-            
-        for _, row in exp_agg.iterrows():
-            sources.append(node_indices["Budget"])
-            targets.append(node_indices[row['category']])
-            values.append(to_display(row['amount_eur']))
+        flows = analytics.sankey_flows(filtered_income, filtered_expenses, memo_key=overview_key)
+        all_nodes = flows['nodes']
+        sources = flows['sources']
+        targets = flows['targets']
+        values = [to_display(v) for v in flows['values']]
             
         fig_sankey = go.Figure(data=[go.Sankey(
             node=dict(pad=15, thickness=20, line=dict(color="black", width=0.5), label=all_nodes, color="blue"),
@@ -236,9 +207,7 @@ with tab_insights:
     
     st.subheader("🏆 Top Merchants")
     if not filtered_expenses.empty:
-        if 'vendor' not in filtered_expenses.columns: filtered_expenses['vendor'] = None
-        filtered_expenses['merchant_display'] = filtered_expenses['vendor'].fillna(filtered_expenses['description'].str[:20])
-        top_merchants = filtered_expenses.groupby('merchant_display')['amount_eur'].sum().nlargest(10).reset_index()
+        top_merchants = analytics.top_merchants(filtered_expenses, n=10, memo_key=overview_key)
         top_merchants['amount_display'] = to_display(top_merchants['amount_eur'])
         
         fig_merch = px.bar(top_merchants, x='amount_display', y='merchant_display', orientation='h', title=f'Top Spending Destinations ({display_currency})', color='amount_display', color_continuous_scale='Viridis')
@@ -253,17 +222,15 @@ with tab_budget:
     budgets_df = get_budgets(budget_month)
     
     if not budgets_df.empty and not filtered_expenses.empty:
-        expense_by_cat = filtered_expenses.groupby('category')['amount_eur'].sum().reset_index()
-        merged = pd.merge(budgets_df, expense_by_cat, on='category', how='left')
-        merged['amount_eur'] = merged['amount_eur'].fillna(0)
+        merged = analytics.budget_vs_actual(budgets_df, filtered_expenses, conversion_rate, memo_key=overview_key)
         
-        for index, row in merged.iterrows():
+        for _, row in merged.iterrows():
             cat = row['category']
-            budget = row['budget_amount']
-            spent = to_display(row['amount_eur'])
+            budget = row['budget']
+            spent = row['spent']
             
             if budget > 0:
-                pct = (spent / budget) * 100
+                pct = row['progress']
                 col_b1, col_b2 = st.columns([3, 1])
                 with col_b1:
                     st.write(f"**{cat}**")
@@ -272,3 +239,5 @@ with tab_budget:
                     st.caption(f"{spent:.0f} / {budget:.0f} ({int(pct)}%)")
     else:
         st.info(f"No budgets set for {budget_month} or no expenses found.")
+
+finish_page_run()
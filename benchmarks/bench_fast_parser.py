@@ -0,0 +1,56 @@
+"""
+Benchmark: rule-based fast path coverage and latency for Smart Ingestor inputs.
+
+Runs every line of a notification corpus through `core.fast_parser.fast_parse` and
+reports how many would skip the LLM at the configured confidence threshold, which
+template matched, and the per-message parse latency.
+
+    python benchmarks/bench_fast_parser.py [corpus.txt]
+"""
+import os
+import sys
+import time
+import statistics
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.fast_parser import FAST_PATH_MIN_CONFIDENCE, fast_parse
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "notification_corpus.txt")
+RUNS = int(os.environ.get("LIFEOS_BENCH_RUNS", "200"))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        corpus = [line.strip() for line in f if line.strip()]
+
+    parsers = Counter()
+    covered = 0
+    for text in corpus:
+        result = fast_parse(text)
+        if result and result['confidence'] >= FAST_PATH_MIN_CONFIDENCE:
+            covered += 1
+            parsers[result['parser']] += 1
+        else:
+            parsers['llm fallback'] += 1
+
+    timings = []
+    for _ in range(RUNS):
+        for text in corpus:
+            start = time.perf_counter()
+            fast_parse(text)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+
+    print(f"Corpus: {len(corpus)} messages ({path})")
+    print(f"Fast-path coverage: {covered}/{len(corpus)} ({covered / len(corpus):.0%}) at confidence >= {FAST_PATH_MIN_CONFIDENCE}")
+    for parser, count in parsers.most_common():
+        print(f"  {parser:<22} {count:>4}")
+    print(f"Parse latency: p50 {statistics.median(timings):.1f} us, "
+          f"p95 {timings[int(len(timings) * 0.95)]:.1f} us, max {timings[-1]:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
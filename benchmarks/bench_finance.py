@@ -0,0 +1,276 @@
+"""
+Benchmark: finance hot paths on synthetic ledgers, tracked against a stored baseline.
+
+Builds a ledger per scale with `benchmarks/synthetic_ledger.py` in the local SQLite
+backend (no Supabase project needed) and times:
+  - loaders: the `core.finance_queries` reads the pages issue, uncached;
+  - pages:   the aggregation the Overview, Expenses and Budget pages run on those frames;
+  - writes:  loading the ledger and a 5,000-row `add_expenses_bulk`.
+For each case it reports the median wall time over LIFEOS_BENCH_RUNS runs and the peak
+Python heap (tracemalloc) of one run, compared with `benchmarks/baselines/finance.json`.
+
+    python benchmarks/bench_finance.py [--scales 1k,100k] [--save-baseline] [--check]
+
+--db-dir keeps each generated ledger in a SQLite file and reuses it on the next run,
+which saves minutes at the 1m scale. --check exits non-zero if a case regressed; the
+single-run ledger load is reported but not checked.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import streamlit as st
+
+import core.finance_queries as fq
+from core import analytics
+from core.local_storage import LocalClient, LocalDatabase
+from benchmarks.synthetic_ledger import SCALES, generate_ledger, load_ledger
+
+RUNS = int(os.environ.get("LIFEOS_BENCH_RUNS", "5"))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "finance.json")
+# A case regresses when it is this much slower or larger than its baseline.
+REGRESSION_TOLERANCE = 0.25
+# Differences below these are scheduler/allocator noise, whatever the ratio: ms-scale
+# cases at 1k swing by several ms between identical runs on a shared machine.
+MIN_WALL_DELTA_MS = 10.0
+MIN_PEAK_DELTA_MB = 0.5
+# Timed once per generated ledger rather than over RUNS runs; reported, but too noisy for --check.
+UNCHECKED_CASES = {'writes.load_ledger'}
+BENCH_USER = {"email": "bench@lifeos.local", "password": "bench-password"}
+BULK_WRITE_ROWS = 5000
+# Synthetic ledgers end on this day so every run sees the same data.
+LEDGER_END = datetime.date(2025, 12, 31)
+
+
+def _uncached(func):
+    """The function under a @cached_query/@memoized decorator, so every run does the work."""
+    return getattr(func, '__wrapped__', func)
+
+
+def open_ledger(scale, db_dir=None):
+    """A client for a user owning the `scale` ledger (generated unless already on disk)."""
+    path = os.path.join(db_dir, f"ledger_{scale}.sqlite") if db_dir else ":memory:"
+    db = LocalDatabase(path)
+    anon = LocalClient(db)
+    try:
+        auth = anon.auth.sign_in_with_password(BENCH_USER)
+        return LocalClient.from_token(db, auth.session.access_token), auth.user, None
+    except ValueError:
+        auth = anon.auth.sign_up(BENCH_USER)
+
+    client = LocalClient.from_token(db, auth.session.access_token)
+    ledger = generate_ledger(SCALES[scale], years=10, end_date=LEDGER_END)
+    started = time.perf_counter()
+    load_ledger(client, ledger)
+    return client, auth.user, (time.perf_counter() - started) * 1000
+
+
+def loader_cases(today):
+    trend_start = (pd.Timestamp(today.replace(day=1)) - pd.DateOffset(months=5)).date()
+    month = today.strftime("%Y-%m")
+    dashboard_expense_columns = ['date', 'amount', 'amount_eur', 'description', 'vendor', 'category', 'account']
+
+    def investments_total():
+        return sum(chunk['amount_eur'].fillna(chunk['amount']).sum()
+                   for chunk in fq.iter_transactions("investments", columns=['amount', 'amount_eur']))
+
+    return {
+        'loaders.get_expenses.all': lambda: _uncached(fq.get_expenses)(),
+        'loaders.get_expenses.dashboard': lambda: _uncached(fq.get_expenses)(trend_start, today, columns=dashboard_expense_columns),
+        'loaders.get_income.dashboard': lambda: _uncached(fq.get_income)(trend_start, today, columns=['date', 'amount', 'amount_eur', 'source']),
+        'loaders.get_investments': lambda: _uncached(fq.get_investments)(),
+        'loaders.investments_total': investments_total,
+        'loaders.get_accounts': lambda: _uncached(fq.get_accounts)(),
+        'loaders.get_budgets': lambda: _uncached(fq.get_budgets)(month),
+        'loaders.get_transaction_months': lambda: _uncached(fq.get_transaction_months)("expenses"),
+        'loaders.get_net_worth_series.1y': lambda: _uncached(fq.get_net_worth_series)(today - datetime.timedelta(days=365), today),
+    }
+
+
+def page_cases(today):
+    """Aggregations on frames loaded once up front, as the pages run them after loading."""
+    trend_start = (pd.Timestamp(today.replace(day=1)) - pd.DateOffset(months=5)).date()
+    year_start = datetime.date(today.year, 1, 1)
+    month_start = today.replace(day=1)
+    expenses = _uncached(fq.get_expenses)(min(trend_start, year_start), today)
+    income = _uncached(fq.get_income)(min(trend_start, year_start), today)
+    budgets = _uncached(fq.get_budgets)(today.strftime("%Y-%m"))
+    accounts = _uncached(fq.get_accounts)()
+    categories = _uncached(fq.get_categories)("expense")['name'].tolist()
+    rates = fq.get_exchange_rates()
+    a = {name: _uncached(getattr(analytics, name)) for name in (
+        'normalize_transactions', 'filter_period', 'period_totals', 'monthly_cash_flow', 'category_split',
+        'daily_totals', 'sankey_flows', 'top_merchants', 'budget_vs_actual', 'net_worth')}
+
+    def overview():
+        exp = a['normalize_transactions'](expenses)
+        inc = a['normalize_transactions'](income)
+        period_exp = a['filter_period'](exp, year_start, today)
+        period_inc = a['filter_period'](inc, year_start, today)
+        a['net_worth'](accounts, rates)
+        a['period_totals'](period_exp, period_inc)
+        a['monthly_cash_flow'](exp, inc, months=6, end_date=today)
+        a['category_split'](period_exp)
+        a['category_split'](period_inc, by='source')
+        a['daily_totals'](period_exp)
+        a['sankey_flows'](period_inc, period_exp)
+        a['top_merchants'](period_exp, n=10)
+        a['budget_vs_actual'](budgets, period_exp)
+
+    def expenses_page():
+        month = a['filter_period'](a['normalize_transactions'](expenses), month_start, today)
+        a['daily_totals'](month)
+        a['category_split'](month)
+
+    def budget_page():
+        month = a['filter_period'](a['normalize_transactions'](expenses), month_start, today)
+        a['budget_vs_actual'](budgets, month, 1.0, categories=categories)
+
+    return {'pages.overview': overview, 'pages.expenses': expenses_page, 'pages.budget': budget_page}
+
+
+def write_cases(today):
+    expense_categories = _uncached(fq.get_categories)("expense")
+    accounts = _uncached(fq.get_accounts)()
+    rows = pd.DataFrame({
+        'date': [today - datetime.timedelta(days=i % 365) for i in range(BULK_WRITE_ROWS)],
+        'amount': [5.0 + i % 50 for i in range(BULK_WRITE_ROWS)],
+        'currency': 'EUR',
+        'category_id': [expense_categories['id'].iloc[i % len(expense_categories)] for i in range(BULK_WRITE_ROWS)],
+        'account_id': accounts['id'].iloc[0],
+        'description': 'bench',
+        'payment_method': 'card',
+    })
+    rates = fq.get_exchange_rates()
+    return {f'writes.add_expenses_bulk.{BULK_WRITE_ROWS // 1000}k': lambda: fq.add_expenses_bulk(rows, rates=rates)}
+
+
+def undo_bench_writes(client):
+    """Remove the rows `write_cases` added and restore the balances, so a reused ledger stays as generated."""
+    rows = client.table("expenses").delete().eq("description", "bench").execute().data
+    for account_id in {r['account_id'] for r in rows}:
+        total = sum(r['amount_eur'] for r in rows if r['account_id'] == account_id)
+        client.rpc("adjust_account_balance", {"p_account_id": account_id, "p_amount_eur_delta": total}).execute()
+
+
+def measure(func, runs=RUNS):
+    """(median wall ms over `runs`, peak traced MB of one extra run)."""
+    timings = []
+    for _ in range(runs):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1024 / 1024
+
+
+def run_scale(scale, db_dir=None, runs=RUNS):
+    client, user, load_ms = open_ledger(scale, db_dir)
+    fq.get_authenticated_client = lambda: client
+    st.session_state['user'] = user
+
+    results = {}
+    if load_ms is not None:
+        results['writes.load_ledger'] = {'wall_ms': round(load_ms, 2), 'peak_mb': None}
+    # Writes run last: each run adds rows the read cases would otherwise see
+    for cases in (loader_cases(LEDGER_END), page_cases(LEDGER_END), write_cases(LEDGER_END)):
+        for name, func in cases.items():
+            wall_ms, peak_mb = measure(func, runs)
+            results[name] = {'wall_ms': round(wall_ms, 2), 'peak_mb': round(peak_mb, 2)}
+    undo_bench_writes(client)
+    client.db.close()
+    return results
+
+
+def _regressed(current, baseline, min_delta):
+    if current is None or baseline is None:
+        return False
+    return current > baseline * (1 + REGRESSION_TOLERANCE) and current - baseline > min_delta
+
+
+def report(scale, results, baseline):
+    """Print one scale's results against its baseline; returns the names of regressed cases."""
+    regressions = []
+    print(f"\n== {scale} ({SCALES[scale]:,} transactions) ==")
+    print(f"{'case':<38} {'wall ms':>10} {'vs base':>8} {'peak MB':>9} {'vs base':>8}")
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        cells = []
+        for key, min_delta in (('wall_ms', MIN_WALL_DELTA_MS), ('peak_mb', MIN_PEAK_DELTA_MB)):
+            value, reference = result[key], base.get(key)
+            change = f"{(value / reference - 1) * 100:+.0f}%" if value is not None and reference else "–"
+            cells.append((f"{value:,.1f}" if value is not None else "–", change))
+            if name not in UNCHECKED_CASES and _regressed(value, reference, min_delta):
+                regressions.append(f"{scale} {name} {key}")
+        flag = "  REGRESSED" if any(r.startswith(f"{scale} {name} ") for r in regressions) else ""
+        print(f"{name:<38} {cells[0][0]:>10} {cells[0][1]:>8} {cells[1][0]:>9} {cells[1][1]:>8}{flag}")
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {'results': {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(all_results, runs=RUNS, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline['meta'] = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'pandas': pd.__version__,
+        'runs': runs,
+        'recorded': datetime.date.today().isoformat(),
+    }
+    baseline['results'].update(all_results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default="1k,100k", help=f"comma separated, from {', '.join(SCALES)}")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--db-dir", help="keep generated ledgers here and reuse them")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any case regressed")
+    args = parser.parse_args()
+
+    if args.db_dir:
+        os.makedirs(args.db_dir, exist_ok=True)
+    baseline = load_baseline()
+    all_results, regressions = {}, []
+    for scale in args.scales.split(","):
+        results = run_scale(scale.strip(), args.db_dir, args.runs)
+        all_results[scale.strip()] = results
+        regressions += report(scale.strip(), results, baseline['results'].get(scale.strip(), {}))
+
+    if args.save_baseline:
+        save_baseline(all_results, args.runs)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
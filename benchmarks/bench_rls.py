@@ -0,0 +1,191 @@
+"""
+Benchmark: per-row `auth.uid()` RLS policies against the initPlan form, on Postgres.
+
+Builds a scratch `rls_bench` schema with an `expenses` table of --rows rows (1M by default)
+spread over --users users, and a `uid()` function with the same body as Supabase's
+`auth.uid()` (reads the JWT claims setting on every call). Then, as a non-owner role with
+the claims of the first user, it times the reads the app issues under each combination of
+  - policy: `uid() = user_id` (per row) or `(select uid()) = user_id` (initPlan);
+  - index:  none, or (user_id, date, id) as in database/migration_indexes.sql.
+Each case reports the median EXPLAIN (ANALYZE, TIMING OFF) execution time over --runs runs.
+The data is generated with setseed(), so reruns on the same server are comparable.
+
+    python benchmarks/bench_rls.py --dsn postgresql://localhost/lifeos [--rows 1000000]
+        [--users 1] [--runs 5] [--json results.json]
+
+Needs psycopg (`pip install "psycopg[binary]"`) and a superuser connection: the reads run
+as the `rls_bench_reader` role it creates, because RLS does not apply to the table owner.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+SCHEMA_NAME = "rls_bench"
+READER_ROLE = "rls_bench_reader"
+RUNS = int(os.environ.get("LIFEOS_BENCH_RUNS", "5"))
+
+POLICIES = {
+    'per_row': "uid() = user_id",
+    'initplan': "(select uid()) = user_id",
+}
+INDEXES = {
+    'no_index': None,
+    'user_date_id': "CREATE INDEX expenses_user_date_id ON expenses(user_id, date, id)",
+}
+# The shapes the Expenses and Overview pages issue, as the reader sees them (RLS adds the user filter).
+QUERIES = {
+    'count_all': "SELECT count(*) FROM expenses",
+    'sum_year': "SELECT sum(amount) FROM expenses WHERE date >= DATE '2025-01-01'",
+    'first_page': "SELECT * FROM expenses ORDER BY date DESC, id DESC LIMIT 1000",
+    'month_page': ("SELECT * FROM expenses WHERE date >= DATE '2025-12-01' AND date <= DATE '2025-12-31' "
+                   "ORDER BY date DESC, id DESC LIMIT 1000"),
+}
+
+SETUP = f"""
+DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE;
+CREATE SCHEMA {SCHEMA_NAME};
+SET search_path = {SCHEMA_NAME};
+
+-- Same body as Supabase's auth.uid()
+CREATE FUNCTION uid() RETURNS uuid LANGUAGE sql STABLE AS $$
+    SELECT nullif(coalesce(current_setting('request.jwt.claim.sub', true),
+                           (current_setting('request.jwt.claims', true)::jsonb ->> 'sub')), '')::uuid
+$$;
+
+CREATE TABLE expenses (
+    id              BIGINT PRIMARY KEY,
+    date            DATE NOT NULL,
+    amount          NUMERIC(12,2) NOT NULL,
+    category_id     BIGINT,
+    description     TEXT,
+    user_id         UUID NOT NULL
+);
+"""
+
+
+def create_reader(cur):
+    cur.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (READER_ROLE,))
+    if cur.fetchone() is None:
+        cur.execute(f"CREATE ROLE {READER_ROLE} NOLOGIN")
+    cur.execute(f"GRANT USAGE ON SCHEMA {SCHEMA_NAME} TO {READER_ROLE}")
+    cur.execute(f"GRANT SELECT ON ALL TABLES IN SCHEMA {SCHEMA_NAME} TO {READER_ROLE}")
+    cur.execute(f"GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA {SCHEMA_NAME} TO {READER_ROLE}")
+
+
+def load(pg, rows, users):
+    """Create the schema and `rows` expenses over `users` users; returns the first user's id."""
+    user_ids = [str(uuid.UUID(int=n + 1)) for n in range(users)]
+    with pg.cursor() as cur:
+        cur.execute(SETUP)
+        cur.execute("SELECT setseed(0)")
+        cur.execute(
+            """
+            INSERT INTO expenses (id, date, amount, category_id, description, user_id)
+            SELECT i, DATE '2016-01-01' + (i %% 3653), round((random() * 200)::numeric, 2),
+                   1 + i %% 20, 'expense ' || i, (%s::uuid[])[1 + i %% %s]
+            FROM generate_series(1, %s) AS i
+            """,
+            (user_ids, users, rows),
+        )
+        cur.execute("ALTER TABLE expenses ENABLE ROW LEVEL SECURITY")
+        create_reader(cur)
+        cur.execute("ANALYZE expenses")
+    pg.commit()
+    return user_ids[0]
+
+
+def configure(pg, policy, index):
+    with pg.cursor() as cur:
+        cur.execute(f"SET search_path = {SCHEMA_NAME}")
+        cur.execute("DROP POLICY IF EXISTS own_expenses ON expenses")
+        cur.execute(f"CREATE POLICY own_expenses ON expenses FOR SELECT USING ({POLICIES[policy]})")
+        cur.execute("DROP INDEX IF EXISTS expenses_user_date_id")
+        if INDEXES[index]:
+            cur.execute(INDEXES[index])
+        cur.execute("ANALYZE expenses")
+    pg.commit()
+
+
+def time_query(pg, sql, user_id, runs):
+    """(median execution ms over `runs`, scan node on expenses) of `sql` run as the reader for `user_id`."""
+    timings, node = [], None
+    claims = json.dumps({'sub': user_id, 'role': 'authenticated'})
+    for n in range(runs + 1):
+        with pg.cursor() as cur:
+            cur.execute(f"SET LOCAL search_path = {SCHEMA_NAME}")
+            cur.execute(f"SET LOCAL ROLE {READER_ROLE}")
+            cur.execute("SELECT set_config('request.jwt.claims', %s, true)", (claims,))
+            cur.execute("EXPLAIN (ANALYZE, TIMING OFF, FORMAT JSON) " + sql)
+            result = cur.fetchone()[0]
+        pg.rollback()
+        document = result if isinstance(result, list) else json.loads(result)
+        if n == 0:  # warm-up run
+            node = _scan_node(document[0]['Plan'])
+            continue
+        timings.append(document[0]['Execution Time'])
+    return statistics.median(timings), node
+
+
+def _scan_node(plan):
+    """The scan on `expenses` in a plan tree, e.g. 'Seq Scan' or 'Index Scan Backward'."""
+    if 'Relation Name' in plan:
+        return plan['Node Type'] + (" Backward" if plan.get('Scan Direction') == 'Backward' else "")
+    for child in plan.get('Plans', []):
+        found = _scan_node(child)
+        if found:
+            return found
+    return None
+
+
+def report(results):
+    print(f"\n{'query':<12} {'index':<14} {'per_row ms':>11} {'initplan ms':>12} {'speedup':>8}  scan")
+    for query in QUERIES:
+        for index in INDEXES:
+            per_row, scan = results[(query, index, 'per_row')]
+            initplan, _ = results[(query, index, 'initplan')]
+            speedup = f"{per_row / initplan:.1f}x" if initplan else "–"
+            print(f"{query:<12} {index:<14} {per_row:>11.2f} {initplan:>12.2f} {speedup:>8}  {scan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.environ.get("LIFEOS_PG_DSN"), help="scratch Postgres (or LIFEOS_PG_DSN)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1, help="users the rows are spread over; the reader is the first")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or LIFEOS_PG_DSN) is required")
+    try:
+        import psycopg
+    except ImportError:
+        sys.exit('bench_rls needs psycopg: pip install "psycopg[binary]"')
+
+    with psycopg.connect(args.dsn) as pg:
+        started = time.perf_counter()
+        user_id = load(pg, args.rows, args.users)
+        print(f"Loaded {args.rows:,} expenses over {args.users} user(s) in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        for index in INDEXES:
+            for policy in POLICIES:
+                configure(pg, policy, index)
+                for query, sql in QUERIES.items():
+                    results[(query, index, policy)] = time_query(pg, sql, user_id, args.runs)
+        report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'rows': args.rows, 'users': args.users, 'runs': args.runs,
+                       'results': [{'query': q, 'index': i, 'policy': p, 'execution_ms': ms, 'scan': scan}
+                                   for (q, i, p), (ms, scan) in results.items()]}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: Supabase client per query (legacy) vs pooled token-keyed clients.
+
+Simulates the queries issued by one Overview (app.py) load and reports, for each
+strategy, the number of HTTP requests, new TCP connections, TLS handshakes and
+wall-clock latency.
+
+Requires `.streamlit/secrets.toml` and a test user:
+    LIFEOS_BENCH_EMAIL=... LIFEOS_BENCH_PASSWORD=... python benchmarks/bench_supabase_client.py
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import streamlit as st
+from supabase import create_client
+
+import core.finance_queries as fq
+from core.supabase_client import init_supabase, get_authenticated_client
+
+RUNS = int(os.environ.get("LIFEOS_BENCH_RUNS", "5"))
+
+counters = {"requests": 0, "tcp_connects": 0, "tls_handshakes": 0}
+_original_send = httpx.Client.send
+
+
+def _trace(event_name, info):
+    if event_name == "connection.connect_tcp.complete":
+        counters["tcp_connects"] += 1
+    elif event_name == "connection.start_tls.complete":
+        counters["tls_handshakes"] += 1
+
+
+def _counting_send(self, request, **kwargs):
+    counters["requests"] += 1
+    request.extensions["trace"] = _trace
+    return _original_send(self, request, **kwargs)
+
+
+def legacy_authenticated_client():
+    """The pre-pool behaviour: a brand new client (and connection) per call."""
+    client = create_client(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+    if 'access_token' in st.session_state:
+        client.postgrest.auth(st.session_state['access_token'])
+    return client
+
+
+def _uncached(func):
+    """The function under its @cached_query decorator, so every load sends its requests."""
+    return getattr(func, '__wrapped__', func)
+
+
+def dashboard_load():
+    """
+    The query sequence of navigation + app.py on one rerun, with the data cache bypassed:
+    this measures client construction and connection reuse, not cache hits.
+    """
+    _uncached(fq.get_user_profile)()
+    fq.get_exchange_rates()
+    _uncached(fq.get_expenses)()
+    _uncached(fq.get_income)()
+    _uncached(fq.get_investments)()
+    _uncached(fq.get_accounts)()
+    fq.get_exchange_rates()
+    _uncached(fq.get_budgets)(time.strftime("%Y-%m"))
+
+
+def measure(label, client_factory):
+    fq.get_authenticated_client = client_factory
+    latencies = []
+    totals = {k: 0 for k in counters}
+    for _ in range(RUNS):
+        for k in counters:
+            counters[k] = 0
+        start = time.perf_counter()
+        dashboard_load()
+        latencies.append((time.perf_counter() - start) * 1000)
+        for k in counters:
+            totals[k] += counters[k]
+
+    print(f"{label:<10} "
+          f"requests/load={totals['requests'] / RUNS:5.1f}  "
+          f"tcp/load={totals['tcp_connects'] / RUNS:5.1f}  "
+          f"tls/load={totals['tls_handshakes'] / RUNS:5.1f}  "
+          f"median={statistics.median(latencies):8.1f} ms  "
+          f"max={max(latencies):8.1f} ms")
+
+
+def main():
+    email = os.environ.get("LIFEOS_BENCH_EMAIL")
+    password = os.environ.get("LIFEOS_BENCH_PASSWORD")
+    if not email or not password:
+        print("Set LIFEOS_BENCH_EMAIL and LIFEOS_BENCH_PASSWORD to a test user.")
+        return
+
+    auth = init_supabase().auth.sign_in_with_password({"email": email, "password": password})
+    st.session_state['user'] = auth.user
+    st.session_state['access_token'] = auth.session.access_token
+
+    httpx.Client.send = _counting_send
+    try:
+        print(f"Dashboard load, {RUNS} runs each")
+        measure("legacy", legacy_authenticated_client)
+        measure("pooled", get_authenticated_client)
+    finally:
+        httpx.Client.send = _original_send
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Index advisor: every `core.finance_queries` query shape through EXPLAIN ANALYZE on Postgres.
+
+Generates a synthetic ledger (`benchmarks/synthetic_ledger.py`) in the local backend, copies
+it into a scratch schema of a local Postgres (once per tenant, so user_id filters are
+selective the way they are in production), then runs the loaders the pages use against the
+local backend while recording the SQL each request compiles to. Every distinct shape is
+replayed with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and plans that sequentially scan more
+than SEQ_SCAN_MIN_ROWS rows are flagged.
+
+    python benchmarks/index_advisor.py --dsn postgresql://localhost/lifeos [--scale 100k]
+        [--tenants 4] [--without-indexes] [--check]
+
+Needs psycopg (`pip install "psycopg[binary]"`). Everything is created in the `index_advisor`
+schema, which is dropped first. Indexes come from database/migration_indexes.sql unless
+--without-indexes is given. RLS is replayed as the `user_id = ...` predicate the local
+backend adds, i.e. the plan a policy produces once `auth.uid()` is a constant. RPCs
+(record_*, net_worth_series) run server-side and are not covered.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import streamlit as st
+
+import core.finance_queries as fq
+from core.local_storage import JSON_COLUMNS, LocalClient, LocalDatabase, LocalQuery
+from benchmarks.bench_finance import BENCH_USER, LEDGER_END, _uncached, loader_cases
+from benchmarks.synthetic_ledger import SCALES, generate_ledger, load_ledger
+
+SCHEMA_NAME = "index_advisor"
+INDEX_MIGRATION = os.path.join(os.path.dirname(__file__), "..", "database", "migration_indexes.sql")
+# Tables the finance queries read, copied into Postgres.
+TABLES = ['exchange_rates', 'categories', 'accounts', 'expenses', 'income', 'investments',
+          'budgets', 'saving_goals', 'balance_history']
+# Id columns shifted per tenant copy so every tenant's rows keep their own keys.
+ID_COLUMNS = {'id', 'category_id', 'account_id', 'source_account_id', 'destination_account_id'}
+TENANT_ID_STRIDE = 10 ** 9
+# A sequential scan reading fewer rows than this is cheaper than any index; not flagged.
+SEQ_SCAN_MIN_ROWS = 1000
+
+
+# --- Capturing query shapes ---
+class RecordingQuery(LocalQuery):
+    """A local query that records the SQL of each select before running it."""
+
+    def __init__(self, client, table):
+        super().__init__(client, table)
+        self.recorder = client.recorder
+
+    def execute(self):
+        if self.action == 'select':
+            sql, params = self.select_sql()
+            self.recorder.record(self.table, sql, params)
+        return super().execute()
+
+
+class RecordingClient(LocalClient):
+    def __init__(self, db, user_id=None, recorder=None):
+        super().__init__(db, user_id)
+        self.recorder = recorder
+
+    def table(self, name):
+        return RecordingQuery(self, name)
+
+
+class ShapeRecorder:
+    """Distinct (case, SQL) pairs with the parameters of their first request and a request count."""
+
+    def __init__(self):
+        self.case = None
+        self.shapes = {}
+
+    def record(self, table, sql, params):
+        shape = self.shapes.setdefault((self.case, sql), {'case': self.case, 'table': table, 'sql': sql,
+                                                          'params': list(params), 'requests': 0})
+        shape['requests'] += 1
+
+
+def advisor_cases(today):
+    """The benchmark loaders plus the remaining read paths of `core.finance_queries`."""
+    cases = loader_cases(today)
+    cases.update({
+        'loaders.get_categories': lambda: _uncached(fq.get_categories)("expense"),
+        'loaders.get_saving_goals': lambda: _uncached(fq.get_saving_goals)(),
+        'loaders.get_exchange_rates': lambda: _uncached(fq.get_exchange_rates)(),
+        'loaders.iter_rows_after': lambda: sum(len(c) for c in fq.iter_rows_after("expenses", columns=['amount'])),
+    })
+    return cases
+
+
+def capture_shapes(db, user, today=LEDGER_END):
+    recorder = ShapeRecorder()
+    client = RecordingClient(db, user.id, recorder)
+    fq.get_authenticated_client = lambda: client
+    st.session_state['user'] = user
+    for name, func in advisor_cases(today).items():
+        recorder.case = name
+        func()
+    return list(recorder.shapes.values())
+
+
+# --- Postgres copy ---
+def _pg_type(table, column, sqlite_type):
+    if column == 'user_id':
+        return 'UUID'
+    if column == 'id':
+        return 'BIGINT PRIMARY KEY'
+    if column in ('date', 'deadline'):
+        return 'DATE'
+    if column in ('created_at', 'updated_at'):
+        return 'TIMESTAMPTZ'
+    if column in JSON_COLUMNS:
+        return 'JSONB'
+    if table == 'exchange_rates' and column == 'currency_code':
+        return 'TEXT PRIMARY KEY'
+    return {'INTEGER': 'BIGINT', 'REAL': 'NUMERIC'}.get(sqlite_type.upper(), 'TEXT')
+
+
+def copy_ledger(pg, db, tenants, with_indexes):
+    """Recreate the finance tables in SCHEMA_NAME and fill them with `tenants` copies of the ledger."""
+    tenant_ids = [str(uuid.uuid4()) for _ in range(tenants - 1)]
+    with pg.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA_NAME}")
+        cur.execute(f"SET search_path = {SCHEMA_NAME}, public")
+        for table in TABLES:
+            with db.transaction() as conn:
+                info = list(conn.execute(f"PRAGMA table_info({table})"))
+                columns = [row['name'] for row in info]
+                rows = [tuple(row) for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table}")]
+            ddl = ", ".join(f'"{row["name"]}" {_pg_type(table, row["name"], row["type"])}' for row in info)
+            cur.execute(f"CREATE TABLE {table} ({ddl})")
+
+            shifted = [i for i, col in enumerate(columns) if col in ID_COLUMNS]
+            owner = columns.index('user_id') if 'user_id' in columns else None
+            with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                # Public tables are shared, not per tenant
+                for n, tenant in enumerate(tenant_ids if owner is not None else [], start=1):
+                    for row in rows:
+                        row = list(row)
+                        row[owner] = tenant
+                        for i in shifted:
+                            if row[i] is not None:
+                                row[i] += n * TENANT_ID_STRIDE
+                        copy.write_row(row)
+        if with_indexes:
+            with open(INDEX_MIGRATION, encoding="utf-8") as f:
+                cur.execute(f.read())
+        cur.execute("ANALYZE")
+    pg.commit()
+
+
+# --- EXPLAIN ---
+def to_postgres(sql):
+    """Local backend SQL in Postgres syntax: `?` placeholders, and LIKE/GLOB for ilike/like."""
+    sql = sql.replace(" LIKE ?", " ILIKE ?").replace(" GLOB ?", " LIKE ?")
+    return sql.replace("?", "%s")
+
+
+def _scans(plan):
+    """Every node of a JSON plan tree."""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _scans(child)
+
+
+def explain(pg, shape):
+    with pg.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + to_postgres(shape['sql']), shape['params'])
+        result = cur.fetchone()[0]
+    pg.rollback()
+    document = result if isinstance(result, list) else json.loads(result)
+    root = document[0]
+    nodes = list(_scans(root['Plan']))
+    seq_scans = []
+    for node in nodes:
+        if node['Node Type'] != 'Seq Scan':
+            continue
+        scanned = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * node.get('Actual Loops', 1)
+        if scanned >= SEQ_SCAN_MIN_ROWS:
+            seq_scans.append(f"{node['Relation Name']} ({scanned:,.0f} rows)")
+    access = sorted({f"{n['Node Type']} {n.get('Index Name') or n.get('Relation Name', '')}".strip()
+                     for n in nodes if 'Relation Name' in n})
+    return {
+        'execution_ms': root['Execution Time'],
+        'planning_ms': root['Planning Time'],
+        'buffers': root['Plan'].get('Shared Hit Blocks', 0) + root['Plan'].get('Shared Read Blocks', 0),
+        'access': access,
+        'seq_scans': seq_scans,
+    }
+
+
+def report(shapes):
+    flagged = []
+    print(f"{'case':<36} {'table':<16} {'exec ms':>9} {'buffers':>8}  access")
+    for shape in shapes:
+        plan = shape.get('plan')
+        if plan is None:
+            print(f"{shape['case']:<36} {shape['table']:<16} {'–':>9} {'–':>8}  ERROR {shape['error']}")
+            continue
+        flag = f"  SEQ SCAN: {', '.join(plan['seq_scans'])}" if plan['seq_scans'] else ""
+        print(f"{shape['case']:<36} {shape['table']:<16} {plan['execution_ms']:>9.2f} {plan['buffers']:>8,}  "
+              f"{'; '.join(plan['access'])}{flag}")
+        if plan['seq_scans']:
+            flagged.append(shape)
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.environ.get("LIFEOS_PG_DSN"), help="scratch Postgres (or LIFEOS_PG_DSN)")
+    parser.add_argument("--scale", default="100k", help=f"one of {', '.join(SCALES)}")
+    parser.add_argument("--tenants", type=int, default=4, help="copies of the ledger under different users")
+    parser.add_argument("--without-indexes", action="store_true", help="skip database/migration_indexes.sql")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any shape sequentially scans a large table")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or LIFEOS_PG_DSN) is required")
+    try:
+        import psycopg
+    except ImportError:
+        sys.exit('index_advisor needs psycopg: pip install "psycopg[binary]"')
+
+    db = LocalDatabase(":memory:")
+    auth = LocalClient(db).auth.sign_up(BENCH_USER)
+    started = time.perf_counter()
+    load_ledger(LocalClient.from_token(db, auth.session.access_token),
+                generate_ledger(SCALES[args.scale], years=10, end_date=LEDGER_END))
+    print(f"Generated the {args.scale} ledger in {time.perf_counter() - started:.1f}s")
+
+    with psycopg.connect(args.dsn) as pg:
+        started = time.perf_counter()
+        copy_ledger(pg, db, args.tenants, not args.without_indexes)
+        print(f"Copied {args.tenants} tenant(s) to {SCHEMA_NAME} in {time.perf_counter() - started:.1f}s "
+              f"({'with' if not args.without_indexes else 'without'} database/migration_indexes.sql)\n")
+
+        shapes = capture_shapes(db, auth.user)
+        for shape in shapes:
+            try:
+                shape['plan'] = explain(pg, shape)
+            except psycopg.Error as e:
+                pg.rollback()
+                shape['error'] = str(e).splitlines()[0]
+        flagged = report(shapes)
+
+    print(f"\n{len(shapes)} query shapes, {len(flagged)} with sequential scans of {SEQ_SCAN_MIN_ROWS:,}+ rows")
+    if flagged and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
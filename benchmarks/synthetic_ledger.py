@@ -0,0 +1,272 @@
+"""
+Synthetic multi-currency ledgers for benchmarks and load tests.
+
+`generate_ledger` builds a deterministic (seeded) history of expenses, income,
+investments, monthly budgets and month-end balance snapshots across several accounts
+in EUR, USD, GBP and INR. `load_ledger` writes it through a client's normal write
+paths (the bulk RPCs, table inserts), so it works against the local backend and a
+real Supabase project alike.
+
+    from benchmarks.synthetic_ledger import generate_ledger, load_ledger
+    ledger = generate_ledger(100_000, years=10)
+    load_ledger(client, ledger)
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+# Rates used to express EUR amounts in each account's currency (as seeded in exchange_rates).
+RATES_TO_EUR = {'EUR': 1.0, 'USD': 0.92, 'GBP': 1.17, 'INR': 0.011}
+# Share of rows per table; budgets and snapshots are per month and do not count.
+TABLE_SHARES = {'expenses': 0.88, 'income': 0.07, 'investments': 0.05}
+# Expenses paid in another currency than the account's (travel, online shops).
+FOREIGN_SHARE = 0.03
+# Income per account is scaled to this multiple of the account's spending, so balances
+# grow slowly as in a real ledger instead of drifting by millions at large scales.
+INCOME_TO_SPENDING = 1.15
+WRITE_BATCH_SIZE = 5000
+
+# (name, type, currency, opening balance in account currency, share of transactions)
+ACCOUNTS = [
+    ("Main Checking", "bank", "EUR", 4_000.0, 0.45),
+    ("Credit Card", "credit_card", "EUR", 0.0, 0.30),
+    ("Cash", "cash", "EUR", 200.0, 0.08),
+    ("US Checking", "bank", "USD", 2_500.0, 0.07),
+    ("UK Current", "bank", "GBP", 1_000.0, 0.05),
+    ("India Savings", "bank", "INR", 150_000.0, 0.05),
+]
+
+# name -> (share of expenses, median amount in EUR, monthly budget in EUR, vendors)
+EXPENSE_CATEGORIES = {
+    "Groceries": (0.28, 35.0, 450.0, ["Albert Heijn", "Jumbo", "Lidl", "Aldi", "Whole Foods", "Tesco"]),
+    "Dining": (0.17, 22.0, 250.0, ["Starbucks", "McDonald's", "Thuisbezorgd", "Vapiano", "Local Cafe"]),
+    "Transport": (0.14, 12.0, 150.0, ["NS", "Uber", "Shell", "GVB", "Bolt"]),
+    "Shopping": (0.12, 45.0, 200.0, ["Amazon", "Bol.com", "IKEA", "Zara", "HEMA"]),
+    "Entertainment": (0.09, 15.0, 80.0, ["Netflix", "Spotify", "Pathe", "Steam"]),
+    "Utilities": (0.06, 70.0, 250.0, ["Vattenfall", "KPN", "Ziggo", "Waternet"]),
+    "Health": (0.05, 30.0, 100.0, ["Etos", "Kruidvat", "Pharmacy", "Dentist"]),
+    "Rent": (0.04, 1_200.0, 1_300.0, ["Landlord"]),
+    "Travel": (0.05, 180.0, 300.0, ["KLM", "Booking.com", "Airbnb", "Ryanair"]),
+}
+# name -> (share of income, median amount in EUR)
+INCOME_CATEGORIES = {
+    "Salary": (0.55, 3_800.0),
+    "Freelance": (0.25, 650.0),
+    "Interest": (0.15, 25.0),
+    "Gifts": (0.05, 100.0),
+}
+# (instrument, symbol, type, currency, price in EUR at the start, yearly drift)
+INSTRUMENTS = [
+    ("Vanguard FTSE All-World", "VWRL", "etf", "EUR", 80.0, 0.07),
+    ("S&P 500 ETF", "VOO", "etf", "USD", 300.0, 0.09),
+    ("Bitcoin", "BTC", "crypto", "EUR", 9_000.0, 0.25),
+    ("Nifty 50 Index Fund", "NIFTYBEES", "mutual_fund", "INR", 1.5, 0.10),
+    ("Gold", "XAU", "gold", "EUR", 45.0, 0.05),
+]
+PAYMENT_METHODS = np.array(["card", "card", "card", "upi", "bank", "cash"])
+
+
+def _split(total):
+    counts = {table: int(total * share) for table, share in TABLE_SHARES.items()}
+    counts['expenses'] += total - sum(counts.values())
+    return counts
+
+
+def _dates(rng, n, start, end):
+    days = (end - start).days + 1
+    offsets = np.sort(rng.integers(0, days, size=n))
+    return pd.Timestamp(start) + pd.to_timedelta(offsets, unit='D')
+
+
+def _lognormal(rng, median, n, sigma=0.6):
+    return median * rng.lognormal(0.0, sigma, size=n)
+
+
+def generate_ledger(transactions, years=10, end_date=None, seed=0):
+    """
+    A deterministic ledger of about `transactions` rows over the last `years` years.
+    Returns a dict of DataFrames keyed by table; category and account references are by
+    name (`category`, `account`) and resolved to ids by `load_ledger`.
+    """
+    rng = np.random.default_rng(seed)
+    end = end_date or datetime.date.today()
+    start = (pd.Timestamp(end) - pd.DateOffset(years=years)).date() + datetime.timedelta(days=1)
+    counts = _split(transactions)
+    accounts = pd.DataFrame(ACCOUNTS, columns=['name', 'type', 'currency', 'balance', 'share'])
+    account_currency = dict(zip(accounts['name'], accounts['currency']))
+    account_share = accounts['share'] / accounts['share'].sum()
+
+    # --- Expenses ---
+    n = counts['expenses']
+    names = list(EXPENSE_CATEGORIES)
+    shares = np.array([EXPENSE_CATEGORIES[c][0] for c in names])
+    category = rng.choice(names, size=n, p=shares / shares.sum())
+    median = pd.Series(category).map({c: v[1] for c, v in EXPENSE_CATEGORIES.items()}).to_numpy()
+    amount_eur = np.round(median * rng.lognormal(0.0, 0.6, size=n), 2)
+    # One draw per row, so vendors vary within a category
+    picks = rng.random(n)
+    vendor = np.array([
+        EXPENSE_CATEGORIES[c][3][int(p * len(EXPENSE_CATEGORIES[c][3]))] for c, p in zip(category, picks)
+    ], dtype=object)
+    account = rng.choice(accounts['name'], size=n, p=account_share)
+    currency = pd.Series(account).map(account_currency).to_numpy()
+    foreign = rng.random(n) < FOREIGN_SHARE
+    currency = np.where(foreign, rng.choice(list(RATES_TO_EUR), size=n), currency)
+    rate = pd.Series(currency).map(RATES_TO_EUR).to_numpy()
+    expenses = pd.DataFrame({
+        'date': _dates(rng, n, start, end),
+        'amount': np.round(amount_eur / rate, 2),
+        'currency': currency,
+        'category': category,
+        'account': account,
+        'vendor': vendor,
+        'description': [f"{v} purchase" for v in vendor],
+        'payment_method': rng.choice(PAYMENT_METHODS, size=n),
+        'source': 'synthetic',
+    })
+
+    # --- Income ---
+    n = counts['income']
+    names = list(INCOME_CATEGORIES)
+    shares = np.array([INCOME_CATEGORIES[c][0] for c in names])
+    category = rng.choice(names, size=n, p=shares / shares.sum())
+    median = pd.Series(category).map({c: v[1] for c, v in INCOME_CATEGORIES.items()}).to_numpy()
+    account = rng.choice(accounts['name'], size=n, p=account_share)
+    currency = pd.Series(account).map(account_currency).to_numpy()
+    rate = pd.Series(currency).map(RATES_TO_EUR).to_numpy()
+    income_eur = pd.Series(median * rng.lognormal(0.0, 0.25, size=n))
+    spent = (expenses['amount'] * expenses['currency'].map(RATES_TO_EUR)).groupby(expenses['account']).sum()
+    earned = income_eur.groupby(account).sum()
+    scale = (spent * INCOME_TO_SPENDING / earned).reindex(account).fillna(1.0).to_numpy()
+    income = pd.DataFrame({
+        'date': _dates(rng, n, start, end),
+        'amount': np.round(income_eur.to_numpy() * scale / rate, 2),
+        'currency': currency,
+        'category': category,
+        'account': account,
+        'source': category,
+        'notes': None,
+    })
+
+    # --- Investments (mostly buys, priced on a drifting random walk) ---
+    n = counts['investments']
+    pick = rng.integers(0, len(INSTRUMENTS), size=n)
+    dates = _dates(rng, n, start, end)
+    years_in = ((dates - pd.Timestamp(start)).days / 365.25).to_numpy()
+    base_price = np.array([i[4] for i in INSTRUMENTS])[pick]
+    drift = np.array([i[5] for i in INSTRUMENTS])[pick]
+    price_eur = base_price * np.exp(drift * years_in) * rng.lognormal(0.0, 0.1, size=n)
+    inv_currency = np.array([i[3] for i in INSTRUMENTS])[pick]
+    inv_rate = pd.Series(inv_currency).map(RATES_TO_EUR).to_numpy()
+    amount_eur = np.round(_lognormal(rng, 300.0, n), 2)
+    investments = pd.DataFrame({
+        'date': dates,
+        'amount': np.round(amount_eur / inv_rate, 2),
+        'currency': inv_currency,
+        'amount_eur': amount_eur,
+        'instrument_name': np.array([i[0] for i in INSTRUMENTS])[pick],
+        'symbol': np.array([i[1] for i in INSTRUMENTS])[pick],
+        'investment_type': np.array([i[2] for i in INSTRUMENTS])[pick],
+        'units': np.round(amount_eur / price_eur, 6),
+        'price_per_unit': np.round(price_eur / inv_rate, 4),
+        'action': np.where(rng.random(n) < 0.9, 'buy', 'sell'),
+        'account': rng.choice(accounts['name'], size=n),
+        'source': 'synthetic',
+    })
+
+    # --- Budgets: every expense category, every month ---
+    months = pd.period_range(start, end, freq='M').strftime('%Y-%m')
+    budgets = pd.DataFrame(
+        [(m, c, v[2]) for m in months for c, v in EXPENSE_CATEGORIES.items()],
+        columns=['month', 'category', 'budget_amount']
+    )
+
+    return {
+        'categories': pd.DataFrame(
+            [(c, 'expense') for c in EXPENSE_CATEGORIES] + [(c, 'income') for c in INCOME_CATEGORIES]
+            + [("Investments", 'investment')], columns=['name', 'type']
+        ),
+        'accounts': accounts[['name', 'type', 'currency', 'balance']],
+        'expenses': expenses,
+        'income': income,
+        'investments': investments,
+        'budgets': budgets,
+        'balance_history': month_end_balances(accounts, expenses, income),
+    }
+
+
+def month_end_balances(accounts, expenses, income):
+    """Balance of every account at each month end, replaying flows from the opening balance."""
+    def flows(df, sign):
+        eur = df['amount'] * df['currency'].map(RATES_TO_EUR)
+        return pd.DataFrame({'account': df['account'], 'month': df['date'].dt.to_period('M'), 'eur': sign * eur})
+
+    moves = pd.concat([flows(expenses, -1), flows(income, 1)])
+    if moves.empty:
+        return pd.DataFrame(columns=['account', 'date', 'balance'])
+    months = pd.period_range(moves['month'].min(), moves['month'].max(), freq='M')
+    net = moves.groupby(['account', 'month'])['eur'].sum().unstack(fill_value=0.0).reindex(columns=months, fill_value=0.0)
+    net = net.reindex(accounts['name'], fill_value=0.0)
+    rate = accounts.set_index('name')['currency'].map(RATES_TO_EUR)
+    balances = net.cumsum(axis=1).div(rate, axis=0).add(accounts.set_index('name')['balance'], axis=0)
+    snapshots = balances.stack().rename('balance').reset_index()
+    snapshots.columns = ['account', 'month', 'balance']
+    snapshots['date'] = snapshots['month'].dt.end_time.dt.strftime('%Y-%m-%d')
+    snapshots['balance'] = snapshots['balance'].round(2)
+    return snapshots[['account', 'date', 'balance']]
+
+
+def _records(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def _batches(frame, size):
+    for start in range(0, len(frame), size):
+        yield frame.iloc[start:start + size]
+
+
+def load_ledger(client, ledger, batch_size=WRITE_BATCH_SIZE):
+    """
+    Write a generated ledger for the client's user. Returns {table: rows written}.
+    Transactions go through the bulk RPCs, so account balances end up where the
+    month-end snapshots say they are.
+    """
+    written = {}
+    categories = client.table("categories").insert(_records(ledger['categories'])).execute().data
+    category_ids = {row['name']: row['id'] for row in categories}
+    accounts = client.table("accounts").insert(_records(ledger['accounts'])).execute().data
+    account_ids = {row['name']: row['id'] for row in accounts}
+    written.update(categories=len(categories), accounts=len(accounts))
+
+    def resolve(frame):
+        frame = frame.copy()
+        if 'category' in frame.columns:
+            frame['category_id'] = frame.pop('category').map(category_ids)
+        if 'account' in frame.columns:
+            frame['account_id'] = frame.pop('account').map(account_ids)
+        if 'date' in frame.columns:
+            frame['date'] = pd.to_datetime(frame['date']).dt.strftime('%Y-%m-%d')
+        return frame
+
+    for table, rpc in (('expenses', 'record_expenses_bulk'), ('income', 'record_income_bulk')):
+        written[table] = 0
+        for batch in _batches(resolve(ledger[table]), batch_size):
+            written[table] += client.rpc(rpc, {"p_rows": _records(batch)}).execute().data
+
+    for table in ('investments', 'budgets'):
+        written[table] = 0
+        for batch in _batches(resolve(ledger[table]), batch_size):
+            written[table] += len(client.table(table).insert(_records(batch)).execute().data)
+
+    # Month-end history for net worth charts; today's snapshot is written by the balance trigger
+    snapshots = resolve(ledger['balance_history'])
+    today = datetime.date.today().isoformat()
+    snapshots = snapshots[snapshots['date'] < today]
+    written['balance_history'] = 0
+    for batch in _batches(snapshots, batch_size):
+        written['balance_history'] += len(
+            client.table("balance_history").upsert(_records(batch), on_conflict="account_id,date").execute().data
+        )
+    return written
@@ -1,16 +1,340 @@
+"""
+LLM gateway: every model call in the app goes through one process-wide `LLMGateway`.
+
+The gateway keeps one client per model, routes tasks to models (cheap tasks go to a
+small model), enforces a request/token rate limit and a concurrency cap, coalesces
+identical in-flight requests and records per-call latency and token metrics.
+Set `LIFEOS_FAKE_LLM=1` (or `[groq] fake = true` in secrets) to use a local fake model.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any
+
+import pandas as pd
 import streamlit as st
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_groq import ChatGroq
+from pydantic import ConfigDict, Field
+
+from core.fast_parser import fast_parse
+from core.token_budget import count_tokens
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+SMALL_MODEL = "llama-3.1-8b-instant"
+
+# Task -> model. Extraction, classification and summaries do not need the 70B model.
+MODEL_ROUTES = {
+    'chat': DEFAULT_MODEL,
+    'extraction': SMALL_MODEL,
+    'classification': SMALL_MODEL,
+    'summary': SMALL_MODEL,
+}
+
+# Limits across the whole process (Groq enforces them per API key).
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 12000
+MAX_CONCURRENCY = 8
+METRICS_MAX_CALLS = 1000
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available; returns seconds waited."""
+        # A request larger than the bucket can never fit; let it through at a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _estimate_tokens(messages):
+    return sum(count_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages)
+
+
+def _usage(message, messages):
+    usage = getattr(message, 'usage_metadata', None) or {}
+    return (usage.get('input_tokens') or _estimate_tokens(messages),
+            usage.get('output_tokens') or count_tokens(message.content if isinstance(message.content, str) else ""))
+
+
+class LLMGateway:
+    """Shared limits, coalescing and metrics for all model calls in the process."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_concurrency=MAX_CONCURRENCY, fake=False):
+        self.fake = fake
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.calls = deque(maxlen=METRICS_MAX_CALLS)
+        self._clients = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    # --- Clients ---
+    def client(self, model):
+        """The underlying chat model for `model`, created once and reused."""
+        with self._lock:
+            if model not in self._clients:
+                if self.fake:
+                    self._clients[model] = FakeChatModel(model_name=model)
+                else:
+                    self._clients[model] = ChatGroq(
+                        temperature=0, groq_api_key=st.secrets["groq"]["api_key"], model_name=model
+                    )
+            return self._clients[model]
+
+    def llm(self, task="chat", model=None):
+        """A chat model for `task` whose calls go through this gateway."""
+        model = model or MODEL_ROUTES.get(task, DEFAULT_MODEL)
+        return GatewayChatModel(inner=self.client(model), gateway=self, task=task, model_name=model)
+
+    # --- Limits ---
+    @contextmanager
+    def slot(self, messages):
+        """Wait for rate limit budget and a concurrency slot; yields seconds spent waiting."""
+        started = time.perf_counter()
+        self.requests.acquire(1)
+        self.tokens.acquire(_estimate_tokens(messages))
+        with self.slots:
+            yield time.perf_counter() - started
+
+    def _record(self, task, model, started, waited, messages, message=None, error=None,
+                coalesced=False, streamed=False, ttft=None):
+        input_tokens, output_tokens = _usage(message, messages) if message is not None else (_estimate_tokens(messages), 0)
+        self.calls.append({
+            'at': time.time(), 'task': task, 'model': model,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'wait_ms': waited * 1000, 'ttft_ms': ttft,
+            'input_tokens': input_tokens, 'output_tokens': output_tokens,
+            'streamed': streamed, 'coalesced': coalesced, 'error': error,
+        })
+
+    # --- Calls ---
+    def generate(self, model, messages, stop, kwargs):
+        """Run one non-streaming call; identical concurrent calls share a single request."""
+        key = hashlib.sha256(json.dumps(
+            [model.model_name, [(m.type, m.content) for m in messages], stop, kwargs], default=str, sort_keys=True
+        ).encode()).hexdigest()
+        started = time.perf_counter()
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            result = future.result()
+            self._record(model.task, model.model_name, started, 0.0, messages,
+                         result.generations[0].message, coalesced=True)
+            return result
+
+        waited = 0.0
+        try:
+            with self.slot(messages) as waited:
+                result = model.inner._generate(messages, stop=stop, **kwargs)
+            future.set_result(result)
+            self._record(model.task, model.model_name, started, waited, messages, result.generations[0].message)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            self._record(model.task, model.model_name, started, waited, messages, error=str(e))
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stream(self, model, messages, stop, kwargs):
+        """Stream one call under the gateway limits, recording time-to-first-token."""
+        started = time.perf_counter()
+        ttft = None
+        merged = None
+        waited = 0.0
+        try:
+            with self.slot(messages) as waited:
+                for chunk in model.inner._stream(messages, stop=stop, **kwargs):
+                    if ttft is None:
+                        ttft = (time.perf_counter() - started) * 1000
+                    merged = chunk.message if merged is None else merged + chunk.message
+                    yield chunk
+            self._record(model.task, model.model_name, started, waited, messages,
+                         merged or AIMessage(content=""), streamed=True, ttft=ttft)
+        except GeneratorExit:
+            self._record(model.task, model.model_name, started, waited, messages,
+                         merged or AIMessage(content=""), error="cancelled", streamed=True, ttft=ttft)
+            raise
+        except Exception as e:
+            self._record(model.task, model.model_name, started, waited, messages, error=str(e), streamed=True, ttft=ttft)
+            raise
+
+    # --- Metrics ---
+    def metrics_frame(self):
+        """Per-call metrics, oldest first."""
+        return pd.DataFrame(list(self.calls))
+
+    def summary(self):
+        """p50/p95 latency and token totals per task and model."""
+        df = self.metrics_frame()
+        if df.empty:
+            return df
+        return df.groupby(['task', 'model']).agg(
+            calls=('latency_ms', 'size'),
+            p50_ms=('latency_ms', 'median'),
+            p95_ms=('latency_ms', lambda s: s.quantile(0.95)),
+            input_tokens=('input_tokens', 'sum'),
+            output_tokens=('output_tokens', 'sum'),
+            coalesced=('coalesced', 'sum'),
+            errors=('error', lambda s: s.notna().sum()),
+        ).reset_index()
+
+    def export_metrics_json(self):
+        return json.dumps(list(self.calls), default=str)
 
-def init_groq(model_name="llama-3.3-70b-versatile"):
-    """Initialize the Groq LLM client."""
+
+class GatewayChatModel(BaseChatModel):
+    """Chat model facade that sends every call of `inner` through an `LLMGateway`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: Any
+    gateway: Any = Field(exclude=True)
+    task: str = "chat"
+    model_name: str = DEFAULT_MODEL
+
+    @property
+    def _llm_type(self):
+        return "lifeos-gateway"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.gateway.generate(self, messages, stop, kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Limits are thread-based, so async callers (chain.abatch) run calls in worker threads
+        return await asyncio.to_thread(self._generate, messages, stop, None, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self.gateway.stream(self, messages, stop, kwargs):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline model. Extraction prompts are answered with the rule-based
+    parser's JSON; anything else gets a short canned reply. Never calls tools.
+    """
+
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self):
+        return "lifeos-fake"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content if messages else ""
+        match = re.search(r'Text:\s*(.*?)\n\s*\n', prompt, re.S)
+        if match:
+            parsed = fast_parse(match.group(1).strip()) or {}
+            fields = ('date', 'amount', 'merchant', 'category', 'account', 'description')
+            return json.dumps({k: parsed.get(k) for k in fields})
+        return f"(offline) You asked: {prompt[:200]}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for word in re.findall(r'\S+\s*', self._reply(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+def _fake_enabled():
+    if os.environ.get("LIFEOS_FAKE_LLM") == "1":
+        return True
     try:
-        api_key = st.secrets["groq"]["api_key"]
-        llm = ChatGroq(
-            temperature=0, 
-            groq_api_key=api_key, 
-            model_name=model_name
-        )
-        return llm
+        return bool(st.secrets.get("groq", {}).get("fake", False))
+    except Exception:
+        return False
+
+
+@st.cache_resource
+def get_gateway() -> LLMGateway:
+    """Process-wide LLM gateway, shared across reruns and sessions."""
+    return LLMGateway(fake=_fake_enabled())
+
+
+def get_llm(task="chat", model=None):
+    """A gateway-backed chat model for `task` ('chat', 'extraction', 'classification', 'summary')."""
+    try:
+        return get_gateway().llm(task, model)
     except Exception as e:
         st.error(f"Error initializing Groq: {e}")
         return None
+
+
+def init_groq(model_name=DEFAULT_MODEL):
+    """Initialize the Groq LLM client (a gateway-backed model for `model_name`)."""
+    return get_llm(model=model_name)
+
+
+def stream_completion(llm, messages, metrics, chunks=None):
+    """
+    Yield the text of a chat completion chunk by chunk as it is generated.
+    `metrics` is filled in place with time-to-first-token, total latency and chunk/char
+    counts; closing the generator early (e.g. a Stop click) records it as cancelled.
+    Raw message chunks (with any tool call deltas) are appended to `chunks` if given.
+    """
+    started = time.perf_counter()
+    metrics.update({'ttft_ms': None, 'total_ms': None, 'chunks': 0, 'chars': 0, 'cancelled': False})
+    completed = False
+    try:
+        for chunk in llm.stream(messages):
+            if chunks is not None:
+                chunks.append(chunk)
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            if metrics['ttft_ms'] is None:
+                metrics['ttft_ms'] = (time.perf_counter() - started) * 1000
+            metrics['chunks'] += 1
+            metrics['chars'] += len(text)
+            yield text
+        completed = True
+    finally:
+        metrics['total_ms'] = (time.perf_counter() - started) * 1000
+        metrics['cancelled'] = not completed
@@ -0,0 +1,193 @@
+import functools
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from core.cache import get_data_cache
+
+# Tables whose data version scopes the memoized analytics results.
+ANALYTICS_TABLES = ("expenses", "income", "investments", "accounts", "budgets", "categories")
+MEMO_MAX_ENTRIES = 64
+
+
+# --- Memoization ---
+def _fingerprint(value):
+    """Key for a scalar argument. Frames are described by the caller's `memo_key`, never hashed."""
+    if isinstance(value, pd.DataFrame):
+        return "df"
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return repr(value)
+
+
+def memoized(func):
+    """
+    Memoize an analytics function in the session for the current data version.
+    Callers pass `memo_key`: the scalar query arguments (table, period, filters) the frame
+    arguments were loaded with. Hashing the frames would cost as much as the aggregation;
+    within a data version the same query returns the same frame. Without a `memo_key`
+    the function just runs. The memo is dropped whenever the user's data changes.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, memo_key=None, **kwargs):
+        user = st.session_state.get('user')
+        if user is None or memo_key is None:
+            return func(*args, **kwargs)
+
+        version = get_data_cache().versions(user.id, ANALYTICS_TABLES)
+        memo = st.session_state.get('_analytics_memo')
+        if memo is None or memo['version'] != version:
+            memo = {'version': version, 'results': OrderedDict()}
+            st.session_state['_analytics_memo'] = memo
+
+        key = (func.__name__, memo_key,
+               tuple(_fingerprint(a) for a in args),
+               tuple((k, _fingerprint(v)) for k, v in sorted(kwargs.items())))
+        results = memo['results']
+        if key in results:
+            results.move_to_end(key)
+        else:
+            results[key] = func(*args, **kwargs)
+            while len(results) > MEMO_MAX_ENTRIES:
+                results.popitem(last=False)
+        result = results[key]
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+    return wrapper
+
+
+# --- Preparation ---
+def normalize_transactions(df):
+    """Copy of `df` with a datetime `date` and `amount_eur` backfilled from `amount`."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    df = df.copy()
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    if 'amount' in df.columns:
+        df['amount_eur'] = df.get('amount_eur', df['amount']).fillna(df['amount'])
+    return df
+
+
+def filter_period(df, start_date, end_date):
+    """Rows of a normalized frame whose date falls within [start_date, end_date]."""
+    if df.empty:
+        return df
+    mask = (df['date'] >= pd.Timestamp(start_date)) & (df['date'] <= pd.Timestamp(end_date))
+    return df[mask].copy()
+
+
+# --- Aggregations ---
+@memoized
+def monthly_cash_flow(expenses, income, months=6, end_date=None):
+    """Income, expenses and net (EUR) per calendar month for the last `months` months."""
+    end = pd.Timestamp(end_date or pd.Timestamp.today()).to_period('M')
+    index = pd.period_range(end=end, periods=months, freq='M')
+
+    def monthly(df):
+        if df.empty:
+            return pd.Series(0.0, index=index)
+        return df.groupby(df['date'].dt.to_period('M'))['amount_eur'].sum().reindex(index, fill_value=0.0)
+
+    inc = monthly(income)
+    exp = monthly(expenses)
+    return pd.DataFrame({
+        'Month': index.strftime('%b %Y'),
+        'Income': inc.values,
+        'Expenses': exp.values,
+        'Net': (inc - exp).values,
+    })
+
+
+def period_totals(expenses, income):
+    """Total income, expenses, savings (EUR) and savings rate (%) for already-filtered frames."""
+    income_eur = float(income['amount_eur'].sum()) if not income.empty else 0.0
+    expenses_eur = float(expenses['amount_eur'].sum()) if not expenses.empty else 0.0
+    savings_eur = income_eur - expenses_eur
+    return {
+        'income': income_eur,
+        'expenses': expenses_eur,
+        'savings': savings_eur,
+        'savings_rate': (savings_eur / income_eur * 100) if income_eur > 0 else 0.0,
+    }
+
+
+@memoized
+def category_split(df, by='category'):
+    """EUR totals grouped by `by`, largest first."""
+    if df.empty or by not in df.columns:
+        return pd.DataFrame(columns=[by, 'amount_eur'])
+    return (df.groupby(by)['amount_eur'].sum()
+              .sort_values(ascending=False)
+              .reset_index())
+
+
+@memoized
+def daily_totals(df):
+    """EUR totals per day."""
+    if df.empty:
+        return pd.DataFrame(columns=['date', 'amount_eur'])
+    return df.groupby('date')['amount_eur'].sum().reset_index()
+
+
+@memoized
+def top_merchants(expenses, n=10):
+    """Top `n` merchants by EUR spend; falls back to the description when no vendor is set."""
+    if expenses.empty:
+        return pd.DataFrame(columns=['merchant_display', 'amount_eur'])
+    vendor = expenses['vendor'] if 'vendor' in expenses.columns else pd.Series(None, index=expenses.index, dtype=object)
+    merchant = vendor.fillna(expenses['description'].str[:20])
+    return (expenses['amount_eur'].groupby(merchant.rename('merchant_display')).sum()
+            .nlargest(n)
+            .reset_index())
+
+
+@memoized
+def sankey_flows(income, expenses):
+    """Nodes and links for an income source -> Budget -> expense category Sankey (EUR values)."""
+    inc_agg = income.groupby('source')['amount_eur'].sum()
+    exp_agg = expenses.groupby('category')['amount_eur'].sum()
+
+    nodes = inc_agg.index.tolist() + ["Budget"] + exp_agg.index.tolist()
+    budget_ix = len(inc_agg)
+    sources = list(range(len(inc_agg))) + [budget_ix] * len(exp_agg)
+    targets = [budget_ix] * len(inc_agg) + list(range(budget_ix + 1, budget_ix + 1 + len(exp_agg)))
+    values = inc_agg.tolist() + exp_agg.tolist()
+    return {'nodes': nodes, 'sources': sources, 'targets': targets, 'values': values}
+
+
+@memoized
+def budget_vs_actual(budgets, expenses, conversion_rate=1.0, categories=None):
+    """
+    Budget, spend, remaining and progress (%) per category.
+    Budgets are entered in the display currency, so spend is converted with `conversion_rate`.
+    With `categories`, every category that has a budget or spend is included;
+    otherwise only budgeted categories are.
+    """
+    spent = category_split(expenses).set_index('category')['amount_eur'] / conversion_rate
+    budget = (budgets.groupby('category')['budget_amount'].sum().astype(float)
+              if not budgets.empty else pd.Series(dtype=float))
+
+    if categories is not None:
+        names = pd.Index(categories)
+        frame = pd.DataFrame({
+            'budget': budget.reindex(names, fill_value=0.0),
+            'spent': spent.reindex(names, fill_value=0.0),
+        })
+        frame = frame[(frame['budget'] > 0) | (frame['spent'] > 0)]
+    else:
+        frame = pd.DataFrame({'budget': budget, 'spent': spent.reindex(budget.index, fill_value=0.0)})
+
+    frame['remaining'] = frame['budget'] - frame['spent']
+    frame['progress'] = (frame['spent'] / frame['budget'].where(frame['budget'] > 0) * 100).fillna(
+        (frame['spent'] > 0) * 100.0)
+    return frame.rename_axis('category').reset_index()
+
+
+def net_worth(accounts, rates, invested_eur=0.0):
+    """Account balances converted to EUR plus the invested amount."""
+    if accounts.empty:
+        return float(invested_eur)
+    currency = accounts['currency'].fillna('EUR') if 'currency' in accounts.columns else 'EUR'
+    rate = pd.Series(currency, index=accounts.index).map(rates).fillna(1.0)
+    return float((accounts['balance'].fillna(0) * rate).sum() + invested_eur)
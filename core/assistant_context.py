@@ -0,0 +1,146 @@
+"""
+Financial context for the AI Assistant, maintained incrementally per session.
+
+The last 30 days of expenses and income are loaded once; afterwards only rows added
+since the last refresh are fetched (when the data version changes), rows that slide out
+of the window are dropped, and the summary text is rebuilt only when something changed.
+"""
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from core.cache import get_data_cache
+from core.finance_queries import get_accounts, get_expenses, get_income, iter_rows_after
+
+CONTEXT_DAYS = 30
+RECENT_SAMPLE = 10
+CONTEXT_TABLES = ("expenses", "income", "accounts")
+
+EXPENSE_COLUMNS = ['id', 'date', 'amount', 'amount_eur', 'description', 'category']
+INCOME_COLUMNS = ['id', 'date', 'amount', 'amount_eur']
+
+
+def _window(df, start_date):
+    """Normalized rows of `df` dated on or after `start_date`."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df['amount_eur'] = df.get('amount_eur', df['amount']).fillna(df['amount'])
+    return df[df['date'].dt.date >= start_date]
+
+
+class AssistantContext:
+    """The rolling window behind the assistant's system prompt for one user session."""
+
+    def __init__(self):
+        self.start_date = None
+        self.expenses = pd.DataFrame()
+        self.income = pd.DataFrame()
+        self.accounts = pd.DataFrame()
+        self.last_ids = {'expenses': 0, 'income': 0}
+        self.versions = None
+        self.text = None
+        self.text_key = None
+        self.fetches = 0
+
+    def _load(self, start_date, today):
+        self.expenses = _window(get_expenses(start_date, today, columns=EXPENSE_COLUMNS), start_date)
+        self.income = _window(get_income(start_date, today, columns=INCOME_COLUMNS), start_date)
+        self.accounts = get_accounts()
+        for table, df in (('expenses', self.expenses), ('income', self.income)):
+            self.last_ids[table] = int(df['id'].max()) if not df.empty else 0
+        self.fetches += 3
+
+    def _append_new(self, table, columns):
+        frames = [getattr(self, table)]
+        for chunk in iter_rows_after(table, self.last_ids[table], columns, start_date=self.start_date):
+            frames.append(_window(chunk, self.start_date))
+            self.last_ids[table] = max(self.last_ids[table], int(chunk['id'].max()))
+        self.fetches += 1
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            setattr(self, table, pd.concat(frames, ignore_index=True))
+
+    def refresh(self, user_id, today=None):
+        """Bring the window up to date: slide it to today and pull rows written since the last call."""
+        today = today or datetime.date.today()
+        start_date = today - datetime.timedelta(days=CONTEXT_DAYS)
+        versions = dict(zip(CONTEXT_TABLES, get_data_cache().versions(user_id, CONTEXT_TABLES)))
+
+        if self.versions is None:
+            self.start_date = start_date
+            self._load(start_date, today)
+        else:
+            if start_date != self.start_date:
+                # A new day only drops rows from the tail; new-day rows arrive as new ids below
+                self.start_date = start_date
+                self.expenses = _window(self.expenses, start_date)
+                self.income = _window(self.income, start_date)
+            if versions['expenses'] != self.versions['expenses']:
+                self._append_new('expenses', EXPENSE_COLUMNS)
+            if versions['income'] != self.versions['income']:
+                self._append_new('income', INCOME_COLUMNS)
+            if versions['accounts'] != self.versions['accounts']:
+                self.accounts = get_accounts()
+                self.fetches += 1
+        self.versions = versions
+
+    def summary(self, conversion_rate=1.0, currency="EUR"):
+        """The context text, rebuilt only when the window or display currency changed."""
+        key = (tuple(self.versions.values()) if self.versions else None, self.start_date, conversion_rate, currency)
+        if self.text is not None and key == self.text_key:
+            return self.text
+
+        expenses, income = self.expenses, self.income
+        total_spent = expenses['amount_eur'].sum() / conversion_rate if not expenses.empty else 0
+        total_income = income['amount_eur'].sum() / conversion_rate if not income.empty else 0
+
+        top_categories = ""
+        if not expenses.empty:
+            cat_group = expenses.groupby('category')['amount_eur'].sum().sort_values(ascending=False).head(5)
+            top_categories = ", ".join([f"{cat} ({val/conversion_rate:.2f} {currency})" for cat, val in cat_group.items()])
+
+        account_summary = ""
+        if not self.accounts.empty:
+            account_summary = ", ".join(
+                f"{row['name']} ({row['balance']} {row['currency']})" for _, row in self.accounts.iterrows()
+            )
+
+        context = f"""
+        Financial Context (Last {CONTEXT_DAYS} Days, displayed in {currency}):
+        - Total Income: {total_income:,.2f} {currency}
+        - Total Expenses: {total_spent:,.2f} {currency}
+        - Net Savings: {(total_income - total_spent):,.2f} {currency}
+        - Top Expense Categories: {top_categories}
+        - Current Accounts: {account_summary}
+
+        Recent Transactions (Sample):
+        """
+
+        if not expenses.empty:
+            recent = expenses.sort_values(['date', 'id'], ascending=False).head(RECENT_SAMPLE)
+            for _, row in recent.iterrows():
+                amt = row['amount_eur'] / conversion_rate
+                context += f"- {row['date'].date()}: {row['description']} ({row['category']}) - {amt:.2f} {currency}\n"
+
+        self.text, self.text_key = context, key
+        return context
+
+
+def get_financial_context():
+    """Context summary for the current user, kept in the session and refreshed incrementally."""
+    user = st.session_state.get('user')
+    if user is None:
+        return "No financial data available (not logged in)."
+    try:
+        ctx = st.session_state.get('assistant_context')
+        if ctx is None or st.session_state.get('assistant_context_user') != user.id:
+            ctx = AssistantContext()
+            st.session_state['assistant_context'] = ctx
+            st.session_state['assistant_context_user'] = user.id
+        ctx.refresh(user.id)
+        return ctx.summary(st.session_state.get('conversion_rate', 1.0), st.session_state.get('currency', 'EUR'))
+    except Exception as e:
+        return f"Error generating context: {e}"
@@ -0,0 +1,189 @@
+"""
+Analytic tools the AI Assistant can call instead of reading raw transactions.
+
+Each tool runs a filtered query through `core.finance_queries`, aggregates it with
+`core.analytics` and returns a small JSON-ready result in the user's display currency,
+so the model can answer about any period without the history being pasted into the prompt.
+"""
+import datetime
+import json
+import time
+
+import pandas as pd
+import streamlit as st
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import tool
+
+from core import analytics
+from core.ai_client import stream_completion
+from core.finance_queries import get_accounts, get_exchange_rates, get_expenses, get_income
+
+# Tool call rounds per question before the model must answer with what it has.
+MAX_TOOL_ROUNDS = 4
+# Rows any single tool result may contain.
+MAX_RESULT_ROWS = 25
+
+
+def _display():
+    return st.session_state.get('conversion_rate', 1.0), st.session_state.get('currency', 'EUR')
+
+
+def _date(value, default=None):
+    if not value:
+        return default
+    return pd.to_datetime(value).date()
+
+
+def _month_range(month):
+    start = pd.Period(month, freq='M')
+    return start.start_time.date(), start.end_time.date()
+
+
+def _totals(frame, by, rate, limit=MAX_RESULT_ROWS):
+    split = analytics.category_split(frame, by).head(limit)
+    return [{by: name, 'total': round(float(total) / rate, 2)} for name, total in zip(split[by], split['amount_eur'])]
+
+
+@tool
+def spend_by_category(start_date: str, end_date: str) -> dict:
+    """Total expenses per category between start_date and end_date (YYYY-MM-DD, inclusive), largest first."""
+    rate, currency = _display()
+    expenses = analytics.normalize_transactions(
+        get_expenses(_date(start_date), _date(end_date), columns=['date', 'amount', 'amount_eur', 'category'])
+    )
+    total = float(expenses['amount_eur'].sum()) / rate if not expenses.empty else 0.0
+    return {'currency': currency, 'total': round(total, 2), 'transactions': len(expenses),
+            'categories': _totals(expenses, 'category', rate)}
+
+
+@tool
+def top_merchants(start_date: str, end_date: str, limit: int = 10) -> dict:
+    """The merchants with the highest spend between start_date and end_date (YYYY-MM-DD, inclusive)."""
+    rate, currency = _display()
+    expenses = analytics.normalize_transactions(
+        get_expenses(_date(start_date), _date(end_date), columns=['date', 'amount', 'amount_eur', 'description', 'vendor'])
+    )
+    top = analytics.top_merchants(expenses, n=min(int(limit), MAX_RESULT_ROWS))
+    return {'currency': currency, 'merchants': [
+        {'merchant': m, 'total': round(float(v) / rate, 2)} for m, v in zip(top['merchant_display'], top['amount_eur'])
+    ]}
+
+
+@tool
+def compare_months(month_a: str, month_b: str) -> dict:
+    """Income, expenses, net and per-category spend for two months (YYYY-MM), with the change from month_a to month_b."""
+    rate, currency = _display()
+    result = {'currency': currency}
+    by_category = {}
+    for label, month in (('month_a', month_a), ('month_b', month_b)):
+        start, end = _month_range(month)
+        expenses = analytics.normalize_transactions(
+            get_expenses(start, end, columns=['date', 'amount', 'amount_eur', 'category'])
+        )
+        income = analytics.normalize_transactions(get_income(start, end, columns=['date', 'amount', 'amount_eur']))
+        totals = analytics.period_totals(expenses, income)
+        result[label] = {
+            'month': month,
+            'income': round(totals['income'] / rate, 2),
+            'expenses': round(totals['expenses'] / rate, 2),
+            'net': round(totals['savings'] / rate, 2),
+        }
+        by_category[label] = {row['category']: row['total'] for row in _totals(expenses, 'category', rate)}
+
+    categories = sorted(set(by_category['month_a']) | set(by_category['month_b']))
+    changes = [{'category': c,
+                'month_a': by_category['month_a'].get(c, 0.0),
+                'month_b': by_category['month_b'].get(c, 0.0),
+                'change': round(by_category['month_b'].get(c, 0.0) - by_category['month_a'].get(c, 0.0), 2)}
+               for c in categories]
+    result['category_changes'] = sorted(changes, key=lambda r: abs(r['change']), reverse=True)[:MAX_RESULT_ROWS]
+    return result
+
+
+@tool
+def monthly_cash_flow(months: int = 12) -> dict:
+    """Income, expenses and net per month for the last `months` months (max 36), oldest first."""
+    rate, currency = _display()
+    months = max(1, min(int(months), 36))
+    end = datetime.date.today()
+    start = (pd.Timestamp(end) - pd.DateOffset(months=months - 1)).replace(day=1).date()
+    expenses = analytics.normalize_transactions(get_expenses(start, end, columns=['date', 'amount', 'amount_eur']))
+    income = analytics.normalize_transactions(get_income(start, end, columns=['date', 'amount', 'amount_eur']))
+    flow = analytics.monthly_cash_flow(expenses, income, months=months, end_date=end)
+    return {'currency': currency, 'months': [
+        {'month': row['Month'], 'income': round(row['Income'] / rate, 2),
+         'expenses': round(row['Expenses'] / rate, 2), 'net': round(row['Net'] / rate, 2)}
+        for _, row in flow.iterrows()
+    ]}
+
+
+@tool
+def account_balances() -> dict:
+    """Current balance of every account in its own currency and in the display currency, plus the total."""
+    rate, currency = _display()
+    accounts = get_accounts()
+    if accounts.empty:
+        return {'currency': currency, 'accounts': [], 'total': 0.0}
+    rates = get_exchange_rates()
+    rows = []
+    for _, acc in accounts.iterrows():
+        balance = float(acc.get('balance') or 0)
+        rows.append({'account': acc['name'], 'balance': round(balance, 2), 'account_currency': acc.get('currency', 'EUR'),
+                     'balance_display': round(balance * rates.get(acc.get('currency', 'EUR'), 1.0) / rate, 2)})
+    return {'currency': currency, 'accounts': rows[:MAX_RESULT_ROWS],
+            'total': round(analytics.net_worth(accounts, rates) / rate, 2)}
+
+
+ASSISTANT_TOOLS = [spend_by_category, top_merchants, compare_months, monthly_cash_flow, account_balances]
+TOOLS_BY_NAME = {t.name: t for t in ASSISTANT_TOOLS}
+
+
+def run_tool_call(call):
+    """Execute one tool call from the model and wrap the result (or error) as a ToolMessage."""
+    selected = TOOLS_BY_NAME.get(call['name'])
+    try:
+        if selected is None:
+            raise ValueError(f"Unknown tool {call['name']}")
+        result = selected.invoke(call['args'])
+    except Exception as e:
+        result = {'error': str(e)}
+    return ToolMessage(content=json.dumps(result, default=str), tool_call_id=call['id'], name=call['name'])
+
+
+def stream_with_tools(llm, messages, metrics, on_tool_call=None, max_rounds=MAX_TOOL_ROUNDS):
+    """
+    Stream an answer while letting the model call ASSISTANT_TOOLS.
+    Text is yielded as it arrives; when a streamed turn ends in tool calls, they are
+    executed, their results appended to `messages`, and the model is streamed again.
+    """
+    bound = llm.bind_tools(ASSISTANT_TOOLS)
+    started = time.perf_counter()
+    metrics.update({'ttft_ms': None, 'total_ms': None, 'chunks': 0, 'chars': 0, 'tool_calls': 0, 'cancelled': False})
+    completed = False
+    try:
+        for round_no in range(max_rounds + 1):
+            # The last round runs without tools so the model has to answer
+            model = bound if round_no < max_rounds else llm
+            chunks = []
+            round_metrics = {}
+            for text in stream_completion(model, messages, round_metrics, chunks=chunks):
+                if metrics['ttft_ms'] is None:
+                    metrics['ttft_ms'] = (time.perf_counter() - started) * 1000
+                yield text
+            metrics['chunks'] += round_metrics['chunks']
+            metrics['chars'] += round_metrics['chars']
+
+            message = sum(chunks[1:], chunks[0]) if chunks else None
+            if message is None or not message.tool_calls:
+                break
+
+            messages.append(message)
+            for call in message.tool_calls:
+                if on_tool_call:
+                    on_tool_call(call)
+                messages.append(run_tool_call(call))
+                metrics['tool_calls'] += 1
+        completed = True
+    finally:
+        metrics['total_ms'] = (time.perf_counter() - started) * 1000
+        metrics['cancelled'] = not completed
@@ -0,0 +1,149 @@
+import copy
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Cached reads expire after this many seconds even without a write.
+CACHE_TTL_SECONDS = 300
+# Upper bounds on what the cache may hold across all users in the process.
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _sizeof(value):
+    """Approximate in-memory size of a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class DataCache:
+    """
+    Read cache for query results, keyed by user and query, validated by per-table data versions.
+    Each entry remembers the version of every table it was built from; a write bumps
+    the version of the tables it touched, so only dependent entries go stale.
+    Entries also expire after `ttl` seconds and are evicted LRU beyond the entry/byte budget.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user_id, query_key) -> (versions, stored_at, size, value)
+        self._versions = {}            # (user_id, table) -> int
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id, table):
+        with self._lock:
+            return self._versions.get((user_id, table), 0)
+
+    def versions(self, user_id, tables):
+        with self._lock:
+            return tuple(self._versions.get((user_id, t), 0) for t in tables)
+
+    def bump(self, user_id, *tables):
+        """Mark the user's data in `tables` as changed."""
+        with self._lock:
+            for table in tables:
+                self._versions[(user_id, table)] = self._versions.get((user_id, table), 0) + 1
+
+    def get(self, user_id, key, tables):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry:
+                versions, stored_at, size, value = entry
+                current = tuple(self._versions.get((user_id, t), 0) for t in tables)
+                if versions == current and time.time() - stored_at < self.ttl:
+                    self._entries.move_to_end((user_id, key))
+                    self.hits += 1
+                    return value
+                self._drop((user_id, key))
+            self.misses += 1
+            return None
+
+    def put(self, user_id, key, versions, value):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop((user_id, key))
+            self._entries[(user_id, key)] = (versions, time.time(), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry:
+            self._bytes -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+@st.cache_resource
+def get_data_cache() -> DataCache:
+    """Process-wide data cache, shared across reruns and sessions."""
+    return DataCache()
+
+
+def _current_user_id():
+    user = st.session_state.get('user')
+    return getattr(user, 'id', None)
+
+
+def _is_empty(value):
+    # Empty results are cheap to refetch and are also what the query helpers return on errors.
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    return not value
+
+
+def cached_query(*tables):
+    """
+    Cache a read helper per user until one of `tables` is written or the TTL passes.
+    Callers get a copy, so pages can keep mutating the frames they receive.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            user_id = _current_user_id()
+            if user_id is None:
+                return func(*args, **kwargs)
+
+            cache = get_data_cache()
+            key = (func.__name__, repr(args), repr(sorted(kwargs.items())))
+            value = cache.get(user_id, key, tables)
+            if value is None:
+                # Snapshot versions before fetching so a concurrent write invalidates this result.
+                versions = cache.versions(user_id, tables)
+                value = func(*args, **kwargs)
+                if _is_empty(value):
+                    return value
+                cache.put(user_id, key, versions, value)
+            return value.copy() if isinstance(value, pd.DataFrame) else copy.deepcopy(value)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Bump the data version of `tables` for the current user after a successful write."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            user_id = _current_user_id()
+            if result is not None and user_id is not None:
+                get_data_cache().bump(user_id, *tables)
+            return result
+        return wrapper
+    return decorator
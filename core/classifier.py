@@ -0,0 +1,186 @@
+"""
+Local merchant -> category/account suggestions learned from the user's own expenses.
+
+The index counts how often each normalized vendor and description token was booked to
+each category and account. It is built once per user and then only reads expenses added
+since the last refresh, so suggestions need no LLM call and almost no database work.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+import pandas as pd
+import streamlit as st
+
+from core.cache import get_data_cache
+from core.finance_queries import iter_rows_after
+
+HISTORY_COLUMNS = ['vendor', 'description', 'category_id', 'account_id']
+
+# Vendor matches are stronger evidence than a shared description word.
+VENDOR_WEIGHT = 1.0
+TOKEN_WEIGHT = 0.35
+# Number of past bookings after which a vendor's category share is fully trusted.
+FULL_SUPPORT = 3
+# Suggestions below this confidence are not used to pre-fill forms.
+SUGGESTION_MIN_CONFIDENCE = 0.5
+
+# Legal forms, store numbers and payment-processor prefixes that vary between bookings.
+_NOISE = re.compile(
+    r'\b(?:b\.?v\.?|n\.?v\.?|ltd|inc|gmbh|llc|plc|pvt|co|www|com|nl|de|in|sumup|zettle|ccv|paypal|'
+    r'pos|upi|vpa|ideal|betaalverzoek)\b'
+)
+_NON_WORD = re.compile(r'[^a-z ]+')
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'from', 'payment', 'paid', 'purchase', 'order', 'card', 'bank',
+    'van', 'aan', 'bij', 'met', 'voor', 'een', 'het', 'ref', 'amount', 'total', 'euro', 'euros',
+}
+
+
+def normalize_vendor(name):
+    """Canonical merchant key: 'ALBERT HEIJN 1234 B.V.' and 'Albert Heijn' both give 'albert heijn'."""
+    if not isinstance(name, str):
+        return ""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    text = text.split('@')[0]  # UPI handles: swiggy@icici -> swiggy
+    text = _NOISE.sub(" ", text)
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def tokens(text):
+    """Distinct informative words of a vendor or description."""
+    if not isinstance(text, str):
+        return set()
+    return {t for t in normalize_vendor(text).split() if len(t) > 2 and t not in STOPWORDS}
+
+
+class MerchantIndex:
+    """Frequency counts of (vendor | token) -> category_id / account_id for one user."""
+
+    def __init__(self):
+        self.vendor_categories = defaultdict(Counter)
+        self.vendor_accounts = defaultdict(Counter)
+        self.token_categories = defaultdict(Counter)
+        self.token_accounts = defaultdict(Counter)
+        self.last_id = 0
+        self.version = None
+        self.rows = 0
+        self.lock = threading.Lock()
+        # Held for a whole refresh, so concurrent reruns never read the same last_id and count rows twice
+        self.refresh_lock = threading.Lock()
+
+    def learn(self, df):
+        """Add expense rows (vendor, description, category_id, account_id) to the counts."""
+        if df is None or df.empty:
+            return
+        frame = df.reindex(columns=['id'] + HISTORY_COLUMNS)
+        for row in frame.itertuples(index=False):
+            category = None if pd.isna(row.category_id) else int(row.category_id)
+            account = None if pd.isna(row.account_id) else int(row.account_id)
+            vendor = normalize_vendor(row.vendor)
+            words = tokens(row.vendor) | tokens(row.description)
+            if category is not None:
+                if vendor:
+                    self.vendor_categories[vendor][category] += 1
+                for word in words:
+                    self.token_categories[word][category] += 1
+            if account is not None:
+                if vendor:
+                    self.vendor_accounts[vendor][account] += 1
+                for word in words:
+                    self.token_accounts[word][account] += 1
+            if not pd.isna(row.id):
+                self.last_id = max(self.last_id, int(row.id))
+            self.rows += 1
+
+    def _vote(self, vendor_counts, token_counts, vendor, words):
+        scores = Counter()
+        support = 0
+        counts = vendor_counts.get(vendor)
+        if counts is None and vendor:
+            # 'albert heijn xl amsterdam' still matches history booked as 'albert heijn'
+            parts = vendor.split()
+            for n in range(len(parts) - 1, 0, -1):
+                counts = vendor_counts.get(" ".join(parts[:n]))
+                if counts:
+                    break
+        if counts:
+            total = sum(counts.values())
+            support += total
+            for label, count in counts.items():
+                scores[label] += VENDOR_WEIGHT * count / total
+        for word in words:
+            counts = token_counts.get(word)
+            if not counts:
+                continue
+            total = sum(counts.values())
+            support += total
+            for label, count in counts.items():
+                scores[label] += TOKEN_WEIGHT * count / total
+        if not scores:
+            return None, 0.0
+        label, score = scores.most_common(1)[0]
+        # Share of the evidence behind the winner, discounted when history is thin
+        confidence = score / sum(scores.values()) * min(1.0, support / FULL_SUPPORT)
+        return label, round(confidence, 3)
+
+    def suggest(self, vendor=None, description=None):
+        """Best category/account guess for a new expense, with a 0-1 confidence for each."""
+        key = normalize_vendor(vendor)
+        words = tokens(vendor) | tokens(description)
+        with self.lock:
+            category_id, category_conf = self._vote(self.vendor_categories, self.token_categories, key, words)
+            account_id, account_conf = self._vote(self.vendor_accounts, self.token_accounts, key, words)
+        return {
+            'category_id': category_id, 'category_confidence': category_conf,
+            'account_id': account_id, 'account_confidence': account_conf,
+        }
+
+
+@st.cache_resource
+def _merchant_indexes():
+    """Process-wide user_id -> MerchantIndex registry."""
+    return {}
+
+
+def get_merchant_index():
+    """The current user's index, refreshed with expenses added since it was last read."""
+    user = st.session_state.get('user')
+    user_id = getattr(user, 'id', None)
+    if user_id is None:
+        return MerchantIndex()
+
+    indexes = _merchant_indexes()
+    index = indexes.setdefault(user_id, MerchantIndex())
+    version = get_data_cache().version(user_id, "expenses")
+    if index.version != version:
+        with index.refresh_lock:
+            # Another rerun may have refreshed the index while this one waited
+            if index.version == version:
+                return index
+            try:
+                for chunk in iter_rows_after("expenses", index.last_id, HISTORY_COLUMNS):
+                    with index.lock:
+                        index.learn(chunk)
+                index.version = version
+            except Exception as e:
+                st.warning(f"Could not refresh merchant suggestions: {e}")
+    return index
+
+
+def suggest_category(vendor=None, description=None):
+    """Category/account suggestion for the current user (see `MerchantIndex.suggest`)."""
+    return get_merchant_index().suggest(vendor, description)
+
+
+def suggestion_names(suggestion, categories_df, accounts_df, min_confidence=SUGGESTION_MIN_CONFIDENCE):
+    """(category name, account name) of a confident suggestion; None where it is unsure."""
+    def name_of(df, key):
+        label = suggestion.get(f'{key}_id')
+        if label is None or suggestion.get(f'{key}_confidence', 0) < min_confidence or df.empty:
+            return None
+        match = df.loc[df['id'] == label, 'name']
+        return match.iloc[0] if not match.empty else None
+    return name_of(categories_df, 'category'), name_of(accounts_df, 'account')
@@ -0,0 +1,171 @@
+"""
+LLM extraction of transaction details from free text (receipts, SMS, emails).
+
+Holds the prompt/parser chain used by the Smart Ingestor, for a single snippet and for
+concurrent batches of snippets.
+"""
+import asyncio
+import email
+import re
+from email import policy
+
+import pandas as pd
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from core.fast_parser import FAST_PATH_MIN_CONFIDENCE, fast_parse
+from core.llm_cache import cache_key
+
+DEFAULT_CONCURRENCY = 5
+# Bump whenever EXTRACTION_TEMPLATE changes so cached results from the old prompt are not reused.
+PROMPT_VERSION = "1"
+
+EXTRACTION_TEMPLATE = """
+                    Extract details:
+                    - date (YYYY-MM-DD)
+                    - amount (float)
+                    - merchant (string)
+                    - category (choose from: {categories})
+                    - account (choose from: {accounts})
+                    - description (short summary)
+
+                    Text: {text}
+
+                    {format_instructions}
+                    """
+
+EXTRACTED_COLUMNS = ['date', 'amount', 'currency', 'merchant', 'category', 'account',
+                     'payment_method', 'description']
+
+
+def build_extraction_chain(llm):
+    """prompt | llm | JSON parser, the chain shared by single and batch extraction."""
+    parser = JsonOutputParser()
+    prompt = PromptTemplate(
+        template=EXTRACTION_TEMPLATE,
+        input_variables=["text", "categories", "accounts"],
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+    return prompt | llm | parser
+
+
+def split_snippets(text):
+    """Split a pasted dump into snippets: blank-line separated blocks, else one per line."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    blocks = [b.strip() for b in re.split(r'\n\s*\n', text) if b.strip()]
+    if len(blocks) == 1:
+        blocks = [line.strip() for line in text.splitlines() if line.strip()]
+    return blocks
+
+
+def read_uploaded_snippet(file_name, data):
+    """Text of an uploaded file; `.eml` files are reduced to subject + plain text body."""
+    if file_name.lower().endswith('.eml'):
+        msg = email.message_from_bytes(data, policy=policy.default)
+        body = msg.get_body(preferencelist=('plain', 'html'))
+        content = body.get_content() if body is not None else ""
+        if body is not None and body.get_content_type() == 'text/html':
+            content = re.sub(r'<[^>]+>', ' ', content)
+        return f"{msg.get('subject', '')}\n{content}".strip()
+    return data.decode('utf-8', errors='replace').strip()
+
+
+def route_fast_path(snippets, min_confidence=FAST_PATH_MIN_CONFIDENCE):
+    """
+    Parse snippets with the rule-based fast path first.
+    Returns (results, pending): results hold the confident rule-based parses, and `pending`
+    lists the indices that still need the LLM.
+    """
+    results = [None] * len(snippets)
+    pending = []
+    for i, snippet in enumerate(snippets):
+        parsed = fast_parse(snippet)
+        if parsed and parsed['confidence'] >= min_confidence:
+            results[i] = parsed
+        else:
+            pending.append(i)
+    return results, pending
+
+
+def model_name(llm):
+    """Model identifier of a chat model, used as part of the cache key."""
+    return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
+
+
+def extract_one(chain, text, categories, accounts, cache=None, model=""):
+    """Extract one snippet, answering from `cache` when the same input was seen before."""
+    key = cache_key(text, PROMPT_VERSION, model, categories, accounts) if cache else None
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    result = chain.invoke({"text": text, "categories": categories, "accounts": accounts})
+    if key and isinstance(result, dict):
+        cache.put(key, result, model)
+    return result
+
+
+async def _extract_many(chain, snippets, categories, accounts, max_concurrency):
+    inputs = [{"text": s, "categories": categories, "accounts": accounts} for s in snippets]
+    return await chain.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+
+def extract_batch(chain, snippets, categories, accounts, max_concurrency=DEFAULT_CONCURRENCY, cache=None, model=""):
+    """
+    Run every snippet through the chain concurrently, at most `max_concurrency` in flight.
+    Returns one result per snippet, in order; failed snippets come back as the exception.
+    Snippets found in `cache` skip the LLM, and repeats within the batch are sent once.
+    """
+    if not snippets:
+        return []
+
+    results = [None] * len(snippets)
+    pending = {}  # cache key (or index without a cache) -> positions waiting on that input
+    for i, snippet in enumerate(snippets):
+        key = cache_key(snippet, PROMPT_VERSION, model, categories, accounts) if cache else i
+        if cache and key not in pending:
+            cached = cache.get(key)
+            if cached is not None:
+                results[i] = cached
+                continue
+        pending.setdefault(key, []).append(i)
+
+    if pending:
+        keys = list(pending)
+        fresh = asyncio.run(_extract_many(
+            chain, [snippets[pending[k][0]] for k in keys], categories, accounts, max_concurrency
+        ))
+        for key, result in zip(keys, fresh):
+            for i in pending[key]:
+                results[i] = result
+            if cache and isinstance(result, dict):
+                cache.put(key, result, model)
+    return results
+
+
+def results_to_frame(snippets, results, default_currency="EUR", default_payment_method="card"):
+    """Flatten batch results into a review grid, one row per snippet with its error if any."""
+    rows = []
+    for snippet, result in zip(snippets, results):
+        row = dict.fromkeys(EXTRACTED_COLUMNS)
+        if isinstance(result, Exception):
+            row['error'] = str(result)[:200]
+        elif isinstance(result, dict):
+            row.update({k: result.get(k) for k in EXTRACTED_COLUMNS})
+            row['error'] = None
+            row['parser'] = result.get('parser', 'llm')
+            row['confidence'] = result.get('confidence')
+        else:
+            row['error'] = "Unexpected response"
+        row['text'] = snippet
+        rows.append(row)
+
+    df = pd.DataFrame(rows, columns=EXTRACTED_COLUMNS + ['parser', 'confidence', 'error', 'text'])
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    df['currency'] = df['currency'].fillna(default_currency)
+    df['payment_method'] = df['payment_method'].fillna(default_payment_method)
+    df['save'] = df['error'].isna() & df['amount'].notna()
+    return df
@@ -0,0 +1,253 @@
+"""
+Rule-based fast path for transaction notifications.
+
+Bank SMS, card push messages and payment emails mostly follow a handful of fixed
+templates. This module extracts amount, currency, date and merchant from them with
+precompiled regexes and scores how sure it is, so the Smart Ingestor only falls back to
+the LLM for text the rules cannot read confidently.
+"""
+import datetime
+import re
+
+# Results at or above this confidence skip the LLM.
+FAST_PATH_MIN_CONFIDENCE = 0.85
+
+# How much each field contributes to the overall confidence.
+FIELD_WEIGHTS = {'amount': 0.4, 'merchant': 0.3, 'date': 0.2, 'currency': 0.1}
+
+CURRENCY_ALIASES = {
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR', 'euros': 'EUR',
+    '$': 'USD', 'usd': 'USD', 'dollar': 'USD', 'dollars': 'USD',
+    '£': 'GBP', 'gbp': 'GBP',
+    '₹': 'INR', 'inr': 'INR', 'rs': 'INR', 'rs.': 'INR',
+}
+
+MONTHS = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+
+
+def parse_number(text):
+    """Parse `1,234.56`, `1.234,56`, `12,50` or `500` into a float (None if unreadable)."""
+    text = re.sub(r'[^\d,.]', '', text or '')
+    if not text:
+        return None
+    if text.rfind(',') > text.rfind('.'):
+        # Comma is the decimal separator only when it is followed by 1-2 digits
+        head, _, tail = text.rpartition(',')
+        text = f"{head.replace('.', '').replace(',', '')}.{tail}" if len(tail) <= 2 else text.replace(',', '')
+    else:
+        text = text.replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_date(text, today=None, dayfirst=True):
+    """Parse the date formats seen in notifications; a missing year means the most recent one."""
+    today = today or datetime.date.today()
+    text = text.strip().rstrip('.,').lower()
+
+    m = re.fullmatch(r'(\d{4})-(\d{1,2})-(\d{1,2})', text)
+    if m:
+        y, mo, d = map(int, m.groups())
+    else:
+        m = re.fullmatch(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})', text)
+        if m:
+            a, b, y = map(int, m.groups())
+            d, mo = (a, b) if dayfirst else (b, a)
+            y = y + 2000 if y < 100 else y
+        else:
+            m = (re.fullmatch(r'(\d{1,2})(?:st|nd|rd|th)?[ -]([a-z]{3})[a-z]*,?(?:[ -](\d{2,4}))?', text)
+                 or re.fullmatch(r'([a-z]{3})[a-z]*[ -](\d{1,2})(?:st|nd|rd|th)?,?(?: (\d{4}))?', text))
+            if not m:
+                return None
+            first, second, y = m.groups()
+            d, mon = (first, second) if first.isdigit() else (second, first)
+            mo = MONTHS.get(mon)
+            if mo is None:
+                return None
+            d = int(d)
+            if y is None:
+                y = today.year if (mo, d) <= (today.month, today.day) else today.year - 1
+            else:
+                y = int(y) + 2000 if int(y) < 100 else int(y)
+    try:
+        return datetime.date(y, mo, d)
+    except ValueError:
+        return None
+
+
+class BankTemplate:
+    """
+    A fixed notification format. `pattern` is matched with `re.search` and uses the named
+    groups `amount` and `merchant`, optionally `currency` and `date`.
+    Fields the template does not capture fall back to `currency`/`payment_method`.
+    """
+
+    def __init__(self, name, pattern, currency=None, payment_method=None, dayfirst=True, flags=re.IGNORECASE):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.currency = currency
+        self.payment_method = payment_method
+        self.dayfirst = dayfirst
+
+    def match(self, text, today=None):
+        m = self.regex.search(text)
+        if not m:
+            return None
+        groups = m.groupdict()
+        amount = parse_number(groups.get('amount'))
+        merchant = (groups.get('merchant') or '').strip(' .,:;')
+        if amount is None or not merchant:
+            return None
+
+        currency = CURRENCY_ALIASES.get((groups.get('currency') or '').strip().lower(), self.currency)
+        date = parse_date(groups['date'], today, self.dayfirst) if groups.get('date') else None
+        # A date the text states but we could not read must not be booked as today
+        unread_date = date is None and (groups.get('date') or _DATE_MENTION.search(text))
+        return _result(
+            text, amount, currency, date, merchant, self.payment_method, parser=f"rules:{self.name}",
+            # A fixed template pins down every field it captures; notifications without a
+            # date are sent as the payment happens, so today is a safe default for them.
+            field_confidence={'amount': 0.98, 'merchant': 0.95,
+                              'currency': 0.98 if currency else 0.5,
+                              'date': 0.98 if date else (0.0 if unread_date else 0.85)},
+            today=today
+        )
+
+
+TEMPLATES = []
+
+
+def register_template(name, pattern, **options):
+    """Add a bank/notification template; templates are tried in registration order."""
+    template = BankTemplate(name, pattern, **options)
+    TEMPLATES.append(template)
+    return template
+
+
+_AMT = r'(?P<amount>\d[\d.,]*\d|\d)'
+_CUR = r'(?P<currency>€|\$|£|₹|rs\.?|inr|eur|usd|gbp)'
+_DATE = r'(?P<date>\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}-[A-Za-z]{3}-\d{2,4}|\d{1,2} [A-Za-z]{3,9}(?: \d{4})?|[A-Za-z]{3,9} \d{1,2}(?:, \d{4})?)'
+_MERCHANT = r'(?P<merchant>[\w&\'*@./ -]+?)'
+_END = r'(?=\s+(?:on|via|using|with|ref|for|at|op)\b|[.,;(\n]|\s*$)'
+
+# Card / wallet push notifications: "You paid €12.50 at Albert Heijn"
+register_template(
+    'card_push',
+    rf'(?:you (?:paid|spent)|payment of|purchase of)\s+{_CUR}\s?{_AMT}\s+(?:at|to)\s+{_MERCHANT}{_END}(?:.*?\bon\s+{_DATE})?',
+    payment_method='card'
+)
+# Indian bank card SMS: "... Card ending 1234 for Rs 500.00 at AMAZON on 2024-10-24"
+register_template(
+    'in_card_sms',
+    rf'card\b.*?\bfor\s+{_CUR}\s?{_AMT}\s+at\s+{_MERCHANT}{_END}(?:\s+on\s+{_DATE})?',
+    payment_method='card'
+)
+# UPI debits: "Rs.500.00 debited from a/c **1234 on 24-10-24 to VPA swiggy@icici"
+register_template(
+    'upi_debit',
+    rf'{_CUR}\s?{_AMT}\s+debited\s+from\s+a/c\s+\S+\s+on\s+{_DATE}\s+to\s+(?:vpa\s+)?{_MERCHANT}{_END}',
+    payment_method='upi'
+)
+# Dutch bank notifications: "Betaling van € 12,50 aan Albert Heijn op 24-10-2024"
+register_template(
+    'nl_betaling',
+    rf'betaling\s+(?:van\s+)?{_CUR}\s?{_AMT}\s+(?:aan|bij)\s+{_MERCHANT}{_END}(?:\s+op\s+{_DATE})?',
+    currency='EUR', payment_method='card'
+)
+# Tikkie requests paid: "Je hebt € 8,50 betaald aan Jan via Tikkie"
+register_template(
+    'tikkie',
+    rf'{_CUR}\s?{_AMT}\s+betaald\s+aan\s+{_MERCHANT}\s+via\s+tikkie',
+    currency='EUR', payment_method='tikkie'
+)
+
+
+# --- Generic extraction (no template matched) ---
+_GENERIC_AMOUNT = re.compile(
+    rf'{_CUR}\s?{_AMT}|(?P<amount2>\d[\d.,]*\d|\d)\s?(?P<currency2>€|eur(?:os?)?|usd|dollars?|gbp|inr|rs)\b',
+    re.IGNORECASE
+)
+# Money arriving, refunds and one-time passwords are not expenses; they go to the LLM.
+_NOT_AN_EXPENSE = re.compile(
+    r'\b(?:credited|received|refund(?:ed)?|otp|one[- ]time password|ontvangen|teruggestort)\b', re.IGNORECASE
+)
+# The generic fallback is only trusted when the text says money left the account.
+_DEBIT_VERB = re.compile(
+    r'\b(?:debited|spent|paid|charged|withdrawn|purchase|payment|betaald|betaling|afgeschreven)\b', re.IGNORECASE
+)
+# Ceiling for generic results without a debit verb: below FAST_PATH_MIN_CONFIDENCE, so they reach the LLM.
+GENERIC_MAX_CONFIDENCE_WITHOUT_DEBIT = 0.75
+# "on <date-like token>": the notification carries a date, whether or not _DATE can read it.
+_DATE_MENTION = re.compile(r'\b(?:on|op|dated)\s+(?:\d|(?:' + '|'.join(MONTHS) + r')[a-z]*\b)', re.IGNORECASE)
+_GENERIC_DATE = re.compile(rf'\b(?:on|dated|op)\s+{_DATE}|\b(?P<iso>\d{{4}}-\d{{2}}-\d{{2}})\b', re.IGNORECASE)
+_GENERIC_MERCHANT = re.compile(rf'\b(?:at|to|@|aan|bij)\s+{_MERCHANT}{_END}', re.IGNORECASE)
+_LEADING_WORDS = re.compile(r'^([A-Z][\w&\']+(?: [A-Z][\w&\']+)*)\s+(?:ride|order|trip|purchase|payment|receipt)\b')
+
+
+def _result(text, amount, currency, date, merchant, payment_method, parser, field_confidence, today=None):
+    confidence = sum(FIELD_WEIGHTS[f] * field_confidence.get(f, 0.0) for f in FIELD_WEIGHTS)
+    return {
+        'date': (date or today or datetime.date.today()).isoformat(),
+        'amount': amount,
+        'currency': currency or 'EUR',
+        'merchant': merchant,
+        'category': None,
+        'account': None,
+        'payment_method': payment_method,
+        'description': " ".join(text.split())[:80],
+        'confidence': round(confidence, 3),
+        'field_confidence': field_confidence,
+        'parser': parser,
+    }
+
+
+def _generic(text, today=None):
+    m = _GENERIC_AMOUNT.search(text)
+    if not m:
+        return None
+    amount = parse_number(m.group('amount') or m.group('amount2'))
+    if amount is None:
+        return None
+    currency = CURRENCY_ALIASES.get((m.group('currency') or m.group('currency2') or '').lower())
+
+    date = None
+    dm = _GENERIC_DATE.search(text)
+    if dm:
+        date = parse_date(dm.group('date') or dm.group('iso'), today)
+
+    merchant = None
+    mm = _GENERIC_MERCHANT.search(text)
+    if mm:
+        merchant = mm.group('merchant').strip(' .,:;')
+    else:
+        lead = _LEADING_WORDS.match(text.strip())
+        merchant = lead.group(1) if lead else None
+
+    result = _result(
+        text, amount, currency, date, merchant, None, parser="rules:generic",
+        field_confidence={'amount': 0.9, 'currency': 0.9 if currency else 0.4,
+                          'date': 0.9 if date else 0.3, 'merchant': (0.8 if mm else 0.6) if merchant else 0.0},
+        today=today
+    )
+    if not _DEBIT_VERB.search(text):
+        result['confidence'] = min(result['confidence'], GENERIC_MAX_CONFIDENCE_WITHOUT_DEBIT)
+    return result
+
+
+def fast_parse(text, today=None):
+    """
+    Extract a transaction from notification text without the LLM.
+    Returns a result dict shaped like the LLM's (plus `confidence`, `field_confidence`
+    and `parser`), or None when no amount can be found or the text is not an expense
+    (a credit, refund or OTP message).
+    """
+    if not text or _NOT_AN_EXPENSE.search(text):
+        return None
+    for template in TEMPLATES:
+        result = template.match(text, today)
+        if result:
+            return result
+    return _generic(text, today)
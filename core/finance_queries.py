@@ -1,8 +1,11 @@
 from core.supabase_client import get_authenticated_client
+from core.cache import cached_query, invalidates
+import io
 import pandas as pd
 import streamlit as st
 
 # --- Helper Functions ---
+@invalidates("categories")
 def add_category(name, type):
     """Add a new category."""
     try:
@@ -19,6 +22,7 @@ def add_category(name, type):
         st.error(f"Error adding category: {e}")
         return None
 
+@cached_query("categories")
 def get_categories(type_filter=None):
     """Fetch categories, optionally filtered by type (expense, income, etc.)."""
     try:
@@ -32,6 +36,7 @@ def get_categories(type_filter=None):
         st.error(f"Error fetching categories: {e}")
         return pd.DataFrame()
 
+@invalidates("accounts")
 def add_account(name, type, balance, currency="EUR"):
     """Add a new account."""
     try:
@@ -54,6 +59,7 @@ def add_account(name, type, balance, currency="EUR"):
         st.error(f"Error adding account: {e}")
         return None
 
+@cached_query("accounts")
 def get_accounts():
     """Fetch all accounts."""
     try:
@@ -76,6 +82,7 @@ def get_exchange_rates():
         st.error(f"Error fetching rates: {e}")
         return {'EUR': 1.0}
 
+@cached_query("profiles")
 def get_user_profile():
     """Fetch user profile from DB."""
     try:
@@ -90,9 +97,137 @@ def get_user_profile():
         # Fail silently or log if needed, but don't break UI
         return None
 
+# --- Transaction Queries ---
+# PostgREST's default max-rows; every request stays within it.
+PAGE_SIZE = 1000
+
+# Output columns that come from embedded resources rather than the table itself.
+JOINED_COLUMNS = {'category': 'categories(name)', 'account': 'accounts(name)'}
+
+DEFAULT_SELECTS = {
+    'expenses': "*, categories(name), accounts(name)",
+    'income': "*, categories(name), accounts(name)",
+    'investments': "*",
+}
+
+# Dtypes applied to every chunk so consumers see the same types on every page.
+CHUNK_DTYPES = {
+    'id': 'Int64',
+    'category_id': 'Int64',
+    'account_id': 'Int64',
+    'amount': 'float64',
+    'amount_eur': 'float64',
+    'units': 'float64',
+    'price_per_unit': 'float64',
+}
+
+def _select_clause(table, columns=None):
+    """Build a PostgREST select clause; `category`/`account` map to their joined names."""
+    if not columns:
+        return DEFAULT_SELECTS.get(table, "*")
+    return ", ".join(JOINED_COLUMNS.get(col, col) for col in columns)
+
+def _typed_chunk(rows):
+    """Flatten joined names and coerce dates/ids/amounts to stable dtypes."""
+    df = pd.json_normalize(rows)
+    df.rename(columns={'categories.name': 'category', 'accounts.name': 'account'}, inplace=True)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    for col, dtype in CHUNK_DTYPES.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+def iter_transactions(table, start_date=None, end_date=None, category_ids=None, account_ids=None,
+                      columns=None, page_size=PAGE_SIZE, descending=False, client=None):
+    """
+    Stream `expenses`, `income` or `investments` as typed DataFrame chunks.
+    Pages are walked by (date, id) keyset instead of OFFSET, so each request is a
+    bounded range scan and no response is silently cut off at the row cap.
+    Pass `client` when iterating outside the script run (session state is not available there).
+    """
+    supabase = client or get_authenticated_client()
+    if columns:
+        columns = list(columns) + [col for col in ('date', 'id') if col not in columns]
+    select = _select_clause(table, columns)
+    op = 'lt' if descending else 'gt'
+
+    last_key = None
+    while True:
+        query = supabase.table(table).select(select)
+        if start_date:
+            query = query.gte("date", str(start_date))
+        if end_date:
+            query = query.lte("date", str(end_date))
+        if category_ids:
+            query = query.in_("category_id", [int(i) for i in category_ids])
+        if account_ids:
+            query = query.in_("account_id", [int(i) for i in account_ids])
+        if last_key:
+            last_date, last_id = last_key
+            # The plain bound lets the (user_id, date, id) index seek; the OR trims the boundary date
+            query = query.lte("date", last_date) if descending else query.gte("date", last_date)
+            query = query.or_(f"date.{op}.{last_date},and(date.eq.{last_date},id.{op}.{last_id})")
+
+        rows = query.order("date", desc=descending).order("id", desc=descending).limit(page_size).execute().data
+        # Stop on an empty page rather than a short one: the server cap may be below page_size.
+        if not rows:
+            return
+        last_key = (rows[-1]['date'], rows[-1]['id'])
+        yield _typed_chunk(rows)
+
+def _fetch_transactions(table, start_date=None, end_date=None, category_ids=None, account_ids=None, columns=None):
+    """Collect every page of a filtered, newest-first query into one DataFrame."""
+    chunks = list(iter_transactions(table, start_date, end_date, category_ids, account_ids, columns, descending=True))
+    if chunks:
+        return pd.concat(chunks, ignore_index=True)
+    return pd.DataFrame()
+
+def iter_rows_after(table, after_id=0, columns=None, start_date=None, page_size=PAGE_SIZE):
+    """Stream rows with id > `after_id` in id order, for indexes that only need new rows."""
+    supabase = get_authenticated_client()
+    select = _select_clause(table, list(dict.fromkeys(['id'] + list(columns))) if columns else None)
+    while True:
+        query = supabase.table(table).select(select).gt("id", int(after_id))
+        if start_date:
+            query = query.gte("date", str(start_date))
+        rows = query.order("id").limit(page_size).execute().data
+        if not rows:
+            return
+        after_id = rows[-1]['id']
+        yield _typed_chunk(rows)
+
+@cached_query("expenses", "income")
+def get_transaction_months(table):
+    """Sorted (year, month) pairs that have rows, computed chunk by chunk from dates only."""
+    try:
+        months = set()
+        for chunk in iter_transactions(table, columns=['date']):
+            months.update(zip(chunk['date'].dt.year, chunk['date'].dt.month))
+        return sorted((int(y), int(m)) for y, m in months)
+    except Exception as e:
+        st.error(f"Error fetching {table} months: {e}")
+        return []
+
+def export_transactions_csv(table, client=None, **filters):
+    """
+    Render a table to CSV one page at a time (for download buttons).
+    Download callables run without the session, so pages pass the `client` they resolved.
+    """
+    buffer = io.StringIO()
+    header = None
+    for chunk in iter_transactions(table, client=client, **filters):
+        if header is None:
+            header = list(chunk.columns)
+            chunk.to_csv(buffer, index=False)
+        else:
+            chunk.reindex(columns=header).to_csv(buffer, index=False, header=False)
+    return buffer.getvalue()
+
 # --- Expenses ---
+@invalidates("expenses", "accounts")
 def add_expense(date, amount, category_id, account_id, description, payment_method, currency="EUR", vendor=None, source="manual"):
-    """Add a new expense with currency conversion."""
+    """Add a new expense; currency conversion and the balance update happen server-side in one call."""
     try:
         supabase = get_authenticated_client()
         user = st.session_state.get('user')
@@ -100,55 +235,39 @@ def add_expense(date, amount, category_id, account_id, description, payment_meth
             st.error("User not authenticated")
             return None
             
-        # Calculate EUR amount
-        rates = get_exchange_rates()
-        rate = rates.get(currency, 1.0)
-        amount_eur = amount * rate
-            
-        data = {
-            "date": str(date),
-            "amount": amount,
-            "currency": currency,
-            "amount_eur": amount_eur,
-            "category_id": category_id,
-            "account_id": account_id,
-            "description": description,
-            "payment_method": payment_method,
-            "vendor": vendor,
-            "source": source,
-            "user_id": user.id
-        }
-        response = supabase.table("expenses").insert(data).execute()
-        
-        # Update Account Balance (Incremental)
-        adjust_account_balance(account_id, -amount_eur)
-        
+        response = supabase.rpc("record_expense", {
+            "p_date": str(date),
+            "p_amount": amount,
+            "p_currency": currency,
+            "p_category_id": category_id,
+            "p_account_id": account_id,
+            "p_description": description,
+            "p_payment_method": payment_method,
+            "p_vendor": vendor,
+            "p_source": source
+        }).execute()
         return response
     except Exception as e:
         st.error(f"Error adding expense: {e}")
         return None
 
-def get_expenses():
-    """Fetch expenses with category and account details."""
+@cached_query("expenses", "categories", "accounts")
+def get_expenses(start_date=None, end_date=None, category_ids=None, account_ids=None, columns=None):
+    """
+    Fetch expenses with category and account details.
+    Date range, category/account filters and the column list are applied by PostgREST,
+    so only the rows and fields a page renders are transferred.
+    """
     try:
-        supabase = get_authenticated_client()
-        response = supabase.table("expenses").select(
-            "*, categories(name), accounts(name)"
-        ).order("date", desc=True).execute()
-        
-        data = response.data
-        if data:
-            df = pd.json_normalize(data)
-            df.rename(columns={'categories.name': 'category', 'accounts.name': 'account'}, inplace=True)
-            return df
-        return pd.DataFrame()
+        return _fetch_transactions("expenses", start_date, end_date, category_ids, account_ids, columns)
     except Exception as e:
         st.error(f"Error fetching expenses: {e}")
         return pd.DataFrame()
 
 # --- Income ---
+@invalidates("income", "accounts")
 def add_income(date, amount, category_id, account_id, source, currency="EUR", notes=None):
-    """Add a new income record."""
+    """Add a new income record; currency conversion and the balance update happen server-side in one call."""
     try:
         supabase = get_authenticated_client()
         user = st.session_state.get('user')
@@ -156,79 +275,217 @@ def add_income(date, amount, category_id, account_id, source, currency="EUR", no
             st.error("User not authenticated")
             return None
             
-        # Calculate EUR amount
-        rates = get_exchange_rates()
-        rate = rates.get(currency, 1.0)
-        amount_eur = amount * rate
-            
-        data = {
-            "date": str(date),
-            "amount": amount,
-            "currency": currency,
-            "amount_eur": amount_eur,
-            "category_id": category_id,
-            "account_id": account_id,
-            "source": source,
-            "notes": notes,
-            "user_id": user.id
-        }
-        response = supabase.table("income").insert(data).execute()
-        
-        # Update Account Balance (Incremental)
-        adjust_account_balance(account_id, amount_eur)
-        
+        response = supabase.rpc("record_income", {
+            "p_date": str(date),
+            "p_amount": amount,
+            "p_currency": currency,
+            "p_category_id": category_id,
+            "p_account_id": account_id,
+            "p_source": source,
+            "p_notes": notes
+        }).execute()
         return response
     except Exception as e:
         st.error(f"Error adding income: {e}")
         return None
 
-def get_income():
-    """Fetch income records."""
+@cached_query("income", "categories", "accounts")
+def get_income(start_date=None, end_date=None, category_ids=None, account_ids=None, columns=None):
+    """Fetch income records, with the same server-side filters as `get_expenses`."""
     try:
-        supabase = get_authenticated_client()
-        response = supabase.table("income").select(
-            "*, categories(name), accounts(name)"
-        ).order("date", desc=True).execute()
-        
-        data = response.data
-        if data:
-            df = pd.json_normalize(data)
-            df.rename(columns={'categories.name': 'category', 'accounts.name': 'account'}, inplace=True)
-            return df
-        return pd.DataFrame()
+        return _fetch_transactions("income", start_date, end_date, category_ids, account_ids, columns)
     except Exception as e:
         st.error(f"Error fetching income: {e}")
         return pd.DataFrame()
 
+# --- Bulk Writes ---
+BULK_COLUMNS = {
+    'expenses': ['date', 'amount', 'currency', 'amount_eur', 'category_id', 'account_id',
+                 'description', 'payment_method', 'vendor', 'source'],
+    'income': ['date', 'amount', 'currency', 'amount_eur', 'category_id', 'account_id',
+               'source', 'notes'],
+}
+
+def prepare_bulk_transactions(df, table, rates=None):
+    """
+    Validate and convert a frame of transactions in one vectorized pass.
+    Returns (rows ready to insert, number of rows dropped as invalid).
+    A row is invalid if it has no parseable date, a non-positive amount or no account.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BULK_COLUMNS[table]), 0
+    if rates is None:
+        rates = get_exchange_rates()
+
+    rows = df.reindex(columns=BULK_COLUMNS[table]).copy()
+    rows['date'] = pd.to_datetime(rows['date'], errors='coerce')
+    rows['amount'] = pd.to_numeric(rows['amount'], errors='coerce')
+    rows['account_id'] = pd.to_numeric(rows['account_id'], errors='coerce')
+    rows['category_id'] = pd.to_numeric(rows['category_id'], errors='coerce')
+
+    valid = rows['date'].notna() & (rows['amount'] > 0) & rows['account_id'].notna()
+    rows = rows[valid].copy()
+
+    rows['date'] = rows['date'].dt.strftime('%Y-%m-%d')
+    rows['currency'] = rows['currency'].fillna('EUR').astype(str).str.upper()
+    rows['amount_eur'] = rows['amount'] * rows['currency'].map(rates).fillna(1.0)
+    rows['account_id'] = rows['account_id'].astype('int64')
+    rows['category_id'] = rows['category_id'].astype('Int64')
+    if table == 'expenses':
+        rows['source'] = rows['source'].fillna('manual')
+    return rows, int((~valid).sum())
+
+# Text column that, with date, amount and account, identifies a stored transaction
+MATCH_TEXT_COLUMNS = {'expenses': 'description', 'income': 'notes'}
+
+def _match_keys(df, text_column, seen=None):
+    """
+    (date, amount, account, text, occurrence) keys; the occurrence keeps repeated identical rows apart.
+    `seen` counts keys from earlier calls and is updated, so occurrences continue across batches.
+    """
+    keys = pd.DataFrame({
+        'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d'),
+        'amount': df['amount'].astype(float).round(2),
+        'account_id': df['account_id'].astype('int64'),
+        'text': df[text_column].fillna('').astype(str),
+    })
+    occurrence = keys.groupby(list(keys.columns)).cumcount()
+    if seen is not None:
+        key = pd.Series(list(zip(*(keys[col] for col in keys.columns))), index=keys.index)
+        occurrence += key.map(seen).fillna(0).astype('int64')
+        for k, count in key.value_counts().items():
+            seen[k] = seen.get(k, 0) + count
+    keys['occurrence'] = occurrence
+    return keys
+
+def get_last_transaction_id(table):
+    """Highest `id` in `table` for the user (0 if none); rows added afterwards have larger ids."""
+    supabase = get_authenticated_client()
+    rows = supabase.table(table).select("id").order("id", desc=True).limit(1).execute().data
+    return int(rows[0]['id']) if rows else 0
+
+def drop_stored_transactions(rows, table, stored_before_id=None, seen=None):
+    """
+    Drop prepared rows whose (date, amount, description, account) is already stored.
+    Identical rows are matched one for one, so two equal rows against one stored copy keep one.
+    For an import written in batches, pass `stored_before_id` (`get_last_transaction_id` before
+    the first batch) so rows the import itself wrote never count as stored, and one `seen` dict
+    for all batches so identical rows are matched one for one across batch boundaries.
+    Returns (rows not yet stored, number of rows dropped).
+    """
+    if rows.empty:
+        return rows, 0
+    text_column = MATCH_TEXT_COLUMNS[table]
+    new = _match_keys(rows, text_column, seen)
+    chunks = list(iter_transactions(table, start_date=rows['date'].min(), end_date=rows['date'].max(),
+                                    account_ids=rows['account_id'].unique(),
+                                    columns=['amount', 'account_id', text_column]))
+    stored = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    if stored_before_id is not None and not stored.empty:
+        stored = stored[stored['id'] <= stored_before_id]
+    if stored.empty:
+        return rows, 0
+
+    stored = _match_keys(stored, text_column)
+    merged = new.merge(stored, how='left', on=list(new.columns), indicator=True)
+    keep = (merged['_merge'] == 'left_only').to_numpy()
+    return rows[keep], int((~keep).sum())
+
+def _records(rows):
+    """JSON-safe records: NaN/NA become None and numpy scalars become Python values."""
+    return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+def _add_bulk(table, rpc_name, df, rates=None, prepared=False):
+    supabase = get_authenticated_client()
+    user = st.session_state.get('user')
+    if not user:
+        st.error("User not authenticated")
+        return None
+
+    rows, dropped = (df, 0) if prepared else prepare_bulk_transactions(df, table, rates)
+    if dropped:
+        st.warning(f"Skipped {dropped} invalid {table} rows (missing date/account or non-positive amount).")
+    if rows.empty:
+        return None
+
+    # One request: multi-row insert plus one net balance delta per account, in one transaction
+    return supabase.rpc(rpc_name, {"p_rows": _records(rows)}).execute()
+
+@invalidates("expenses", "accounts")
+def add_expenses_bulk(df, rates=None, prepared=False):
+    """
+    Insert many expenses at once; `response.data` is the number of rows inserted.
+    Pass `prepared=True` for rows that already went through `prepare_bulk_transactions`.
+    """
+    try:
+        return _add_bulk("expenses", "record_expenses_bulk", df, rates, prepared)
+    except Exception as e:
+        st.error(f"Error adding expenses: {e}")
+        return None
+
+@invalidates("income", "accounts")
+def add_income_bulk(df, rates=None, prepared=False):
+    """
+    Insert many income records at once; `response.data` is the number of rows inserted.
+    Pass `prepared=True` for rows that already went through `prepare_bulk_transactions`.
+    """
+    try:
+        return _add_bulk("income", "record_income_bulk", df, rates, prepared)
+    except Exception as e:
+        st.error(f"Error adding income: {e}")
+        return None
+
+# --- Ingestion Logs ---
+def log_ingestion(source, event, raw_data=None, processed_data=None):
+    """Append an event to ingestion_logs. Best effort: logging never breaks an import."""
+    try:
+        supabase = get_authenticated_client()
+        user = st.session_state.get('user')
+        supabase.table("ingestion_logs").insert({
+            "source": source,
+            "event": event,
+            "raw_data": raw_data,
+            "processed_data": processed_data,
+            "user_id": user.id if user else None
+        }).execute()
+    except Exception as e:
+        st.warning(f"Error logging ingestion: {e}")
+
+@invalidates("accounts")
 def adjust_account_balance(account_id, amount_eur_delta):
-    """Incrementally update account balance."""
+    """Atomically apply a EUR delta to an account balance (converted to the account currency server-side)."""
     try:
         supabase = get_authenticated_client()
+        return supabase.rpc("adjust_account_balance", {
+            "p_account_id": account_id,
+            "p_amount_eur_delta": amount_eur_delta
+        }).execute()
+    except Exception as e:
+        st.error(f"Error adjusting balance: {e}")
+        return None
+
+@cached_query("accounts", "investments")
+def get_net_worth_series(start_date, end_date):
+    """Daily net worth (EUR) from balance snapshots plus cumulative investments, in one RPC call."""
+    try:
+        supabase = get_authenticated_client()
+        response = supabase.rpc("net_worth_series", {
+            "p_start": str(start_date),
+            "p_end": str(end_date)
+        }).execute()
         
-        # Fetch account details
-        acc_res = supabase.table("accounts").select("currency, balance").eq("id", account_id).single().execute()
-        if not acc_res.data: return
-        
-        currency = acc_res.data.get('currency', 'EUR')
-        current_balance = acc_res.data.get('balance', 0.0)
-        if current_balance is None: current_balance = 0.0
-        
-        # Convert delta to Account Currency
-        rates = get_exchange_rates()
-        rate = rates.get(currency, 1.0)
-        if not rate: rate = 1.0
-        
-        amount_native_delta = amount_eur_delta / rate
-        
-        new_balance = current_balance + amount_native_delta
-        
-        # Update account
-        supabase.table("accounts").update({"balance": new_balance}).eq("id", account_id).execute()
-        
+        data = response.data
+        if data:
+            df = pd.DataFrame(data)
+            df['date'] = pd.to_datetime(df['date'])
+            return df
+        return pd.DataFrame()
     except Exception as e:
-        print(f"Error adjusting balance: {e}")
+        st.error(f"Error fetching net worth history: {e}")
+        return pd.DataFrame()
 
 # --- Savings ---
+@invalidates("saving_goals")
 def add_saving_goal(name, target_amount, deadline, notes=None):
     """Add a new savings goal."""
     try:
@@ -251,6 +508,7 @@ def add_saving_goal(name, target_amount, deadline, notes=None):
         st.error(f"Error adding savings goal: {e}")
         return None
 
+@cached_query("saving_goals")
 def get_saving_goals():
     """Fetch all savings goals."""
     try:
@@ -262,6 +520,7 @@ def get_saving_goals():
         return pd.DataFrame()
 
 # --- Investments ---
+@invalidates("investments")
 def add_investment(date, amount, instrument_name, investment_type, action, account_id, category_id, units, price_per_unit, currency="EUR"):
     """Add a new investment transaction with currency conversion."""
     try:
@@ -297,48 +556,81 @@ def add_investment(date, amount, instrument_name, investment_type, action, accou
         st.error(f"Error adding investment: {e}")
         return None
 
+@cached_query("investments")
 def get_investments():
     """Fetch all investments."""
     try:
-        supabase = get_authenticated_client()
-        response = supabase.table("investments").select("*").execute()
-        return pd.DataFrame(response.data)
+        return _fetch_transactions("investments")
     except Exception as e:
         st.error(f"Error fetching investments: {e}")
         return pd.DataFrame()
 
+@cached_query("investments")
+def get_investments_total():
+    """Total invested in EUR, summed page by page so the full history never sits in memory."""
+    try:
+        total = 0.0
+        for chunk in iter_transactions("investments", columns=['amount', 'amount_eur']):
+            total += float(chunk['amount_eur'].fillna(chunk['amount']).sum())
+        return total
+    except Exception as e:
+        st.error(f"Error fetching investments: {e}")
+        return 0.0
+
 # --- Budgets ---
+# The unique key of budgets (database/migration_budgets_unique.sql), used as the upsert target.
+BUDGET_KEY = "user_id,category_id,month"
+
+@invalidates("budgets")
+def save_budgets(month, amounts):
+    """Set the budgets of `month` ("YYYY-MM") from {category_id: amount} in one upsert."""
+    try:
+        supabase = get_authenticated_client()
+        user = st.session_state.get('user')
+        if not user:
+            st.error("User not authenticated")
+            return None
+
+        rows = [{"category_id": int(category_id), "budget_amount": float(amount), "month": month, "user_id": user.id}
+                for category_id, amount in amounts.items()]
+        if not rows:
+            return None
+        return supabase.table("budgets").upsert(rows, on_conflict=BUDGET_KEY).execute()
+    except Exception as e:
+        st.error(f"Error saving budgets: {e}")
+        return None
+
+@invalidates("budgets")
 def add_budget(category_id, amount, month):
     """Add or update a budget for a category and month."""
+    return save_budgets(month, {category_id: amount})
+
+@invalidates("budgets")
+def copy_budgets(month, months=1, overwrite=False):
+    """
+    Copy every budget of `month` to each of the next `months` months in one upsert.
+    Budgets already set in those months are kept unless `overwrite`.
+    """
     try:
         supabase = get_authenticated_client()
         user = st.session_state.get('user')
         if not user:
             st.error("User not authenticated")
             return None
-            
-        # Check if budget exists
-        existing = supabase.table("budgets").select("id").eq("category_id", category_id).eq("month", month).execute()
-        
-        data = {
-            "category_id": category_id,
-            "budget_amount": amount,
-            "month": month,
-            "user_id": user.id
-        }
-        
-        if existing.data:
-            # Update
-            response = supabase.table("budgets").update(data).eq("id", existing.data[0]['id']).execute()
-        else:
-            # Insert
-            response = supabase.table("budgets").insert(data).execute()
-            
-        return response
+
+        source = supabase.table("budgets").select("category_id, budget_amount").eq("month", month).execute().data
+        start = pd.Period(month, freq="M")
+        rows = [{"category_id": b['category_id'], "budget_amount": b['budget_amount'],
+                 "month": (start + n).strftime("%Y-%m"), "user_id": user.id}
+                for n in range(1, months + 1) for b in source]
+        if not rows:
+            return None
+        return supabase.table("budgets").upsert(rows, on_conflict=BUDGET_KEY, ignore_duplicates=not overwrite).execute()
     except Exception as e:
-        st.error(f"Error saving budget: {e}")
+        st.error(f"Error copying budgets: {e}")
         return None
 
+@cached_query("budgets", "categories")
 def get_budgets(month):
     """Fetch budgets for a specific month."""
     try:
@@ -354,42 +646,50 @@ def get_budgets(month):
     except Exception as e:
         st.error(f"Error fetching budgets: {e}")
         return pd.DataFrame()
+@invalidates("transfers", "accounts")
 def add_transfer(date, amount, source_id, dest_id, notes, dest_amount=None, exchange_rate=1.0):
     """
     Records a transfer between two accounts and updates their balances.
     Supports cross-currency transfers if dest_amount is provided.
+    Both legs are applied in a single server-side transaction.
     """
     try:
         supabase = get_authenticated_client()
-        # If dest_amount is not provided, assume same currency (1:1)
-        final_dest_amount = dest_amount if dest_amount is not None else amount
-        
-        # 1. Record Transfer
-        response = supabase.table('transfers').insert({
-            "date": str(date),
-            "amount": amount,
-            "source_account_id": source_id,
-            "destination_account_id": dest_id,
-            "notes": notes,
-            "destination_amount": final_dest_amount,
-            "exchange_rate": exchange_rate
+        # If dest_amount is not provided, the server assumes same currency (1:1)
+        response = supabase.rpc("record_transfer", {
+            "p_date": str(date),
+            "p_amount": amount,
+            "p_source_account_id": source_id,
+            "p_destination_account_id": dest_id,
+            "p_notes": notes,
+            "p_destination_amount": dest_amount,
+            "p_exchange_rate": exchange_rate
         }).execute()
-        
-        # 2. Update Source Account (Decrease Balance)
-        src_res = supabase.table('accounts').select('balance').eq('id', source_id).execute()
-        if src_res.data:
-            curr_src = src_res.data[0]['balance']
-            new_src = curr_src - amount
-            supabase.table('accounts').update({'balance': new_src}).eq('id', source_id).execute()
-            
-        # 3. Update Destination Account (Increase Balance)
-        dest_res = supabase.table('accounts').select('balance').eq('id', dest_id).execute()
-        if dest_res.data:
-            curr_dest = dest_res.data[0]['balance']
-            new_dest = curr_dest + final_dest_amount
-            supabase.table('accounts').update({'balance': new_dest}).eq('id', dest_id).execute()
-            
         return response
     except Exception as e:
         st.error(f"Error adding transfer: {e}")
         return None
+
+# --- Admin ---
+# Global stats are cheap to refresh but not worth a round trip on every rerun.
+ADMIN_STATS_TTL_SECONDS = 60
+
+@st.cache_data(ttl=ADMIN_STATS_TTL_SECONDS, show_spinner=False)
+def _fetch_system_stats(user_id, top_n):
+    # Keyed by caller so a cached answer is never served to a user the RPC would refuse
+    return get_authenticated_client().rpc("admin_system_stats", {"p_top_n": top_n}).execute().data
+
+def get_system_stats(top_n=10):
+    """Cross-user counts from the `admin_system_stats` RPC (admins only), cached briefly."""
+    user = st.session_state.get('user')
+    if not user:
+        return None
+    try:
+        return _fetch_system_stats(user.id, top_n)
+    except Exception as e:
+        st.error(f"Error fetching system stats: {e}")
+        return None
+
+def refresh_system_stats():
+    """Drop the cached system stats so the next `get_system_stats` call reads fresh counts."""
+    _fetch_system_stats.clear()
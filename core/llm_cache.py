@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import streamlit as st
+
+# Where extraction results are persisted; override with LIFEOS_LLM_CACHE_PATH.
+LLM_CACHE_PATH = os.environ.get("LIFEOS_LLM_CACHE_PATH", os.path.join(".cache", "llm_extraction.sqlite"))
+# Least recently used entries are evicted beyond these bounds.
+LLM_CACHE_MAX_ENTRIES = 20000
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_text(text):
+    """Canonical form of an input snippet: Unicode-normalized with whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def cache_key(text, prompt_version, model, categories=(), accounts=()):
+    """Content address of one extraction: everything that can change the LLM's answer."""
+    payload = json.dumps(
+        [normalize_text(text), prompt_version, model, list(categories), list(accounts)],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent JSON result cache for LLM calls, stored in SQLite.
+    Only the key hash is stored, never the input text. Entries are evicted least recently
+    used once the entry or byte budget is exceeded; hits/misses are counted per process
+    and per entry.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key        TEXT PRIMARY KEY,
+                value      TEXT NOT NULL,
+                model      TEXT,
+                size       INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL,
+                hits       INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used_idx ON llm_cache(last_used)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, value, model=None):
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, model, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, model, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+        while total > self.max_bytes:
+            # Drop the oldest tenth of entries at a time rather than one row per statement
+            batch = max(1, count // 10)
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                (batch,)
+            )
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size, entry_hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM llm_cache"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "lifetime_hits": entry_hits,
+            }
+
+
+@st.cache_resource
+def get_llm_cache() -> LLMCache:
+    """Process-wide extraction cache, shared across reruns and sessions."""
+    return LLMCache()
@@ -0,0 +1,896 @@
+"""
+Local stand-in for the Supabase backend.
+
+`LocalClient` answers the part of the supabase-py interface the app uses (`table()` query
+builders with PostgREST filters and `categories(name)` / `accounts(name)` embeds, the
+transaction RPCs and `auth` sign-in) against SQLite. Every table is scoped to the
+signed-in user the way the RLS policies scope it, so pages, benchmarks and load tests
+can run offline and deterministically. Selected with `LIFEOS_STORAGE=local`.
+"""
+import datetime
+import hashlib
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from postgrest.exceptions import APIError
+
+# Where the local database lives; override with LIFEOS_LOCAL_DB (":memory:" for a throwaway one).
+LOCAL_DB_PATH = os.environ.get("LIFEOS_LOCAL_DB", os.path.join(".cache", "lifeos_local.sqlite"))
+# PostgREST's max-rows; local responses are capped the same way.
+LOCAL_MAX_ROWS = 1000
+PASSWORD_HASH_ITERATIONS = 100_000
+
+# Tables and columns as they stand after database/*.sql; numerics are REAL, dates ISO text.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS auth_users (
+    id              TEXT PRIMARY KEY,
+    email           TEXT UNIQUE NOT NULL,
+    password_hash   TEXT NOT NULL,
+    user_metadata   TEXT,
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    id              TEXT PRIMARY KEY REFERENCES auth_users(id) ON DELETE CASCADE,
+    email           TEXT,
+    full_name       TEXT,
+    avatar_url      TEXT,
+    role            TEXT NOT NULL DEFAULT 'user',
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    currency_code   TEXT PRIMARY KEY,
+    rate_to_eur     REAL NOT NULL,
+    updated_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    name            TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    name            TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    balance         REAL,
+    currency        TEXT DEFAULT 'EUR',
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    date            TEXT NOT NULL,
+    amount          REAL NOT NULL,
+    currency        TEXT DEFAULT 'EUR',
+    amount_eur      REAL,
+    category_id     INTEGER REFERENCES categories(id),
+    account_id      INTEGER REFERENCES accounts(id),
+    vendor          TEXT,
+    description     TEXT,
+    payment_method  TEXT,
+    source          TEXT,
+    metadata        TEXT,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS income (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    date            TEXT NOT NULL,
+    amount          REAL NOT NULL,
+    currency        TEXT DEFAULT 'EUR',
+    amount_eur      REAL,
+    category_id     INTEGER REFERENCES categories(id),
+    account_id      INTEGER REFERENCES accounts(id),
+    source          TEXT,
+    notes           TEXT,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS investments (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    date            TEXT NOT NULL,
+    amount          REAL NOT NULL,
+    currency        TEXT DEFAULT 'EUR',
+    amount_eur      REAL,
+    instrument_name TEXT,
+    symbol          TEXT,
+    investment_type TEXT,
+    units           REAL,
+    price_per_unit  REAL,
+    metal_weight    REAL,
+    metal_purity    REAL,
+    metal_rate      REAL,
+    account_id      INTEGER REFERENCES accounts(id),
+    category_id     INTEGER REFERENCES categories(id),
+    action          TEXT,
+    source          TEXT,
+    metadata        TEXT,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS saving_goals (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    goal_name       TEXT NOT NULL,
+    target_amount   REAL,
+    deadline        TEXT,
+    notes           TEXT,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    month           TEXT NOT NULL,
+    category_id     INTEGER REFERENCES categories(id),
+    budget_amount   REAL,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    date                    TEXT NOT NULL,
+    amount                  REAL NOT NULL,
+    source_account_id       INTEGER REFERENCES accounts(id),
+    destination_account_id  INTEGER REFERENCES accounts(id),
+    notes                   TEXT,
+    destination_amount      REAL,
+    exchange_rate           REAL,
+    user_id                 TEXT REFERENCES auth_users(id),
+    created_at              TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS balance_history (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id      INTEGER REFERENCES accounts(id),
+    date            TEXT NOT NULL,
+    balance         REAL,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS balance_history_account_date_key ON balance_history(account_id, date);
+CREATE TABLE IF NOT EXISTS ingestion_logs (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    source          TEXT NOT NULL,
+    event           TEXT NOT NULL,
+    raw_data        TEXT,
+    processed_data  TEXT,
+    user_id         TEXT REFERENCES auth_users(id),
+    created_at      TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- database/migration_indexes.sql
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date_id ON expenses(user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_id_id ON expenses(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_income_user_date_id ON income(user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_income_user_id_id ON income(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_investments_user_date_id ON investments(user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_investments_user_id_id ON investments(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_budgets_user_month_category ON budgets(user_id, month, category_id);
+CREATE INDEX IF NOT EXISTS idx_balance_history_user_date ON balance_history(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_user_created ON ingestion_logs(user_id, created_at);
+-- database/migration_rls_initplan.sql
+CREATE INDEX IF NOT EXISTS idx_categories_user_type ON categories(user_id, type);
+CREATE INDEX IF NOT EXISTS idx_accounts_user ON accounts(user_id);
+CREATE INDEX IF NOT EXISTS idx_saving_goals_user ON saving_goals(user_id);
+-- database/migration_budgets_unique.sql (the DELETE is a no-op once the index exists)
+DELETE FROM budgets WHERE id NOT IN (SELECT MAX(id) FROM budgets GROUP BY user_id, category_id, month);
+CREATE UNIQUE INDEX IF NOT EXISTS budgets_user_category_month_key ON budgets(user_id, category_id, month);
+
+CREATE TRIGGER IF NOT EXISTS on_account_insert_snapshot AFTER INSERT ON accounts
+BEGIN
+    INSERT INTO balance_history (account_id, date, balance, user_id)
+    VALUES (NEW.id, date('now'), COALESCE(NEW.balance, 0), NEW.user_id)
+    ON CONFLICT (account_id, date) DO UPDATE SET balance = excluded.balance;
+END;
+CREATE TRIGGER IF NOT EXISTS on_account_balance_change AFTER UPDATE OF balance ON accounts
+BEGIN
+    INSERT INTO balance_history (account_id, date, balance, user_id)
+    VALUES (NEW.id, date('now'), COALESCE(NEW.balance, 0), NEW.user_id)
+    ON CONFLICT (account_id, date) DO UPDATE SET balance = excluded.balance;
+END;
+
+INSERT OR IGNORE INTO exchange_rates (currency_code, rate_to_eur) VALUES
+    ('EUR', 1.0), ('USD', 0.92), ('GBP', 1.17), ('INR', 0.011);
+"""
+
+# Columns added by later migrations, applied to local databases created before them.
+ADDED_COLUMNS = [
+    ('profiles', 'role', "TEXT NOT NULL DEFAULT 'user'"),
+]
+
+# Tables whose rows belong to a user, and the column that says which one (the RLS predicate).
+OWNER_COLUMNS = {
+    'profiles': 'id',
+    'categories': 'user_id',
+    'accounts': 'user_id',
+    'expenses': 'user_id',
+    'income': 'user_id',
+    'investments': 'user_id',
+    'saving_goals': 'user_id',
+    'budgets': 'user_id',
+    'transfers': 'user_id',
+    'balance_history': 'user_id',
+    'ingestion_logs': 'user_id',
+}
+# Columns clients may not write (like the column grants on profiles).
+PROTECTED_COLUMNS = {'profiles': {'role'}}
+# Readable by every caller, writable by none (like the "Everyone can read rates" policy).
+PUBLIC_TABLES = {'exchange_rates'}
+JSON_COLUMNS = {'metadata', 'raw_data', 'processed_data'}
+# Embeddable resources and the foreign key that reaches them.
+EMBEDS = {'categories': 'category_id', 'accounts': 'account_id'}
+
+FILTER_OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+                    'like': 'LIKE', 'ilike': 'LIKE'}
+
+# Same fallback as public.rate_to_eur: 1.0 for unknown or zero rates.
+RATE_TO_EUR_SQL = ("COALESCE((SELECT NULLIF(rate_to_eur, 0) FROM exchange_rates "
+                   "WHERE currency_code = COALESCE({currency}, 'EUR')), 1.0)")
+
+
+def _error(message, code="PGRST000"):
+    return APIError({"message": message, "code": code, "hint": None, "details": None})
+
+
+def _split_top_level(text):
+    """Split on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == ',' and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += (char == '(') - (char == ')')
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+class LocalDatabase:
+    """One SQLite database shared by every local client; writes run one transaction at a time."""
+
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        for table, column, definition in ADDED_COLUMNS:
+            existing = [row['name'] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        self._columns = {}
+        self._not_null = {}
+
+    def columns(self, table):
+        if table not in self._columns:
+            rows = self._conn.execute(f"PRAGMA table_info({table})").fetchall()
+            if not rows:
+                raise _error(f"relation \"public.{table}\" does not exist", "42P01")
+            self._columns[table] = [row['name'] for row in rows]
+            self._not_null[table] = {row['name'] for row in rows if row['notnull'] or row['pk']}
+        return self._columns[table]
+
+    def not_null(self, table):
+        """Columns that can never be NULL (so ordering needs no NULLS clause)."""
+        self.columns(table)
+        return self._not_null[table]
+
+    def set_role(self, email, role):
+        """Set a profile's role, as `UPDATE profiles SET role = ...` in the SQL editor does; clients cannot."""
+        with self.transaction() as conn:
+            updated = conn.execute("UPDATE profiles SET role = ? WHERE email = ?", (role, email)).rowcount
+        if not updated:
+            raise ValueError(f"No profile for {email}")
+
+    @contextmanager
+    def transaction(self):
+        """Run the block atomically, like one PostgREST request or RPC call."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        self._conn.close()
+
+
+def _decode(row):
+    record = dict(row)
+    for col in JSON_COLUMNS.intersection(record):
+        if record[col] is not None:
+            record[col] = json.loads(record[col])
+    return record
+
+
+def _encode(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class LocalQuery:
+    """A PostgREST-style request builder; nothing runs until `execute()`."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.db = client.db
+        self.table = table
+        self.columns = self.db.columns(table)
+        self.action = 'select'
+        self.select_clause = '*'
+        self.count_mode = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.conditions = []
+        self.params = []
+        self.orders = []
+        self.limit_rows = None
+        self.offset_rows = 0
+        self.single_row = None
+
+    # --- Actions ---
+    def select(self, columns="*", count=None):
+        self.select_clause = columns
+        self.count_mode = count
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload, self.on_conflict = 'upsert', data, on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data):
+        self.action, self.payload = 'update', data
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # --- Filters ---
+    def _column(self, name):
+        if name not in self.columns:
+            raise _error(f"column {self.table}.{name} does not exist", "42703")
+        return f't."{name}"'
+
+    def _condition(self, column, op, value):
+        col = self._column(column)
+        if op == 'in':
+            values = list(value)
+            if not values:
+                return "FALSE", []
+            return f"{col} IN ({', '.join('?' * len(values))})", [_encode(v) for v in values]
+        if op == 'is':
+            keyword = {None: 'NULL', 'null': 'NULL', True: 'TRUE', 'true': 'TRUE', False: 'FALSE', 'false': 'FALSE'}
+            return f"{col} IS {keyword[value]}", []
+        if op not in FILTER_OPERATORS:
+            raise _error(f"unsupported operator {op}", "PGRST100")
+        sql = f"{col} {FILTER_OPERATORS[op]} ?"
+        if op == 'like':
+            # PostgREST LIKE is case sensitive; SQLite's is not unless asked
+            sql = f"{col} GLOB ?"
+            value = str(value).replace('%', '*').replace('_', '?')
+        elif op == 'ilike':
+            value = str(value).replace('*', '%')
+        return sql, [_encode(value)]
+
+    def _filter(self, column, op, value):
+        sql, params = self._condition(column, op, value)
+        self.conditions.append(sql)
+        self.params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def like(self, column, pattern):
+        return self._filter(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, 'ilike', pattern)
+
+    def is_(self, column, value):
+        return self._filter(column, 'is', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'in', values)
+
+    def _logic_tree(self, expression, joiner):
+        """Compile a PostgREST logic tree such as `date.gt.X,and(date.eq.X,id.gt.Y)`."""
+        clauses, params = [], []
+        for part in _split_top_level(expression):
+            nested = re.match(r'^(and|or)\((.*)\)$', part)
+            if nested:
+                sql, values = self._logic_tree(nested.group(2), nested.group(1).upper())
+            else:
+                column, op, value = part.split('.', 2)
+                if op == 'in':
+                    value = [v.strip().strip('"') for v in value.strip('()').split(',')]
+                sql, values = self._condition(column, op, value)
+            clauses.append(f"({sql})")
+            params.extend(values)
+        return f" {joiner} ".join(clauses), params
+
+    def or_(self, filters):
+        sql, params = self._logic_tree(filters, 'OR')
+        self.conditions.append(f"({sql})")
+        self.params.extend(params)
+        return self
+
+    # --- Modifiers ---
+    def order(self, column, desc=False):
+        # PostgREST default: NULLS LAST ascending, NULLS FIRST descending. SQLite only walks an
+        # index backwards for plain DESC, so the clause is left out where NULLs cannot occur.
+        nulls = "" if column in self.db.not_null(self.table) else (" NULLS FIRST" if desc else " NULLS LAST")
+        self.orders.append(f"{self._column(column)} {'DESC' if desc else 'ASC'}{nulls}")
+        return self
+
+    def limit(self, size):
+        self.limit_rows = int(size)
+        return self
+
+    def range(self, start, end):
+        self.offset_rows = int(start)
+        self.limit_rows = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        self.single_row = 'single'
+        return self
+
+    def maybe_single(self):
+        self.single_row = 'maybe'
+        return self
+
+    # --- Execution ---
+    def _scope(self):
+        """The RLS predicate for this table: rows owned by the caller."""
+        owner = OWNER_COLUMNS.get(self.table)
+        if owner is None:
+            return [], []
+        return [f't."{owner}" = ?'], [self.client.user_id]
+
+    def _embeds(self):
+        """Resolve the select list into base columns and embedded resources."""
+        base, embeds = [], []
+        for item in _split_top_level(self.select_clause or '*'):
+            nested = re.match(r'^(?:(\w+):)?(\w+)\((.*)\)$', item)
+            if nested:
+                alias, resource, cols = nested.groups()
+                if resource not in EMBEDS or EMBEDS[resource] not in self.columns:
+                    raise _error(f"Could not find a relationship between '{self.table}' and '{resource}'", "PGRST200")
+                embed_cols = self.db.columns(resource) if cols.strip() == '*' else _split_top_level(cols)
+                for col in embed_cols:
+                    if col not in self.db.columns(resource):
+                        raise _error(f"column {resource}.{col} does not exist", "42703")
+                embeds.append((alias or resource, resource, embed_cols))
+            elif item == '*':
+                base.extend(self.columns)
+            else:
+                self._column(item)
+                base.append(item)
+        return list(dict.fromkeys(base)), embeds
+
+    def select_sql(self):
+        """The SQL and parameters a select runs (also replayed by benchmarks/index_advisor.py)."""
+        base, embeds = self._embeds()
+        scope, scope_params = self._scope()
+        fields = [f't."{col}" AS "{col}"' for col in base]
+        joins, join_params = [], []
+        for n, (alias, resource, cols) in enumerate(embeds):
+            # Embedded rows are subject to their own table's policies too
+            joins.append(f'LEFT JOIN {resource} e{n} ON e{n}.id = t."{EMBEDS[resource]}" '
+                         f'AND e{n}."{OWNER_COLUMNS[resource]}" = ?')
+            join_params.append(self.client.user_id)
+            fields += [f'e{n}."{col}" AS "{alias}.{col}"' for col in cols]
+            fields.append(f'e{n}.id IS NOT NULL AS "{alias}.__present"')
+
+        where = " AND ".join(scope + self.conditions) or "TRUE"
+        sql = f"SELECT {', '.join(fields) or 't.id'} FROM {self.table} t {' '.join(joins)} WHERE {where}"
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self.orders)
+        limit = min(self.limit_rows, LOCAL_MAX_ROWS) if self.limit_rows is not None else LOCAL_MAX_ROWS
+        sql += f" LIMIT {limit} OFFSET {self.offset_rows}"
+        return sql, join_params + scope_params + self.params
+
+    def _run_select(self, conn):
+        sql, params = self.select_sql()
+        base, embeds = self._embeds()
+        data = []
+        for row in conn.execute(sql, params).fetchall():
+            record = _decode({col: row[col] for col in base})
+            for alias, _, cols in embeds:
+                record[alias] = {col: row[f"{alias}.{col}"] for col in cols} if row[f"{alias}.__present"] else None
+            data.append(record)
+
+        count = None
+        if self.count_mode:
+            scope, scope_params = self._scope()
+            where = " AND ".join(scope + self.conditions) or "TRUE"
+            count = conn.execute(f"SELECT COUNT(*) FROM {self.table} t WHERE {where}", scope_params + self.params).fetchone()[0]
+        return data, count
+
+    def _check_writable(self, columns):
+        protected = PROTECTED_COLUMNS.get(self.table, set()).intersection(columns)
+        if protected:
+            raise _error(f"permission denied for table {self.table} (column {', '.join(sorted(protected))})", "42501")
+
+    def _rows(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        owner = OWNER_COLUMNS.get(self.table)
+        prepared = []
+        for row in rows:
+            row = dict(row)
+            if owner:
+                # WITH CHECK (auth.uid() = user_id); an omitted owner defaults to the caller
+                row.setdefault(owner, self.client.user_id)
+            if self.table in PUBLIC_TABLES or (owner and (row[owner] is None or row[owner] != self.client.user_id)):
+                raise _error(f'new row violates row-level security policy for table "{self.table}"', "42501")
+            for col in row:
+                self._column(col)
+            self._check_writable(row)
+            prepared.append(row)
+        return prepared
+
+    def _run_insert(self, conn):
+        data = []
+        for row in self._rows():
+            cols = list(row)
+            sql = f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+            if self.action == 'upsert':
+                target = self.on_conflict or 'id'
+                updates = [] if self.ignore_duplicates else [c for c in cols if c not in target.split(',')]
+                sql += f" ON CONFLICT ({target}) DO " + (
+                    "UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates) if updates else "NOTHING")
+            sql += " RETURNING *"
+            data.extend(_decode(r) for r in conn.execute(sql, [_encode(row[c]) for c in cols]).fetchall())
+        return data
+
+    def _run_update(self, conn):
+        if self.table in PUBLIC_TABLES:
+            raise _error(f'permission denied for table {self.table}', "42501")
+        scope, scope_params = self._scope()
+        where = " AND ".join(scope + self.conditions) or "TRUE"
+        if self.action == 'delete':
+            sql, params = f"DELETE FROM {self.table} AS t WHERE {where} RETURNING *", scope_params + self.params
+        else:
+            owner = OWNER_COLUMNS.get(self.table)
+            if owner in self.payload and self.payload[owner] != self.client.user_id:
+                raise _error(f'new row violates row-level security policy for table "{self.table}"', "42501")
+            cols = list(self.payload)
+            self._check_writable(cols)
+            assignments = ", ".join(f'{self._column(c).split(".", 1)[1]} = ?' for c in cols)
+            sql = f"UPDATE {self.table} AS t SET {assignments} WHERE {where} RETURNING *"
+            params = [_encode(self.payload[c]) for c in cols] + scope_params + self.params
+        return [_decode(r) for r in conn.execute(sql, params).fetchall()]
+
+    def execute(self):
+        count = None
+        try:
+            with self.db.transaction() as conn:
+                if self.action == 'select':
+                    data, count = self._run_select(conn)
+                elif self.action in ('insert', 'upsert'):
+                    data = self._run_insert(conn)
+                else:
+                    data = self._run_update(conn)
+        except sqlite3.IntegrityError as e:
+            raise _error(str(e), "23505" if "UNIQUE" in str(e) else "23503")
+
+        if self.single_row:
+            if len(data) > 1 or (self.single_row == 'single' and not data):
+                raise _error("JSON object requested, multiple (or no) rows returned", "PGRST116")
+            data = data[0] if data else None
+        return SimpleNamespace(data=data, count=count)
+
+
+class LocalRpc:
+    """A pending RPC call, executed like a PostgREST request."""
+
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        handler = RPC_FUNCTIONS.get(self.name)
+        if handler is None:
+            raise _error(f"Could not find the function public.{self.name}", "PGRST202")
+        try:
+            with self.client.db.transaction() as conn:
+                data = handler(conn, self.client.user_id, **self.params)
+        except sqlite3.IntegrityError as e:
+            raise _error(str(e), "23503")
+        return SimpleNamespace(data=data, count=None)
+
+
+# --- RPC functions (same semantics as database/migration_*.sql; all run as the caller) ---
+def _rpc_adjust_account_balance(conn, uid, p_account_id, p_amount_eur_delta):
+    row = conn.execute(
+        f"UPDATE accounts SET balance = COALESCE(balance, 0) + ? / {RATE_TO_EUR_SQL.format(currency='accounts.currency')} "
+        "WHERE id = ? AND user_id = ? RETURNING balance",
+        (p_amount_eur_delta, p_account_id, uid)
+    ).fetchone()
+    return row['balance'] if row else None
+
+
+def _insert_transaction(conn, uid, table, values):
+    cols = list(values)
+    sql = (f"INSERT INTO {table} ({', '.join(cols)}, amount_eur, user_id) "
+           f"VALUES ({', '.join('?' * len(cols))}, ? * {RATE_TO_EUR_SQL.format(currency='?')}, ?) RETURNING *")
+    return _decode(conn.execute(sql, [values[c] for c in cols] + [values['amount'], values['currency'], uid]).fetchone())
+
+
+def _rpc_record_expense(conn, uid, p_date, p_amount, p_currency, p_category_id, p_account_id,
+                        p_description, p_payment_method, p_vendor=None, p_source='manual'):
+    row = _insert_transaction(conn, uid, 'expenses', {
+        'date': str(p_date), 'amount': p_amount, 'currency': p_currency or 'EUR', 'category_id': p_category_id,
+        'account_id': p_account_id, 'description': p_description, 'payment_method': p_payment_method,
+        'vendor': p_vendor, 'source': p_source,
+    })
+    _rpc_adjust_account_balance(conn, uid, p_account_id, -row['amount_eur'])
+    return row
+
+
+def _rpc_record_income(conn, uid, p_date, p_amount, p_currency, p_category_id, p_account_id, p_source, p_notes=None):
+    row = _insert_transaction(conn, uid, 'income', {
+        'date': str(p_date), 'amount': p_amount, 'currency': p_currency or 'EUR', 'category_id': p_category_id,
+        'account_id': p_account_id, 'source': p_source, 'notes': p_notes,
+    })
+    _rpc_adjust_account_balance(conn, uid, p_account_id, row['amount_eur'])
+    return row
+
+
+def _rpc_record_transfer(conn, uid, p_date, p_amount, p_source_account_id, p_destination_account_id,
+                         p_notes=None, p_destination_amount=None, p_exchange_rate=1.0):
+    row = _decode(conn.execute(
+        "INSERT INTO transfers (date, amount, source_account_id, destination_account_id, notes, "
+        "destination_amount, exchange_rate, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING *",
+        (str(p_date), p_amount, p_source_account_id, p_destination_account_id, p_notes,
+         p_amount if p_destination_amount is None else p_destination_amount, p_exchange_rate, uid)
+    ).fetchone())
+    conn.execute("UPDATE accounts SET balance = COALESCE(balance, 0) - ? WHERE id = ? AND user_id = ?",
+                 (row['amount'], p_source_account_id, uid))
+    conn.execute("UPDATE accounts SET balance = COALESCE(balance, 0) + ? WHERE id = ? AND user_id = ?",
+                 (row['destination_amount'], p_destination_account_id, uid))
+    return row
+
+
+def _bulk_insert(conn, uid, table, columns, rows, sign):
+    rate = RATE_TO_EUR_SQL.format(currency='?')
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}, currency, amount_eur, user_id) "
+           f"VALUES ({', '.join('?' * len(columns))}, COALESCE(?, 'EUR'), COALESCE(?, ? * {rate}), ?) "
+           "RETURNING account_id, amount_eur")
+    deltas = {}
+    for r in rows:
+        values = [r.get(c) for c in columns] + [r.get('currency'), r.get('amount_eur'), r.get('amount'), r.get('currency'), uid]
+        inserted = conn.execute(sql, values).fetchone()
+        deltas[inserted['account_id']] = deltas.get(inserted['account_id'], 0) + inserted['amount_eur']
+    # One net balance delta per affected account
+    for account_id, total in deltas.items():
+        _rpc_adjust_account_balance(conn, uid, account_id, sign * total)
+    return len(rows)
+
+
+def _rpc_record_expenses_bulk(conn, uid, p_rows):
+    rows = [dict(r, source=r.get('source') or 'manual') for r in p_rows]
+    columns = ['date', 'amount', 'category_id', 'account_id', 'description', 'payment_method', 'vendor', 'source']
+    return _bulk_insert(conn, uid, 'expenses', columns, rows, -1)
+
+
+def _rpc_record_income_bulk(conn, uid, p_rows):
+    columns = ['date', 'amount', 'category_id', 'account_id', 'source', 'notes']
+    return _bulk_insert(conn, uid, 'income', columns, p_rows, 1)
+
+
+def _rpc_net_worth_series(conn, uid, p_start, p_end):
+    start, end = datetime.date.fromisoformat(str(p_start)), datetime.date.fromisoformat(str(p_end))
+    accounts = {
+        row['id']: row['rate'] for row in conn.execute(
+            f"SELECT id, {RATE_TO_EUR_SQL.format(currency='currency')} AS rate FROM accounts WHERE user_id = ?", (uid,))
+    }
+    snapshots = conn.execute(
+        "SELECT account_id, date, balance FROM balance_history WHERE user_id = ? AND date <= ? ORDER BY date",
+        (uid, end.isoformat())
+    ).fetchall()
+    invested_before = conn.execute(
+        "SELECT COALESCE(SUM(COALESCE(amount_eur, amount)), 0) FROM investments WHERE user_id = ? AND date < ?",
+        (uid, start.isoformat())
+    ).fetchone()[0]
+    invested_daily = dict(conn.execute(
+        "SELECT date, SUM(COALESCE(amount_eur, amount)) FROM investments "
+        "WHERE user_id = ? AND date BETWEEN ? AND ? GROUP BY date",
+        (uid, start.isoformat(), end.isoformat())
+    ).fetchall())
+
+    series, latest, invested, i = [], {}, invested_before, 0
+    day = start
+    while day <= end:
+        key = day.isoformat()
+        while i < len(snapshots) and snapshots[i]['date'] <= key:
+            latest[snapshots[i]['account_id']] = snapshots[i]['balance']
+            i += 1
+        accounts_eur = sum((latest[a] or 0) * rate for a, rate in accounts.items() if a in latest)
+        invested += invested_daily.get(key, 0)
+        series.append({'date': key, 'accounts_eur': accounts_eur, 'invested_eur': invested,
+                       'net_worth_eur': accounts_eur + invested})
+        day += datetime.timedelta(days=1)
+    return series
+
+
+def _rpc_admin_system_stats(conn, uid, p_top_n=10):
+    # SECURITY DEFINER: reads every user's rows, so only admins may call it
+    if conn.execute("SELECT 1 FROM profiles WHERE id = ? AND role = 'admin'", (uid,)).fetchone() is None:
+        raise _error("admin_system_stats requires an admin profile", "42501")
+
+    def scalar(sql, *params):
+        return conn.execute(sql, params).fetchone()[0]
+
+    since = "datetime('now', '-30 days')"
+    tables = sorted(list(OWNER_COLUMNS) + list(PUBLIC_TABLES))
+    ledgers = conn.execute(
+        "SELECT c.user_id, u.email, "
+        "SUM(CASE WHEN c.tbl = 'expenses' THEN c.n END) AS expenses, "
+        "SUM(CASE WHEN c.tbl = 'income' THEN c.n END) AS income, "
+        "SUM(CASE WHEN c.tbl = 'investments' THEN c.n END) AS investments, "
+        "SUM(c.n) AS total_rows FROM ("
+        "SELECT user_id, 'expenses' AS tbl, COUNT(*) AS n FROM expenses GROUP BY user_id UNION ALL "
+        "SELECT user_id, 'income', COUNT(*) FROM income GROUP BY user_id UNION ALL "
+        "SELECT user_id, 'investments', COUNT(*) FROM investments GROUP BY user_id"
+        ") c LEFT JOIN auth_users u ON u.id = c.user_id GROUP BY c.user_id, u.email "
+        "ORDER BY total_rows DESC LIMIT ?", (max(int(p_top_n), 0),)
+    ).fetchall()
+    return {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'users': {
+            'total': scalar("SELECT COUNT(*) FROM auth_users"),
+            'new_30d': scalar(f"SELECT COUNT(*) FROM auth_users WHERE created_at >= {since}"),
+            'active_30d': scalar(
+                "SELECT COUNT(DISTINCT user_id) FROM ("
+                f"SELECT user_id FROM expenses WHERE created_at >= {since} UNION ALL "
+                f"SELECT user_id FROM income WHERE created_at >= {since} UNION ALL "
+                f"SELECT user_id FROM investments WHERE created_at >= {since})"
+            ),
+        },
+        'tables': {table: scalar(f"SELECT COUNT(*) FROM {table}") for table in tables},
+        'ingestion': {
+            'events_24h': scalar("SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= datetime('now', '-1 day')"),
+            'events_7d': scalar("SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= datetime('now', '-7 days')"),
+            'events_30d': scalar(f"SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= {since}"),
+            'by_source_30d': dict(conn.execute(
+                f"SELECT source, COUNT(*) FROM ingestion_logs WHERE created_at >= {since} GROUP BY source").fetchall()),
+            'by_event_30d': dict(conn.execute(
+                f"SELECT event, COUNT(*) FROM ingestion_logs WHERE created_at >= {since} GROUP BY event").fetchall()),
+        },
+        'largest_ledgers': [dict(row) for row in ledgers],
+    }
+
+
+def _rpc_rate_to_eur(conn, uid, p_currency):
+    return conn.execute(f"SELECT {RATE_TO_EUR_SQL.format(currency='?')}", (p_currency,)).fetchone()[0]
+
+
+RPC_FUNCTIONS = {
+    'adjust_account_balance': _rpc_adjust_account_balance,
+    'record_expense': _rpc_record_expense,
+    'record_income': _rpc_record_income,
+    'record_transfer': _rpc_record_transfer,
+    'record_expenses_bulk': _rpc_record_expenses_bulk,
+    'record_income_bulk': _rpc_record_income_bulk,
+    'net_worth_series': _rpc_net_worth_series,
+    'rate_to_eur': _rpc_rate_to_eur,
+    'admin_system_stats': _rpc_admin_system_stats,
+}
+
+
+# --- Auth ---
+def _hash_password(password, salt=None):
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), PASSWORD_HASH_ITERATIONS)
+    return f"{salt}${digest.hex()}"
+
+
+def _auth_response(row):
+    user = SimpleNamespace(id=row['id'], email=row['email'], user_metadata=json.loads(row['user_metadata'] or '{}'))
+    return SimpleNamespace(user=user, session=SimpleNamespace(access_token=f"local:{row['id']}", user=user))
+
+
+class LocalAuth:
+    """Email/password accounts stored next to the data; the access token names the user."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def sign_up(self, credentials):
+        metadata = credentials.get("options", {}).get("data", {})
+        user_id = str(uuid.uuid4())
+        try:
+            with self.db.transaction() as conn:
+                row = conn.execute(
+                    "INSERT INTO auth_users (id, email, password_hash, user_metadata) VALUES (?, ?, ?, ?) RETURNING *",
+                    (user_id, credentials["email"], _hash_password(credentials["password"]), json.dumps(metadata))
+                ).fetchone()
+                # What the on_auth_user_created trigger does in Supabase
+                conn.execute("INSERT INTO profiles (id, email, full_name) VALUES (?, ?, ?)",
+                             (user_id, credentials["email"], metadata.get("full_name")))
+        except sqlite3.IntegrityError:
+            raise ValueError("User already registered")
+        return _auth_response(row)
+
+    def sign_in_with_password(self, credentials):
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT * FROM auth_users WHERE email = ?", (credentials["email"],)).fetchone()
+        if row is None:
+            raise ValueError("Invalid login credentials")
+        salt = row['password_hash'].split('$', 1)[0]
+        if not secrets.compare_digest(_hash_password(credentials["password"], salt), row['password_hash']):
+            raise ValueError("Invalid login credentials")
+        return _auth_response(row)
+
+    def sign_out(self):
+        return None
+
+
+class LocalClient:
+    """Supabase-client stand-in acting as one user (or anonymously if `user_id` is None)."""
+
+    def __init__(self, db, user_id=None):
+        self.db = db
+        self.user_id = user_id
+        self.auth = LocalAuth(db)
+
+    @classmethod
+    def from_token(cls, db, token):
+        """Client for the user a `local:<user id>` access token names."""
+        if token and token.startswith("local:"):
+            return cls(db, token.split(":", 1)[1])
+        return cls(db)
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return LocalRpc(self, name, params)
@@ -1,11 +1,18 @@
+import os
+import sys
 import streamlit as st
 from core.finance_queries import get_exchange_rates, get_user_profile
+from core.supabase_client import release_authenticated_client
+from core.telemetry import start_page_run
 
 def setup_navigation():
     """
     Sets up the custom sidebar navigation and global styles.
     Should be called at the top of every page.
     """
+    # Times this rerun until the page calls finish_page_run()
+    start_page_run(os.path.basename(sys._getframe(1).f_code.co_filename))
+
     # --- Global Config ---
     st.set_page_config(page_title="Life OS", page_icon="🧬", layout="wide")
 
@@ -132,6 +139,7 @@ def setup_navigation():
             st.page_link("pages/savings.py", label="Savings Goals", icon="🎯")
             st.page_link("pages/tax.py", label="Tax Center", icon="🏛️")
             st.page_link("pages/monthly_report.py", label="Monthly Report", icon="📅")
+            st.page_link("pages/statement_import.py", label="Statement Import", icon="🏦")
             
         elif module == "AI Tools":
             st.caption("AI Tools")
@@ -146,6 +154,7 @@ def setup_navigation():
         st.divider()
         
         if st.button("Logout", type="secondary"):
+            release_authenticated_client()
             st.session_state['authenticated'] = False
             st.rerun()
             
@@ -0,0 +1,354 @@
+"""
+Streaming bank statement importer.
+
+Parses CSV exports, ISO 20022 CAMT.053 XML and SWIFT MT940 statements entry by entry,
+normalizes them to signed transactions and writes them to `expenses`/`income` in
+batches through the bulk insert API. Only one batch is held in memory at a time.
+"""
+import csv
+import io
+import re
+import time
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from core.finance_queries import (add_expenses_bulk, add_income_bulk, drop_stored_transactions, get_exchange_rates,
+                                  get_last_transaction_id, log_ingestion, prepare_bulk_transactions)
+
+IMPORT_BATCH_SIZE = 2000
+FORMATS = ("csv", "camt053", "mt940")
+
+# Normalized statement columns; `amount` is signed (negative = money out).
+STATEMENT_COLUMNS = ['date', 'amount', 'currency', 'description', 'counterparty']
+
+
+# --- Format Detection ---
+def detect_format(file_name, head):
+    """Guess the statement format from the file name and its first bytes."""
+    name = (file_name or "").lower()
+    text = head.decode('utf-8', errors='ignore') if isinstance(head, bytes) else head
+    if name.endswith('.xml') or 'camt.053' in text or '<BkToCstmrStmt' in text:
+        return 'camt053'
+    if name.endswith(('.sta', '.mt940', '.940')) or ':20:' in text and ':61:' in text or ':60F:' in text:
+        return 'mt940'
+    return 'csv'
+
+
+# --- Amount Parsing ---
+def parse_amounts(values):
+    """Vectorized parse of amounts written as `1,234.56`, `1.234,56`, `-12,50` or numbers."""
+    text = pd.Series(values, dtype=object).astype(str).str.strip().str.replace(r'[^\d,.\-+]', '', regex=True)
+    # Comma is the decimal separator when it comes after the last dot (or there is no dot)
+    comma_decimal = text.str.rfind(',') > text.str.rfind('.')
+    text = text.where(~comma_decimal, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    text = text.where(comma_decimal, text.str.replace(',', '', regex=False))
+    return pd.to_numeric(text, errors='coerce')
+
+
+# --- CSV ---
+CSV_COLUMN_CANDIDATES = {
+    'date': ['date', 'booking date', 'transaction date', 'value date', 'datum', 'boekingsdatum', 'transactiedatum'],
+    'amount': ['amount', 'transaction amount', 'bedrag', 'bedrag (eur)', 'amount (eur)'],
+    'debit': ['debit', 'withdrawal', 'withdrawals', 'paid out', 'money out'],
+    'credit': ['credit', 'deposit', 'deposits', 'paid in', 'money in'],
+    'direction': ['af bij', 'debit/credit', 'credit/debit', 'd/c', 'cdtdbtind'],
+    'currency': ['currency', 'ccy', 'munt', 'valuta'],
+    'description': ['description', 'omschrijving', 'details', 'memo', 'narrative', 'mededelingen', 'remittance information'],
+    'counterparty': ['counterparty', 'payee', 'merchant', 'beneficiary', 'name', 'naam / omschrijving', 'naam tegenpartij'],
+}
+DEBIT_MARKERS = {'d', 'dbit', 'debit', 'af', 'dr', 'out'}
+
+
+def parse_dates(values, dayfirst=True):
+    """
+    Parse statement dates. ISO (`2024-01-05`, with or without a time) and compact
+    (`20240105`) dates are year-first whatever `dayfirst` says; only the rest use it.
+    """
+    raw = pd.Series(values, dtype=object).astype(str).str.strip()
+    iso = raw.str.match(r'^\d{4}-\d{2}-\d{2}')
+    compact = raw.str.fullmatch(r'\d{8}')
+    other = ~(iso | compact)
+    dates = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+    if iso.any():
+        dates[iso] = pd.to_datetime(raw[iso], format='ISO8601', errors='coerce')
+    if compact.any():
+        dates[compact] = pd.to_datetime(raw[compact], format='%Y%m%d', errors='coerce')
+    if other.any():
+        dates[other] = pd.to_datetime(raw[other], dayfirst=dayfirst, errors='coerce', format='mixed')
+    return dates
+
+
+def _match_columns(header):
+    """Map normalized statement fields to the CSV's own column names."""
+    lookup = {col.strip().lower(): col for col in header}
+    mapping = {}
+    for field, candidates in CSV_COLUMN_CANDIDATES.items():
+        for candidate in candidates:
+            if candidate in lookup:
+                mapping[field] = lookup[candidate]
+                break
+    return mapping
+
+
+def iter_csv_batches(stream, batch_size=IMPORT_BATCH_SIZE, dayfirst=True, default_currency="EUR"):
+    """Read a CSV statement `batch_size` lines at a time and yield normalized frames."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace') if not isinstance(stream, io.TextIOBase) else stream
+    sample = text.read(8192)
+    text.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+
+    mapping = None
+    for chunk in pd.read_csv(text, sep=delimiter, dtype=str, chunksize=batch_size, skipinitialspace=True):
+        if mapping is None:
+            mapping = _match_columns(chunk.columns)
+            if 'date' not in mapping or not ({'amount', 'debit', 'credit'} & mapping.keys()):
+                raise ValueError(f"Could not find date/amount columns in CSV header: {list(chunk.columns)}")
+
+        if 'amount' in mapping:
+            amount = parse_amounts(chunk[mapping['amount']])
+        else:
+            debit = parse_amounts(chunk[mapping['debit']]).fillna(0) if 'debit' in mapping else 0
+            credit = parse_amounts(chunk[mapping['credit']]).fillna(0) if 'credit' in mapping else 0
+            amount = credit - abs(debit)
+        if 'direction' in mapping:
+            is_debit = chunk[mapping['direction']].astype(str).str.strip().str.lower().isin(DEBIT_MARKERS)
+            amount = amount.abs().where(~is_debit, -amount.abs())
+
+        yield pd.DataFrame({
+            'date': parse_dates(chunk[mapping['date']], dayfirst),
+            'amount': amount,
+            'currency': chunk[mapping['currency']].str.upper() if 'currency' in mapping else default_currency,
+            'description': chunk[mapping['description']] if 'description' in mapping else None,
+            'counterparty': chunk[mapping['counterparty']] if 'counterparty' in mapping else None,
+        })
+
+
+# --- CAMT.053 ---
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find(elem, *path):
+    """First descendant matching the local-name path (namespace agnostic)."""
+    for name in path:
+        elem = next((e for e in elem.iter() if e is not elem and _local(e.tag) == name), None)
+        if elem is None:
+            return None
+    return elem
+
+
+def _text(elem, *path):
+    found = _find(elem, *path)
+    return found.text.strip() if found is not None and found.text else None
+
+
+def iter_camt053_rows(stream):
+    """Yield normalized entries (`Ntry`) from a CAMT.053 file, discarding each once read."""
+    stack = []
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if _local(elem.tag) != 'Ntry':
+            continue
+
+        amt = _find(elem, 'Amt')
+        amount = float(amt.text) if amt is not None and amt.text else None
+        debit = _text(elem, 'CdtDbtInd') == 'DBIT'
+        if amount is not None and debit:
+            amount = -amount
+        party = 'Cdtr' if debit else 'Dbtr'
+        descriptions = [e.text.strip() for e in elem.iter() if _local(e.tag) == 'Ustrd' and e.text]
+
+        yield {
+            'date': _text(elem, 'BookgDt', 'Dt') or (_text(elem, 'BookgDt', 'DtTm') or '')[:10] or _text(elem, 'ValDt', 'Dt'),
+            'amount': amount,
+            'currency': amt.get('Ccy') if amt is not None else None,
+            'description': " ".join(descriptions) or _text(elem, 'AddtlNtryInf'),
+            'counterparty': _text(elem, party, 'Nm'),
+        }
+        # Drop the processed entry so memory stays flat across the file
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+# --- MT940 ---
+MT940_STATEMENT_LINE = re.compile(r'^(\d{6})(\d{4})?(RC|RD|C|D)[A-Z]?(\d+,\d*)')
+MT940_NAME = re.compile(r'/NAME/([^/]+)')
+
+
+def iter_mt940_rows(stream):
+    """Yield normalized transactions from an MT940 file, reading it line by line."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace') if not isinstance(stream, io.TextIOBase) else stream
+    currency = None
+    pending = None
+    info_lines = None
+
+    def flush():
+        info = " ".join(info_lines or []).strip()
+        name = MT940_NAME.search(info)
+        pending['description'] = info or None
+        pending['counterparty'] = name.group(1).strip() if name else None
+        return pending
+
+    for raw in text:
+        line = raw.rstrip('\r\n')
+        tag = re.match(r'^:(\d{2}[A-Z]?):(.*)$', line)
+        if tag is None:
+            # Continuation of a multi-line :86: field
+            if info_lines is not None:
+                info_lines.append(line.strip())
+            continue
+
+        code, body = tag.groups()
+        if code != '86':
+            if pending is not None:
+                yield flush()
+                pending = None
+            info_lines = None
+
+        if code in ('60F', '60M'):
+            currency = body[7:10]
+        elif code == '61':
+            match = MT940_STATEMENT_LINE.match(body)
+            if match:
+                value_date, _, mark, amount = match.groups()
+                amount = float(amount.replace(',', '.'))
+                pending = {
+                    'date': pd.to_datetime(value_date, format='%y%m%d', errors='coerce'),
+                    # RC/RD are reversals: a reversed credit takes money out
+                    'amount': -amount if mark in ('D', 'RC') else amount,
+                    'currency': currency,
+                }
+        elif code == '86' and pending is not None:
+            info_lines = [body.strip()]
+
+    if pending is not None:
+        yield flush()
+
+
+def _batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield pd.DataFrame(batch, columns=STATEMENT_COLUMNS)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=STATEMENT_COLUMNS)
+
+
+def iter_statement_batches(stream, fmt, batch_size=IMPORT_BATCH_SIZE, **csv_options):
+    """Normalized statement frames of up to `batch_size` rows for any supported format."""
+    if fmt == 'csv':
+        batches = iter_csv_batches(stream, batch_size, **csv_options)
+    elif fmt == 'camt053':
+        batches = _batched(iter_camt053_rows(stream), batch_size)
+    elif fmt == 'mt940':
+        batches = _batched(iter_mt940_rows(stream), batch_size)
+    else:
+        raise ValueError(f"Unsupported statement format: {fmt}")
+
+    for batch in batches:
+        batch['date'] = pd.to_datetime(batch['date'], errors='coerce')
+        batch['amount'] = pd.to_numeric(batch['amount'], errors='coerce')
+        yield batch
+
+
+# --- Import ---
+def split_statement_batch(batch, account_id, expense_category_id=None, income_category_id=None, source="csv"):
+    """Split a normalized batch into `expenses` and `income` frames for the bulk insert API."""
+    outflow = batch[batch['amount'] < 0]
+    inflow = batch[batch['amount'] > 0]
+
+    expenses = pd.DataFrame({
+        'date': outflow['date'],
+        'amount': -outflow['amount'],
+        'currency': outflow['currency'],
+        'category_id': expense_category_id,
+        'account_id': account_id,
+        'description': outflow['description'],
+        'payment_method': 'bank',
+        'vendor': outflow['counterparty'],
+        'source': source,
+    })
+    income = pd.DataFrame({
+        'date': inflow['date'],
+        'amount': inflow['amount'],
+        'currency': inflow['currency'],
+        'category_id': income_category_id,
+        'account_id': account_id,
+        'source': inflow['counterparty'].fillna(inflow['description'].str[:50]),
+        'notes': inflow['description'],
+    })
+    return expenses, income
+
+
+def _insert_new_rows(table, frame, add_bulk, rates, stored_before_id, seen):
+    """
+    Insert the valid rows of `frame` that were not stored before the import started.
+    Returns (rows written, duplicates skipped, invalid rows dropped).
+    """
+    rows, invalid = prepare_bulk_transactions(frame, table, rates)
+    rows, duplicates = drop_stored_transactions(rows, table, stored_before_id, seen)
+    if rows.empty:
+        return 0, duplicates, invalid
+    response = add_bulk(rows, rates, prepared=True)
+    if response is None:
+        raise RuntimeError(f"Inserting {table} failed")
+    return int(response.data or 0), duplicates, invalid
+
+
+def import_statement(stream, fmt, account_id, expense_category_id=None, income_category_id=None,
+                     file_name=None, batch_size=IMPORT_BATCH_SIZE, on_progress=None, **csv_options):
+    """
+    Import a statement file batch by batch and record progress in ingestion_logs.
+    `on_progress(summary)` is called after every batch. Returns the final summary.
+    """
+    started = time.perf_counter()
+    rates = get_exchange_rates()
+    summary = {'file': file_name, 'format': fmt, 'batches': 0, 'rows': 0,
+               'expenses': 0, 'income': 0, 'duplicates': 0, 'skipped': 0, 'status': 'running'}
+    log_ingestion(fmt, 'import_started', raw_data={'file': file_name, 'format': fmt})
+
+    try:
+        # Only rows stored before this import count as already imported; rows it writes never do
+        stored_before = {table: get_last_transaction_id(table) for table in ('expenses', 'income')}
+        seen = {'expenses': {}, 'income': {}}
+        for batch in iter_statement_batches(stream, fmt, batch_size, **csv_options):
+            expenses, income = split_statement_batch(batch, account_id, expense_category_id, income_category_id, fmt)
+            written_expenses, duplicate_expenses, invalid_expenses = _insert_new_rows(
+                'expenses', expenses, add_expenses_bulk, rates, stored_before['expenses'], seen['expenses'])
+            written_income, duplicate_income, invalid_income = _insert_new_rows(
+                'income', income, add_income_bulk, rates, stored_before['income'], seen['income'])
+            duplicates = duplicate_expenses + duplicate_income
+
+            summary['batches'] += 1
+            summary['rows'] += len(batch)
+            summary['expenses'] += written_expenses
+            summary['income'] += written_income
+            summary['duplicates'] += duplicates
+            # Zero-amount lines plus rows without a readable date
+            summary['skipped'] += len(batch) - len(expenses) - len(income) + invalid_expenses + invalid_income
+            log_ingestion(fmt, 'batch_inserted', processed_data={
+                'batch': summary['batches'], 'rows': len(batch),
+                'expenses': written_expenses, 'income': written_income, 'duplicates': duplicates
+            })
+            if on_progress:
+                on_progress(summary)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        log_ingestion(fmt, 'import_failed', processed_data=summary)
+        return summary
+
+    summary['status'] = 'completed'
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    log_ingestion(fmt, 'import_completed', processed_data=summary)
+    return summary
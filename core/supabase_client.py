@@ -1,19 +1,175 @@
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
 import streamlit as st
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+
+from core.local_storage import LOCAL_DB_PATH, LocalClient, LocalDatabase
+from core.telemetry import traced
+
+# Pool sizing for the shared HTTP transport and the token-keyed client cache.
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+MAX_POOLED_CLIENTS = 256
+# Drop clients slightly before their JWT expires so we never send a stale token.
+TOKEN_EXPIRY_LEEWAY_SECONDS = 30
+# Fallback lifetime for tokens whose `exp` claim cannot be read.
+DEFAULT_TOKEN_TTL_SECONDS = 3600
+
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Process-wide HTTP/2 connection pool shared by every Supabase client."""
+    return httpx.Client(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+
+
+def _token_expiry(token):
+    """Read the `exp` claim from a JWT without verifying it (the server does that)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except Exception:
+        return time.time() + DEFAULT_TOKEN_TTL_SECONDS
+
+
+class ClientPool:
+    """
+    Caches one Supabase client per access token.
+    All clients share a single HTTP connection pool, so a rerun or a new session
+    re-binds its token onto warm connections instead of opening new ones.
+    Clients whose token has expired are evicted on access.
+    """
+
+    def __init__(self, url, key, http_client, max_clients=MAX_POOLED_CLIENTS):
+        self.url = url
+        self.key = key
+        self.http_client = http_client
+        self.max_clients = max_clients
+        self._clients = OrderedDict()  # token -> (client, expires_at)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _new_client(self) -> Client:
+        options = ClientOptions(
+            httpx_client=self.http_client,
+            auto_refresh_token=False,
+            persist_session=False,
+        )
+        self.created += 1
+        return create_client(self.url, self.key, options=options)
+
+    def _evict_expired(self, now):
+        expired = [t for t, (_, exp) in self._clients.items() if exp - TOKEN_EXPIRY_LEEWAY_SECONDS <= now]
+        for token in expired:
+            del self._clients[token]
+
+    def get(self, token=None) -> Client:
+        """Return a client bound to `token` (or an anonymous one if no token)."""
+        now = time.time()
+        cache_key = token or ""
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._clients.get(cache_key)
+            if entry:
+                self._clients.move_to_end(cache_key)
+                self.reused += 1
+                return entry[0]
+
+            client = self._new_client()
+            if token:
+                client.postgrest.auth(token)
+                expires_at = _token_expiry(token)
+            else:
+                expires_at = float("inf")
+
+            self._clients[cache_key] = (client, expires_at)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def discard(self, token):
+        """Forget the client bound to `token` (e.g. on logout)."""
+        with self._lock:
+            self._clients.pop(token or "", None)
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "created": self.created, "reused": self.reused}
+
+
+@st.cache_resource
+def get_client_pool() -> ClientPool:
+    """Process-wide client pool, shared across reruns and sessions."""
+    url = st.secrets["supabase"]["url"]
+    key = st.secrets["supabase"]["key"]
+    return ClientPool(url, key, get_http_client())
+
+
+def _storage_secrets():
+    try:
+        return st.secrets.get("storage", {})
+    except Exception:
+        return {}
+
+
+def storage_backend():
+    """'supabase' (default) or 'local', from LIFEOS_STORAGE or `[storage] backend` in secrets."""
+    return (os.environ.get("LIFEOS_STORAGE") or _storage_secrets().get("backend") or "supabase").lower()
+
+
+@st.cache_resource
+def get_local_database() -> LocalDatabase:
+    """Process-wide SQLite database behind the local backend."""
+    return LocalDatabase(os.environ.get("LIFEOS_LOCAL_DB") or _storage_secrets().get("path") or LOCAL_DB_PATH)
+
 
 def init_supabase() -> Client:
-    """Initialize Supabase client using secrets."""
+    """
+    Initialize a fresh Supabase client using secrets.
+    Use this for auth flows (login/signup) that keep session state on the client;
+    data queries should go through `get_authenticated_client()`.
+    """
     try:
+        if storage_backend() == "local":
+            return LocalClient(get_local_database())
         url = st.secrets["supabase"]["url"]
         key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
+        return create_client(url, key, options=ClientOptions(httpx_client=get_http_client()))
     except Exception as e:
         st.error(f"Failed to initialize Supabase: {e}")
         return None
 
 def get_authenticated_client() -> Client:
-    """Get a Supabase client authenticated with the current user's token."""
-    client = init_supabase()
-    if 'access_token' in st.session_state:
-        client.postgrest.auth(st.session_state['access_token'])
-    return client
+    """
+    Get a pooled Supabase client authenticated with the current user's token.
+    Requests made through it are recorded in `core.telemetry`.
+    """
+    try:
+        if storage_backend() == "local":
+            return traced(LocalClient.from_token(get_local_database(), st.session_state.get('access_token')))
+        return traced(get_client_pool().get(st.session_state.get('access_token')))
+    except Exception as e:
+        st.error(f"Failed to initialize Supabase: {e}")
+        return None
+
+def release_authenticated_client():
+    """Drop the pooled client for the current user's token."""
+    token = st.session_state.get('access_token')
+    if token and storage_backend() != "local":
+        get_client_pool().discard(token)
@@ -0,0 +1,248 @@
+"""
+Query and page latency telemetry.
+
+Every request the data layer sends (table, operation, filters, rows, payload size,
+latency, error) and every page rerun is recorded in a process-wide ring buffer, with
+rolling p50/p95 per query and per page and a latency histogram, for the Admin dashboard.
+"""
+import bisect
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Most recent events kept for the event log and the JSON export.
+TELEMETRY_MAX_EVENTS = 5000
+# Latest latencies per query/page the rolling percentiles are computed from.
+TELEMETRY_WINDOW = 500
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Longest filter description kept per event.
+MAX_FILTER_CHARS = 300
+
+
+class Telemetry:
+    """
+    Thread-safe recorder of timed events, keyed by (kind, name).
+    kind is 'query' (name '<function>:<table>') or 'page' (name = page script).
+    """
+
+    def __init__(self, max_events=TELEMETRY_MAX_EVENTS, window=TELEMETRY_WINDOW):
+        self.window = window
+        self._events = deque(maxlen=max_events)
+        self._latencies = {}   # (kind, name) -> deque of recent latencies
+        self._histograms = {}  # (kind, name) -> bucket counts since start
+        self._totals = {}      # (kind, name) -> {'count', 'errors', 'rows', 'bytes'}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, kind, name, latency_ms, **fields):
+        event = {'ts': time.time(), 'kind': kind, 'name': name, 'latency_ms': round(latency_ms, 3), **fields}
+        key = (kind, name)
+        with self._lock:
+            self._events.append(event)
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency_ms)
+            buckets = self._histograms.setdefault(key, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+            buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            totals = self._totals.setdefault(key, {'count': 0, 'errors': 0, 'rows': 0, 'bytes': 0})
+            totals['count'] += 1
+            totals['errors'] += bool(fields.get('error'))
+            totals['rows'] += fields.get('rows') or 0
+            totals['bytes'] += fields.get('bytes') or 0
+        return event
+
+    def percentiles(self, kind=None):
+        """Rolling p50/p95/max latency per key (over the last `window` events) plus lifetime totals."""
+        with self._lock:
+            keys = [k for k in self._latencies if kind is None or k[0] == kind]
+            rows = []
+            for key in keys:
+                recent = np.fromiter(self._latencies[key], dtype=float)
+                totals = self._totals[key]
+                rows.append({
+                    'kind': key[0], 'name': key[1], 'count': totals['count'], 'errors': totals['errors'],
+                    'p50_ms': float(np.percentile(recent, 50)), 'p95_ms': float(np.percentile(recent, 95)),
+                    'max_ms': float(recent.max()),
+                    'avg_rows': totals['rows'] / totals['count'], 'avg_bytes': totals['bytes'] / totals['count'],
+                })
+        columns = ['kind', 'name', 'count', 'errors', 'p50_ms', 'p95_ms', 'max_ms', 'avg_rows', 'avg_bytes']
+        return pd.DataFrame(rows, columns=columns).sort_values('p95_ms', ascending=False, ignore_index=True)
+
+    def histogram(self, kind, name):
+        """Event counts per latency bucket for one key, labelled by bucket bound."""
+        with self._lock:
+            counts = list(self._histograms.get((kind, name), [0] * (len(LATENCY_BUCKETS_MS) + 1)))
+        labels = [f"≤{b:,} ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]:,} ms"]
+        return pd.DataFrame({'bucket': labels, 'count': counts})
+
+    def events(self, kind=None, errors_only=False):
+        with self._lock:
+            events = [e for e in self._events
+                      if (kind is None or e['kind'] == kind) and (not errors_only or e.get('error'))]
+        return pd.DataFrame(events)
+
+    def export_json(self):
+        """Percentiles, histograms and the recent event log as one JSON document."""
+        with self._lock:
+            histograms = {f"{k[0]}:{k[1]}": dict(zip([*map(str, LATENCY_BUCKETS_MS), 'inf'], v))
+                          for k, v in self._histograms.items()}
+            events = list(self._events)
+        return json.dumps({
+            'started': self.started,
+            'exported': time.time(),
+            'percentiles': self.percentiles().to_dict('records'),
+            'histograms': histograms,
+            'events': events,
+        }, default=str, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._latencies.clear()
+            self._histograms.clear()
+            self._totals.clear()
+            self.started = time.time()
+
+
+@st.cache_resource
+def get_telemetry() -> Telemetry:
+    """Process-wide telemetry, shared across reruns and sessions."""
+    return Telemetry()
+
+
+# --- Query tracing ---
+def _caller():
+    """Name of the `core.finance_queries` function issuing the current request."""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module == 'core.finance_queries':
+            return frame.f_code.co_name
+        if fallback is None and not module.startswith(('core.telemetry', 'postgrest', 'supabase')):
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+def _describe(method, args, kwargs):
+    parts = [str(a) for a in args] + [f"{k}={v}" for k, v in kwargs.items() if v is not None]
+    return f"{method}({', '.join(parts)})"
+
+
+def _payload_size(data):
+    """Response bytes: the payload serialized as compact UTF-8 JSON, the form PostgREST sends."""
+    if not data:
+        return 0
+    return len(json.dumps(data, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _page_run():
+    try:
+        return st.session_state.get('_page_run')
+    except Exception:
+        return None
+
+
+class TracedRequest:
+    """Wraps a request builder; records the chain of calls and times `execute()`."""
+
+    def __init__(self, builder, telemetry, table, steps=()):
+        self._builder = builder
+        self._telemetry = telemetry
+        self._table = table
+        self._steps = steps
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if hasattr(attr, 'execute'):  # e.g. `.not_`, which is a property returning a builder
+            return TracedRequest(attr, self._telemetry, self._table, self._steps + (name,))
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return TracedRequest(result, self._telemetry, self._table, self._steps + (_describe(name, args, kwargs),))
+            return result
+        return call
+
+    def execute(self):
+        started = time.perf_counter()
+        error, data = None, None
+        try:
+            response = self._builder.execute()
+            data = response.data
+            return response
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            operation = self._steps[0].split('(', 1)[0] if self._steps else 'rpc'
+            rows = len(data) if isinstance(data, list) else int(data is not None)
+            self._telemetry.record(
+                'query', f"{_caller()}:{self._table}", latency_ms,
+                table=self._table, operation=operation, filters=".".join(self._steps)[:MAX_FILTER_CHARS],
+                rows=rows, bytes=_payload_size(data), error=error,
+            )
+            run = _page_run()
+            if run is not None:
+                run['queries'] += 1
+                run['query_ms'] += latency_ms
+
+
+class TracedClient:
+    """A database client whose table and RPC requests are recorded in `telemetry`."""
+
+    def __init__(self, client, telemetry):
+        self._client = client
+        self._telemetry = telemetry
+
+    def table(self, name):
+        return TracedRequest(self._client.table(name), self._telemetry, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None, *args, **kwargs):
+        request = self._client.rpc(name, params or {}, *args, **kwargs)
+        return TracedRequest(request, self._telemetry, f"rpc:{name}", (f"rpc({', '.join(params or {})})",))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def traced(client, telemetry=None):
+    """`client` with every request recorded (None stays None, so callers' error handling is unchanged)."""
+    if client is None or isinstance(client, TracedClient):
+        return client
+    return TracedClient(client, telemetry or get_telemetry())
+
+
+# --- Page reruns ---
+def start_page_run(page):
+    """Start timing this rerun of `page`; called by `setup_navigation()`."""
+    try:
+        st.session_state['_page_run'] = {'page': page, 'started': time.perf_counter(), 'queries': 0, 'query_ms': 0.0}
+    except Exception:
+        pass
+
+
+def finish_page_run():
+    """Record the rerun started by `start_page_run` (the last line of each page script)."""
+    try:
+        run = st.session_state.pop('_page_run', None)
+    except Exception:
+        return
+    if run is None:
+        return
+    get_telemetry().record(
+        'page', run['page'], (time.perf_counter() - run['started']) * 1000,
+        queries=run['queries'], query_ms=round(run['query_ms'], 3),
+    )
@@ -0,0 +1,148 @@
+"""
+Token budgeting for the AI Assistant prompt.
+
+Counts tokens per message, keeps the newest turns that fit under a ceiling and folds
+older turns into a running summary, so a long conversation costs about the same per
+request as a short one.
+"""
+import functools
+import math
+import os
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional: fall back to a character estimate
+    _ENCODING = None
+
+# Ceiling for everything sent to the model, excluding the reserved answer.
+MAX_PROMPT_TOKENS = int(os.environ.get("LIFEOS_MAX_PROMPT_TOKENS", "6000"))
+RESPONSE_RESERVE_TOKENS = 1024
+# Share of the ceiling the financial context may use before it is cut.
+CONTEXT_MAX_SHARE = 0.35
+SUMMARY_MAX_TOKENS = 300
+# After folding, history is trimmed to this share of what fits, so the next turns
+# do not immediately trigger another summarization call.
+HISTORY_LOW_WATER = 0.6
+# Per-message framing overhead (role markers) in chat formats.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and their financial assistant.
+Keep facts, numbers, dates and open questions; drop greetings and filler. At most {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Tokens in `text` (tiktoken cl100k when installed, otherwise ~3.5 characters per token)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 3.5)
+
+
+def message_tokens(message):
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keep whole leading lines of `text` that fit in `max_tokens`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + "\n[...truncated]"
+
+
+def _role(message):
+    return "User" if isinstance(message, HumanMessage) else "Assistant"
+
+
+def make_summarizer(llm, max_tokens=SUMMARY_MAX_TOKENS):
+    """summarize(previous_summary, messages) -> new summary, using `llm`."""
+    def summarize(previous, messages):
+        turns = "\n".join(f"{_role(m)}: {m.content}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(max_tokens * 0.7), summary=previous or "(none)",
+            turns=truncate_to_tokens(turns, MAX_PROMPT_TOKENS // 2)
+        )
+        return truncate_to_tokens(llm.invoke(prompt).content.strip(), max_tokens)
+    return summarize
+
+
+class ChatMemory:
+    """
+    Rolling view of one conversation: a summary of folded turns plus the index of the
+    first turn not yet folded. History itself stays in the caller's list.
+    """
+
+    def __init__(self):
+        self.summary = ""
+        self.summarized = 0
+
+    def build(self, system_prompt, history, summarize=None, max_tokens=MAX_PROMPT_TOKENS):
+        """
+        Messages for the next request and their token accounting.
+        Turns that no longer fit are folded into the summary via `summarize`; without a
+        summarizer (or if it fails) they are simply dropped from the prompt.
+        """
+        system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        pending = history[self.summarized:]
+        costs = [message_tokens(m) for m in pending]
+        available = max_tokens - RESPONSE_RESERVE_TOKENS - system_tokens - count_tokens(self.summary)
+
+        folded = 0
+        if sum(costs) > available and len(pending) > 1:
+            # Keep the newest turns within the low-water mark; always keep the question itself
+            target = max(available * HISTORY_LOW_WATER, costs[-1])
+            keep, used = 0, 0
+            for cost in reversed(costs):
+                if keep and used + cost > target:
+                    break
+                keep += 1
+                used += cost
+            folded = len(pending) - keep
+            if summarize is not None:
+                try:
+                    self.summary = summarize(self.summary, pending[:folded])
+                except Exception:
+                    pass
+            self.summarized += folded
+            pending, costs = pending[folded:], costs[folded:]
+
+        summary_block = f"\n\nSummary of the earlier conversation:\n{self.summary}" if self.summary else ""
+        system = SystemMessage(content=system_prompt + summary_block)
+        summary_tokens = count_tokens(summary_block)
+
+        # A single oversized question is cut rather than blowing the budget
+        room = max_tokens - RESPONSE_RESERVE_TOKENS - system_tokens - summary_tokens
+        if pending and costs[-1] > room:
+            last = pending[-1]
+            pending = [type(last)(content=truncate_to_tokens(last.content, max(room - MESSAGE_OVERHEAD_TOKENS, 1)))]
+            costs = [message_tokens(pending[0])]
+
+        usage = {
+            'prompt_tokens': system_tokens + summary_tokens + sum(costs),
+            'system_tokens': system_tokens,
+            'summary_tokens': summary_tokens,
+            'history_tokens': sum(costs),
+            'history_messages': len(pending),
+            'folded_messages': folded,
+        }
+        return [system] + pending, usage
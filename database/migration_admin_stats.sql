@@ -0,0 +1,100 @@
+-- Global system statistics for the Admin dashboard in one RPC call.
+-- RLS limits every normal query to the caller's own rows, so cross-user counts need a
+-- SECURITY DEFINER function. It only answers callers whose profile has role 'admin'.
+
+---------------------------------------
+-- ADMIN ROLE
+---------------------------------------
+
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS role TEXT NOT NULL DEFAULT 'user';
+
+-- "Users can update own profile" must not let anyone promote themselves:
+-- clients may only update the descriptive columns.
+REVOKE UPDATE ON profiles FROM authenticated, anon;
+GRANT UPDATE (email, full_name, avatar_url) ON profiles TO authenticated;
+
+-- The account pages/admin.py has always treated as the admin; promote others the same way
+UPDATE profiles SET role = 'admin' WHERE email = 'admin@lifeos.com';
+
+---------------------------------------
+-- SYSTEM STATS
+---------------------------------------
+
+-- Returns:
+--   users:           total, new and active (wrote a transaction) in the last 30 days
+--   tables:          live row count per public table (planner statistics, no table scans)
+--   ingestion:       ingestion_logs events over 24h / 7d / 30d, and per source and event over 30d
+--   largest_ledgers: the p_top_n users with the most expense/income/investment rows
+CREATE OR REPLACE FUNCTION public.admin_system_stats(p_top_n INTEGER DEFAULT 10)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    v_since TIMESTAMPTZ := now() - interval '30 days';
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM profiles WHERE id = auth.uid() AND role = 'admin') THEN
+        RAISE EXCEPTION 'admin_system_stats requires an admin profile' USING ERRCODE = '42501';
+    END IF;
+
+    RETURN jsonb_build_object(
+        'generated_at', now(),
+        'users', jsonb_build_object(
+            'total', (SELECT COUNT(*) FROM auth.users),
+            'new_30d', (SELECT COUNT(*) FROM auth.users WHERE created_at >= v_since),
+            'active_30d', (
+                SELECT COUNT(DISTINCT user_id) FROM (
+                    SELECT user_id FROM expenses WHERE created_at >= v_since
+                    UNION ALL
+                    SELECT user_id FROM income WHERE created_at >= v_since
+                    UNION ALL
+                    SELECT user_id FROM investments WHERE created_at >= v_since
+                ) recent
+            )
+        ),
+        'tables', (
+            SELECT COALESCE(jsonb_object_agg(relname, n_live_tup ORDER BY relname), '{}'::jsonb)
+            FROM pg_stat_user_tables WHERE schemaname = 'public'
+        ),
+        'ingestion', jsonb_build_object(
+            'events_24h', (SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= now() - interval '1 day'),
+            'events_7d', (SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= now() - interval '7 days'),
+            'events_30d', (SELECT COUNT(*) FROM ingestion_logs WHERE created_at >= v_since),
+            'by_source_30d', (
+                SELECT COALESCE(jsonb_object_agg(source, n), '{}'::jsonb)
+                FROM (SELECT source, COUNT(*) AS n FROM ingestion_logs WHERE created_at >= v_since GROUP BY source) s
+            ),
+            'by_event_30d', (
+                SELECT COALESCE(jsonb_object_agg(event, n), '{}'::jsonb)
+                FROM (SELECT event, COUNT(*) AS n FROM ingestion_logs WHERE created_at >= v_since GROUP BY event) e
+            )
+        ),
+        'largest_ledgers', (
+            SELECT COALESCE(jsonb_agg(to_jsonb(l) ORDER BY l.total_rows DESC), '[]'::jsonb)
+            FROM (
+                SELECT c.user_id, u.email,
+                       SUM(c.n) FILTER (WHERE c.tbl = 'expenses') AS expenses,
+                       SUM(c.n) FILTER (WHERE c.tbl = 'income') AS income,
+                       SUM(c.n) FILTER (WHERE c.tbl = 'investments') AS investments,
+                       SUM(c.n) AS total_rows
+                FROM (
+                    SELECT user_id, 'expenses' AS tbl, COUNT(*) AS n FROM expenses GROUP BY user_id
+                    UNION ALL
+                    SELECT user_id, 'income', COUNT(*) FROM income GROUP BY user_id
+                    UNION ALL
+                    SELECT user_id, 'investments', COUNT(*) FROM investments GROUP BY user_id
+                ) c
+                LEFT JOIN auth.users u ON u.id = c.user_id
+                GROUP BY c.user_id, u.email
+                ORDER BY total_rows DESC
+                LIMIT GREATEST(p_top_n, 0)
+            ) l
+        )
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.admin_system_stats(INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.admin_system_stats(INTEGER) TO authenticated;
@@ -0,0 +1,108 @@
+-- Daily balance snapshots and a net worth series built from them.
+-- Every balance change upserts one row per account per day into balance_history,
+-- so a net worth chart reads snapshots instead of replaying the transaction ledger.
+
+---------------------------------------
+-- BALANCE_HISTORY: ownership + one snapshot per account per day
+---------------------------------------
+
+ALTER TABLE balance_history ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES auth.users(id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS balance_history_account_date_key
+ON balance_history(account_id, date);
+
+ALTER TABLE balance_history ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Users can view own balance history" ON balance_history FOR SELECT USING (auth.uid() = user_id);
+CREATE POLICY "Users can insert own balance history" ON balance_history FOR INSERT WITH CHECK (auth.uid() = user_id);
+CREATE POLICY "Users can update own balance history" ON balance_history FOR UPDATE USING (auth.uid() = user_id);
+
+---------------------------------------
+-- SNAPSHOT TRIGGER
+---------------------------------------
+
+CREATE OR REPLACE FUNCTION public.snapshot_account_balance()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO balance_history (account_id, date, balance, user_id)
+    VALUES (NEW.id, CURRENT_DATE, COALESCE(NEW.balance, 0), NEW.user_id)
+    ON CONFLICT (account_id, date) DO UPDATE SET balance = EXCLUDED.balance;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS on_account_balance_change ON accounts;
+CREATE TRIGGER on_account_balance_change
+    AFTER INSERT OR UPDATE OF balance ON accounts
+    FOR EACH ROW EXECUTE PROCEDURE public.snapshot_account_balance();
+
+-- Seed today's snapshot for existing accounts
+INSERT INTO balance_history (account_id, date, balance, user_id)
+SELECT id, CURRENT_DATE, COALESCE(balance, 0), user_id FROM accounts
+ON CONFLICT (account_id, date) DO NOTHING;
+
+---------------------------------------
+-- NET WORTH SERIES
+---------------------------------------
+
+-- Daily net worth in EUR over [p_start, p_end]: the latest snapshot of each account on or
+-- before each day (converted at current rates) plus cumulative invested amounts.
+-- Runs as the caller, so RLS limits it to the caller's accounts and investments.
+CREATE OR REPLACE FUNCTION public.net_worth_daily(p_start DATE, p_end DATE)
+RETURNS TABLE (date DATE, accounts_eur NUMERIC, invested_eur NUMERIC, net_worth_eur NUMERIC)
+LANGUAGE sql STABLE
+AS $$
+    WITH days AS (
+        SELECT d::date AS day FROM generate_series(p_start, p_end, interval '1 day') AS d
+    ),
+    account_totals AS (
+        SELECT days.day, COALESCE(SUM(snap.balance * public.rate_to_eur(a.currency)), 0) AS total
+        FROM days
+        CROSS JOIN accounts a
+        LEFT JOIN LATERAL (
+            SELECT bh.balance FROM balance_history bh
+            WHERE bh.account_id = a.id AND bh.date <= days.day
+            ORDER BY bh.date DESC
+            LIMIT 1
+        ) snap ON true
+        GROUP BY days.day
+    ),
+    invested_before AS (
+        SELECT COALESCE(SUM(COALESCE(amount_eur, amount)), 0) AS total
+        FROM investments WHERE date < p_start
+    ),
+    invested_daily AS (
+        SELECT date AS day, SUM(COALESCE(amount_eur, amount)) AS total
+        FROM investments WHERE date BETWEEN p_start AND p_end
+        GROUP BY date
+    ),
+    invested_series AS (
+        SELECT days.day,
+               (SELECT total FROM invested_before)
+               + SUM(COALESCE(inv.total, 0)) OVER (ORDER BY days.day) AS cumulative
+        FROM days
+        LEFT JOIN invested_daily inv ON inv.day = days.day
+    )
+    SELECT
+        s.day,
+        COALESCE(acc.total, 0),
+        s.cumulative,
+        COALESCE(acc.total, 0) + s.cumulative
+    FROM invested_series s
+    LEFT JOIN account_totals acc ON acc.day = s.day
+    ORDER BY s.day;
+$$;
+
+-- RPC entry point: the whole series as one JSON array, so ten years of days
+-- arrive in a single response instead of being cut at PostgREST's max-rows.
+CREATE OR REPLACE FUNCTION public.net_worth_series(p_start DATE, p_end DATE)
+RETURNS JSONB
+LANGUAGE sql STABLE
+AS $$
+    SELECT COALESCE(jsonb_agg(to_jsonb(t) ORDER BY t.date), '[]'::jsonb)
+    FROM public.net_worth_daily(p_start, p_end) t;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.net_worth_daily(DATE, DATE) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.net_worth_series(DATE, DATE) TO authenticated;
@@ -0,0 +1,131 @@
+-- Atomic balance updates exposed over RPC.
+-- Replaces the client-side SELECT balance -> UPDATE balance round trips,
+-- which cost several requests per write and could lose concurrent updates.
+-- Functions run as SECURITY INVOKER, so the RLS policies on accounts/expenses/income still apply.
+
+---------------------------------------
+-- FX HELPER
+---------------------------------------
+
+-- Rate to EUR for a currency, falling back to 1.0 for unknown or zero rates.
+CREATE OR REPLACE FUNCTION public.rate_to_eur(p_currency TEXT)
+RETURNS NUMERIC
+LANGUAGE sql STABLE
+AS $$
+    SELECT COALESCE(
+        (SELECT NULLIF(rate_to_eur, 0) FROM exchange_rates WHERE currency_code = COALESCE(p_currency, 'EUR')),
+        1.0
+    );
+$$;
+
+---------------------------------------
+-- BALANCE ADJUSTMENT
+---------------------------------------
+
+-- Apply a EUR-denominated delta to an account, converted to the account's currency.
+-- A single UPDATE, so concurrent callers serialize on the row lock instead of overwriting each other.
+CREATE OR REPLACE FUNCTION public.adjust_account_balance(p_account_id BIGINT, p_amount_eur_delta NUMERIC)
+RETURNS NUMERIC
+LANGUAGE sql
+AS $$
+    UPDATE accounts
+    SET balance = COALESCE(balance, 0) + p_amount_eur_delta / public.rate_to_eur(currency)
+    WHERE id = p_account_id
+    RETURNING balance;
+$$;
+
+---------------------------------------
+-- TRANSACTION WRITES (row + balance in one call)
+---------------------------------------
+
+CREATE OR REPLACE FUNCTION public.record_expense(
+    p_date DATE,
+    p_amount NUMERIC,
+    p_currency TEXT,
+    p_category_id BIGINT,
+    p_account_id BIGINT,
+    p_description TEXT,
+    p_payment_method TEXT,
+    p_vendor TEXT DEFAULT NULL,
+    p_source TEXT DEFAULT 'manual'
+)
+RETURNS expenses
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row expenses;
+BEGIN
+    INSERT INTO expenses (date, amount, currency, amount_eur, category_id, account_id,
+                          description, payment_method, vendor, source, user_id)
+    VALUES (p_date, p_amount, COALESCE(p_currency, 'EUR'), p_amount * public.rate_to_eur(p_currency),
+            p_category_id, p_account_id, p_description, p_payment_method, p_vendor, p_source, auth.uid())
+    RETURNING * INTO v_row;
+
+    PERFORM public.adjust_account_balance(p_account_id, -v_row.amount_eur);
+    RETURN v_row;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.record_income(
+    p_date DATE,
+    p_amount NUMERIC,
+    p_currency TEXT,
+    p_category_id BIGINT,
+    p_account_id BIGINT,
+    p_source TEXT,
+    p_notes TEXT DEFAULT NULL
+)
+RETURNS income
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row income;
+BEGIN
+    INSERT INTO income (date, amount, currency, amount_eur, category_id, account_id,
+                        source, notes, user_id)
+    VALUES (p_date, p_amount, COALESCE(p_currency, 'EUR'), p_amount * public.rate_to_eur(p_currency),
+            p_category_id, p_account_id, p_source, p_notes, auth.uid())
+    RETURNING * INTO v_row;
+
+    PERFORM public.adjust_account_balance(p_account_id, v_row.amount_eur);
+    RETURN v_row;
+END;
+$$;
+
+-- Both legs of a transfer move in the same transaction; amounts are in each account's own currency.
+CREATE OR REPLACE FUNCTION public.record_transfer(
+    p_date DATE,
+    p_amount NUMERIC,
+    p_source_account_id BIGINT,
+    p_destination_account_id BIGINT,
+    p_notes TEXT DEFAULT NULL,
+    p_destination_amount NUMERIC DEFAULT NULL,
+    p_exchange_rate NUMERIC DEFAULT 1.0
+)
+RETURNS transfers
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row transfers;
+BEGIN
+    INSERT INTO transfers (date, amount, source_account_id, destination_account_id,
+                           notes, destination_amount, exchange_rate)
+    VALUES (p_date, p_amount, p_source_account_id, p_destination_account_id,
+            p_notes, COALESCE(p_destination_amount, p_amount), p_exchange_rate)
+    RETURNING * INTO v_row;
+
+    UPDATE accounts SET balance = COALESCE(balance, 0) - v_row.amount
+    WHERE id = p_source_account_id;
+
+    UPDATE accounts SET balance = COALESCE(balance, 0) + v_row.destination_amount
+    WHERE id = p_destination_account_id;
+
+    RETURN v_row;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.rate_to_eur(TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.adjust_account_balance(BIGINT, NUMERIC) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.record_expense(DATE, NUMERIC, TEXT, BIGINT, BIGINT, TEXT, TEXT, TEXT, TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.record_income(DATE, NUMERIC, TEXT, BIGINT, BIGINT, TEXT, TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.record_transfer(DATE, NUMERIC, BIGINT, BIGINT, TEXT, NUMERIC, NUMERIC) TO authenticated;
@@ -0,0 +1,17 @@
+-- One budget per user, category and month.
+-- Saving the budget form becomes a single upsert (on_conflict = user_id,category_id,month)
+-- instead of a select-then-write per category, and concurrent saves can no longer duplicate rows.
+
+-- The app has always written budgets.user_id; make sure the column exists
+ALTER TABLE budgets ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES auth.users(id);
+
+-- Keep the newest row of any duplicates left by the old select-then-write path
+DELETE FROM budgets b
+USING budgets newer
+WHERE newer.user_id IS NOT DISTINCT FROM b.user_id
+  AND newer.category_id IS NOT DISTINCT FROM b.category_id
+  AND newer.month = b.month
+  AND newer.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS budgets_user_category_month_key
+ON budgets(user_id, category_id, month);
@@ -0,0 +1,86 @@
+-- Bulk transaction writes.
+-- Inserts a whole batch of expenses/income rows and applies one net balance delta
+-- per affected account, all in one RPC call and one transaction.
+-- Requires migration_balance_rpc.sql (public.rate_to_eur).
+
+---------------------------------------
+-- EXPENSES
+---------------------------------------
+
+CREATE OR REPLACE FUNCTION public.record_expenses_bulk(p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH inserted AS (
+        INSERT INTO expenses (date, amount, currency, amount_eur, category_id, account_id,
+                              description, payment_method, vendor, source, user_id)
+        SELECT r.date, r.amount, COALESCE(r.currency, 'EUR'),
+               COALESCE(r.amount_eur, r.amount * public.rate_to_eur(r.currency)),
+               r.category_id, r.account_id, r.description, r.payment_method, r.vendor,
+               COALESCE(r.source, 'manual'), auth.uid()
+        FROM jsonb_to_recordset(p_rows) AS r(
+            date DATE, amount NUMERIC, currency TEXT, amount_eur NUMERIC, category_id BIGINT,
+            account_id BIGINT, description TEXT, payment_method TEXT, vendor TEXT, source TEXT
+        )
+        RETURNING account_id, amount_eur
+    ),
+    deltas AS (
+        SELECT account_id, SUM(amount_eur) AS total FROM inserted GROUP BY account_id
+    ),
+    balances AS (
+        UPDATE accounts a
+        SET balance = COALESCE(a.balance, 0) - d.total / public.rate_to_eur(a.currency)
+        FROM deltas d
+        WHERE a.id = d.account_id
+        RETURNING a.id
+    )
+    SELECT COUNT(*) INTO v_count FROM inserted;
+
+    RETURN v_count;
+END;
+$$;
+
+---------------------------------------
+-- INCOME
+---------------------------------------
+
+CREATE OR REPLACE FUNCTION public.record_income_bulk(p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH inserted AS (
+        INSERT INTO income (date, amount, currency, amount_eur, category_id, account_id,
+                            source, notes, user_id)
+        SELECT r.date, r.amount, COALESCE(r.currency, 'EUR'),
+               COALESCE(r.amount_eur, r.amount * public.rate_to_eur(r.currency)),
+               r.category_id, r.account_id, r.source, r.notes, auth.uid()
+        FROM jsonb_to_recordset(p_rows) AS r(
+            date DATE, amount NUMERIC, currency TEXT, amount_eur NUMERIC, category_id BIGINT,
+            account_id BIGINT, source TEXT, notes TEXT
+        )
+        RETURNING account_id, amount_eur
+    ),
+    deltas AS (
+        SELECT account_id, SUM(amount_eur) AS total FROM inserted GROUP BY account_id
+    ),
+    balances AS (
+        UPDATE accounts a
+        SET balance = COALESCE(a.balance, 0) + d.total / public.rate_to_eur(a.currency)
+        FROM deltas d
+        WHERE a.id = d.account_id
+        RETURNING a.id
+    )
+    SELECT COUNT(*) INTO v_count FROM inserted;
+
+    RETURN v_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.record_expenses_bulk(JSONB) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.record_income_bulk(JSONB) TO authenticated;
@@ -0,0 +1,42 @@
+-- Composite indexes for the finance query shapes.
+-- Every read is scoped to one user by RLS, so each index leads with user_id:
+--   - transaction lists page by (date, id) keyset, newest first, within a date range;
+--   - incremental loaders read rows with id > last seen id, in id order;
+--   - budgets are read per month and looked up by (category_id, month);
+--   - the net worth series reads one user's balance snapshots up to a date.
+-- B-tree indexes scan in both directions, so one index serves ascending and descending pages.
+-- `python benchmarks/index_advisor.py` shows which plans still fall back to sequential scans.
+
+---------------------------------------
+-- TRANSACTIONS
+---------------------------------------
+
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date_id
+ON expenses(user_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_expenses_user_id_id
+ON expenses(user_id, id);
+
+CREATE INDEX IF NOT EXISTS idx_income_user_date_id
+ON income(user_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_income_user_id_id
+ON income(user_id, id);
+
+CREATE INDEX IF NOT EXISTS idx_investments_user_date_id
+ON investments(user_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_investments_user_id_id
+ON investments(user_id, id);
+
+---------------------------------------
+-- BUDGETS AND BALANCES
+---------------------------------------
+
+CREATE INDEX IF NOT EXISTS idx_budgets_user_month_category
+ON budgets(user_id, month, category_id);
+
+CREATE INDEX IF NOT EXISTS idx_balance_history_user_date
+ON balance_history(user_id, date);
+
+ANALYZE expenses, income, investments, budgets, balance_history;
@@ -0,0 +1,11 @@
+-- Per-user ingestion logs.
+-- Statement imports and the Smart Ingestor record their progress here.
+
+ALTER TABLE ingestion_logs ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES auth.users(id);
+
+ALTER TABLE ingestion_logs ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Users can view own ingestion logs" ON ingestion_logs FOR SELECT USING (auth.uid() = user_id);
+CREATE POLICY "Users can insert own ingestion logs" ON ingestion_logs FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_user_created
+ON ingestion_logs(user_id, created_at);
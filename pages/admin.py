@@ -1,48 +1,124 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
 from core.supabase_client import init_supabase
 from core.navigation import setup_navigation
+from core.ai_client import get_gateway
+from core.finance_queries import ADMIN_STATS_TTL_SECONDS, get_system_stats, get_user_profile, refresh_system_stats
+from core.telemetry import finish_page_run, get_telemetry
 
 setup_navigation()
 supabase = init_supabase()
 
 st.title("🛡️ Admin Dashboard")
 
-# Security Check (Simple Email Check for now)
-# In a real app, you'd check a 'role' in a 'profiles' table
-admin_email = "admin@lifeos.com" # Replace with your email after signup
+# Security Check: the 'admin' role on the profile (see database/migration_admin_stats.sql)
 user_email = st.session_state.get('user', {}).email if 'user' in st.session_state else ""
+profile = get_user_profile() or {}
 
-if user_email != admin_email:
+if profile.get('role') != 'admin':
     st.warning(f"Access Denied. You are logged in as {user_email}, but this page requires Admin privileges.")
-    st.info(f"To test this, sign up as '{admin_email}' or change the code in `pages/admin.py`.")
+    st.info("Set `role = 'admin'` on your row in `profiles` from the Supabase SQL editor "
+            "(local backend: `LocalDatabase(path).set_role(email, 'admin')`).")
     st.stop()
 
 st.success(f"Welcome, Admin ({user_email})")
 
 # --- System Stats ---
-st.subheader("System Statistics")
-col1, col2, col3 = st.columns(3)
-
-# Note: With RLS, normal queries only return YOUR data. 
-# To get global stats, you need a Postgres Function with SECURITY DEFINER 
-# or a Service Role Key (not safe in client).
-# For now, we show what YOU can see (which is everything if you are the only user, or just your data).
-
-try:
-    # Mocking global stats for demonstration as we can't bypass RLS easily here without SQL functions
-    col1.metric("Total Users", "1 (You)") 
-    col2.metric("System Health", "Healthy", "100%")
-    col3.metric("Database Connection", "Active")
-    
-    st.divider()
-    
-    st.subheader("User Management")
-    st.info("User management requires a 'profiles' table or Supabase Admin API access.")
-    
-    # Example of what you would do:
-    # users = supabase.table("profiles").select("*").execute()
-    # st.dataframe(users.data)
-
-except Exception as e:
-    st.error(f"Error loading admin data: {e}")
+col_title, col_refresh = st.columns([4, 1])
+col_title.subheader("System Statistics")
+if col_refresh.button("🔄 Refresh", use_container_width=True):
+    refresh_system_stats()
+
+# One SECURITY DEFINER RPC returns every cross-user count RLS would otherwise hide
+stats = get_system_stats()
+if not stats:
+    st.info("Global stats need the `admin_system_stats` function and an admin profile. "
+            "Run `database/migration_admin_stats.sql` in the Supabase SQL editor.")
+else:
+    users, tables, ingestion = stats['users'], stats['tables'], stats['ingestion']
+    transaction_rows = sum(tables.get(t, 0) for t in ('expenses', 'income', 'investments', 'transfers'))
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Users", f"{users['total']:,}", f"+{users['new_30d']:,} in 30d")
+    col2.metric("Active Users (30d)", f"{users['active_30d']:,}")
+    col3.metric("Transaction Rows", f"{transaction_rows:,}")
+    col4.metric("Ingestion Events (7d)", f"{ingestion['events_7d']:,}", f"{ingestion['events_24h']:,} in 24h")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Rows per Table**")
+        table_rows = pd.DataFrame(sorted(tables.items(), key=lambda kv: kv[1], reverse=True),
+                                  columns=['table', 'rows'])
+        st.dataframe(table_rows, use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("**Ingestion (30d)**")
+        by_source = pd.DataFrame(ingestion['by_source_30d'].items(), columns=['source', 'events'])
+        if by_source.empty:
+            st.caption("No ingestion events in the last 30 days.")
+        else:
+            st.plotly_chart(px.bar(by_source, x='source', y='events'), use_container_width=True)
+            st.dataframe(pd.DataFrame(ingestion['by_event_30d'].items(), columns=['event', 'events']),
+                         use_container_width=True, hide_index=True)
+
+    st.markdown("**Largest Ledgers**")
+    st.dataframe(pd.DataFrame(stats['largest_ledgers']), use_container_width=True, hide_index=True)
+    st.caption(f"Generated {stats['generated_at']} • cached for {ADMIN_STATS_TTL_SECONDS}s")
+
+# --- LLM Gateway ---
+st.divider()
+st.subheader("LLM Gateway")
+gateway = get_gateway()
+calls = gateway.metrics_frame()
+if calls.empty:
+    st.info("No LLM calls recorded in this process yet.")
+else:
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Calls", len(calls))
+    col2.metric("Tokens (in / out)", f"{int(calls['input_tokens'].sum()):,} / {int(calls['output_tokens'].sum()):,}")
+    col3.metric("Coalesced", int(calls['coalesced'].sum()))
+    st.dataframe(gateway.summary(), use_container_width=True)
+    st.download_button("⬇️ Export Call Metrics (JSON)", gateway.export_metrics_json(),
+                       file_name="llm_metrics.json", mime="application/json")
+
+# --- Query & Page Latency ---
+st.divider()
+st.subheader("Query & Page Latency")
+telemetry = get_telemetry()
+latency = telemetry.percentiles()
+if latency.empty:
+    st.info("No queries recorded in this process yet.")
+else:
+    queries = latency[latency['kind'] == 'query']
+    pages = latency[latency['kind'] == 'page']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requests", f"{int(queries['count'].sum()):,}")
+    col2.metric("Failed Requests", int(queries['errors'].sum()))
+    col3.metric("Slowest Query p95", f"{queries['p95_ms'].max():,.0f} ms" if not queries.empty else "–")
+    col4.metric("Slowest Page p95", f"{pages['p95_ms'].max():,.0f} ms" if not pages.empty else "–")
+
+    st.caption(f"p50/p95 over the last {telemetry.window} runs of each page and query.")
+    st.markdown("**Page reruns**")
+    st.dataframe(pages.drop(columns=['kind', 'avg_rows', 'avg_bytes']), use_container_width=True, hide_index=True)
+    st.markdown("**Queries** (`function:table`)")
+    st.dataframe(queries.drop(columns=['kind']), use_container_width=True, hide_index=True)
+
+    selected = st.selectbox("Latency histogram", latency['kind'] + ": " + latency['name'])
+    kind, name = selected.split(": ", 1)
+    fig = px.bar(telemetry.histogram(kind, name), x='bucket', y='count', template="plotly_dark")
+    st.plotly_chart(fig, use_container_width=True)
+
+    failures = telemetry.events(errors_only=True)
+    if not failures.empty:
+        with st.expander(f"Recent failures ({len(failures)})"):
+            st.dataframe(failures.tail(50), use_container_width=True)
+    with st.expander("Recent requests"):
+        st.dataframe(telemetry.events('query').tail(200), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    col1.download_button("⬇️ Export Telemetry (JSON)", telemetry.export_json(),
+                         file_name="query_telemetry.json", mime="application/json")
+    if col2.button("Reset Telemetry"):
+        telemetry.reset()
+        st.rerun()
+
+finish_page_run()
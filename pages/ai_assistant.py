@@ -2,94 +2,18 @@ import streamlit as st
 import pandas as pd
 import datetime
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from core.ai_client import init_groq
-from core.finance_queries import get_expenses, get_income, get_accounts
+from core.ai_client import get_llm
+from core.assistant_tools import stream_with_tools
+from core.token_budget import CONTEXT_MAX_SHARE, MAX_PROMPT_TOKENS, ChatMemory, make_summarizer, truncate_to_tokens
+from core.assistant_context import get_financial_context
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 
 st.title("💬 AI Financial Assistant")
 st.caption("Ask questions about your spending, income, and financial health.")
 
-# --- Helper: Get Financial Context ---
-def get_financial_context():
-    """Generates a summary of recent financial data for the AI."""
-    try:
-        # Fetch Data
-        expenses = get_expenses()
-        income = get_income()
-        accounts = get_accounts()
-        
-        # Currency Config
-        conversion_rate = st.session_state.get('conversion_rate', 1.0)
-        currency = st.session_state.get('currency', 'EUR')
-        
-        # Date Filter (Last 30 Days)
-        today = datetime.date.today()
-        start_date = today - datetime.timedelta(days=30)
-        
-        # Process Expenses
-        recent_expenses = pd.DataFrame()
-        total_spent = 0
-        top_categories = ""
-        
-        if not expenses.empty:
-            expenses['date'] = pd.to_datetime(expenses['date'])
-            recent_expenses = expenses[expenses['date'].dt.date >= start_date].copy()
-            
-            # Ensure amount_eur exists
-            recent_expenses['amount_eur'] = recent_expenses.get('amount_eur', recent_expenses['amount']).fillna(recent_expenses['amount'])
-            
-            total_spent = recent_expenses['amount_eur'].sum() / conversion_rate
-            
-            # Top Categories
-            cat_group = recent_expenses.groupby('category')['amount_eur'].sum().sort_values(ascending=False).head(5)
-            top_categories = ", ".join([f"{cat} ({val/conversion_rate:.2f} {currency})" for cat, val in cat_group.items()])
-
-        # Process Income
-        total_income = 0
-        if not income.empty:
-            income['date'] = pd.to_datetime(income['date'])
-            recent_income = income[income['date'].dt.date >= start_date].copy()
-            
-            recent_income['amount_eur'] = recent_income.get('amount_eur', recent_income['amount']).fillna(recent_income['amount'])
-            total_income = recent_income['amount_eur'].sum() / conversion_rate
-
-        # Process Accounts
-        account_summary = ""
-        if not accounts.empty:
-            # Note: Account balances are snapshots, not historical. 
-            # We assume they are roughly current or we'd need a complex ledger.
-            # For now, listing them is helpful.
-            acc_list = []
-            for _, row in accounts.iterrows():
-                # Simple conversion estimate if currency differs (not perfect without live rates for every acc)
-                # But let's just list them as is for context
-                acc_list.append(f"{row['name']} ({row['balance']} {row['currency']})")
-            account_summary = ", ".join(acc_list)
-
-        # Construct Context String
-        context = f"""
-        Financial Context (Last 30 Days, displayed in {currency}):
-        - Total Income: {total_income:,.2f} {currency}
-        - Total Expenses: {total_spent:,.2f} {currency}
-        - Net Savings: {(total_income - total_spent):,.2f} {currency}
-        - Top Expense Categories: {top_categories}
-        - Current Accounts: {account_summary}
-        
-        Recent Transactions (Sample):
-        """
-        
-        if not recent_expenses.empty:
-            for _, row in recent_expenses.head(10).iterrows():
-                amt = row['amount_eur'] / conversion_rate
-                context += f"- {row['date'].date()}: {row['description']} ({row['category']}) - {amt:.2f} {currency}\n"
-        
-        return context
-        
-    except Exception as e:
-        return f"Error generating context: {e}"
-
 # --- Chat Interface ---
 
 # Initialize Chat History
@@ -98,6 +22,19 @@ if "messages" not in st.session_state:
         AIMessage(content="Hello! I'm your financial assistant. How can I help you today?")
     ]
 
+def record_metrics(metrics):
+    """Keep per-message latency metrics for the session."""
+    st.session_state.setdefault('assistant_metrics', []).append(dict(metrics))
+
+# A Stop click reruns the script, which interrupts the stream; keep what had arrived
+if 'assistant_partial' in st.session_state:
+    partial = st.session_state.pop('assistant_partial')
+    metrics = st.session_state.pop('assistant_pending_metrics', {})
+    if partial:
+        st.session_state.messages.append(AIMessage(content=partial + " …"))
+    metrics['cancelled'] = True
+    record_metrics(metrics)
+
 # Display Chat History
 for msg in st.session_state.messages:
     if isinstance(msg, AIMessage):
@@ -112,36 +49,79 @@ if prompt := st.chat_input("Ask about your finances..."):
     st.session_state.messages.append(HumanMessage(content=prompt))
     
     # Generate Response
-    with st.spinner("Thinking..."):
-        try:
-            llm = init_groq() # Default versatile model
-            
-            # Get Context
-            context = get_financial_context()
-            
-            # System Prompt
-            system_prompt = f"""You are a smart and helpful financial assistant for LifeOs. 
-            You have access to the user's recent financial data (last 30 days).
-            
-            {context}
-            
-            Rules:
-            1. Answer questions based strictly on the provided context.
-            2. If you don't know the answer (e.g., data older than 30 days), say so politely.
-            3. Be concise and encouraging.
-            4. If the user asks for advice, provide general financial tips based on their spending habits visible in the context.
-            5. Format currency values clearly (e.g., €150.00).
-            """
-            
-            # Construct Message History for LLM
-            # We'll send System + Last few messages to keep context window manageable
-            messages = [SystemMessage(content=system_prompt)] + st.session_state.messages[-5:]
-            
-            response = llm.invoke(messages)
-            
-            # Display Assistant Response
-            st.chat_message("assistant").write(response.content)
-            st.session_state.messages.append(AIMessage(content=response.content))
-            
-        except Exception as e:
-            st.error(f"Error: {e}")
+    try:
+        llm = get_llm("chat") # Default versatile model
+        
+        # Get Context (capped so it cannot crowd out the conversation)
+        context = truncate_to_tokens(get_financial_context(), int(MAX_PROMPT_TOKENS * CONTEXT_MAX_SHARE))
+        
+        # System Prompt
+        system_prompt = f"""You are a smart and helpful financial assistant for LifeOs. 
+        You have a summary of the user's last 30 days below, and tools that query their full history.
+        Today is {datetime.date.today()}.
+        
+        {context}
+        
+        Rules:
+        1. Answer from the summary when it covers the question; otherwise call the tools (any date range).
+        2. If neither the summary nor the tools can answer it, say so politely.
+        3. Be concise and encouraging.
+        4. If the user asks for advice, provide general financial tips based on their spending habits visible in the context.
+        5. Format currency values clearly (e.g., €150.00).
+        """
+        
+        # Construct Message History for LLM
+        # Newest turns that fit the token budget; older ones are folded into a running summary
+        memory = st.session_state.setdefault('chat_memory', ChatMemory())
+        summarizer = make_summarizer(get_llm("summary"))
+        messages, usage = memory.build(system_prompt, st.session_state.messages, summarize=summarizer)
+        
+        # Stream the answer into the chat bubble as it is generated
+        with st.chat_message("assistant"):
+            st.button("⏹ Stop generating", key="stop_generation")
+            tool_log = st.empty()
+            placeholder = st.empty()
+            placeholder.markdown("▌")
+            metrics = dict(usage)
+            st.session_state['assistant_pending_metrics'] = metrics
+            response = ""
+            tool_calls = []
+            def show_tool_call(call):
+                args = ", ".join(f"{k}={v}" for k, v in call['args'].items())
+                tool_calls.append(f"🔧 {call['name']}({args})")
+                tool_log.caption("  \n".join(tool_calls))
+            for piece in stream_with_tools(llm, messages, metrics, on_tool_call=show_tool_call):
+                response += piece
+                st.session_state['assistant_partial'] = response
+                placeholder.markdown(response + "▌")
+            placeholder.markdown(response)
+            st.caption(
+                f"First token {metrics['ttft_ms'] or 0:,.0f} ms · total {metrics['total_ms'] / 1000:.1f} s · "
+                f"prompt ~{usage['prompt_tokens']:,} tokens"
+            )
+        
+        st.session_state.pop('assistant_partial', None)
+        st.session_state.pop('assistant_pending_metrics', None)
+        st.session_state.messages.append(AIMessage(content=response))
+        record_metrics(metrics)
+        
+    except Exception as e:
+        st.session_state.pop('assistant_partial', None)
+        st.session_state.pop('assistant_pending_metrics', None)
+        st.error(f"Error: {e}")
+
+# --- Latency Metrics ---
+if st.session_state.get('assistant_metrics'):
+    with st.expander("⏱️ Response Latency"):
+        metrics_df = pd.DataFrame(st.session_state['assistant_metrics'])
+        completed = metrics_df[~metrics_df['cancelled']]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Median First Token", f"{completed['ttft_ms'].median():,.0f} ms" if not completed.empty else "–")
+        col2.metric("Median Total", f"{completed['total_ms'].median() / 1000:,.1f} s" if not completed.empty else "–")
+        col3.metric("Cancelled", int(metrics_df['cancelled'].sum()))
+        if 'prompt_tokens' in metrics_df.columns:
+            col4.metric("Prompt Tokens (last)", f"{int(metrics_df['prompt_tokens'].dropna().iloc[-1]):,} / {MAX_PROMPT_TOKENS:,}"
+                        if metrics_df['prompt_tokens'].notna().any() else "–")
+        st.dataframe(metrics_df, use_container_width=True)
+
+finish_page_run()
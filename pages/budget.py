@@ -3,6 +3,8 @@ import pandas as pd
 import datetime
 from core.finance_queries import get_categories, get_budgets, add_budget, get_expenses
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
+from core import analytics
 
 setup_navigation()
 
@@ -24,15 +26,10 @@ with col_sel1:
 # --- Data Loading ---
 categories_df = get_categories("expense")
 budgets_df = get_budgets(month_str)
-expenses_df = get_expenses()
 
-# Filter expenses for this month
-if not expenses_df.empty:
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-    mask = (expenses_df['date'].dt.strftime("%Y-%m") == month_str)
-    monthly_expenses = expenses_df[mask]
-else:
-    monthly_expenses = pd.DataFrame()
+# Fetch only this month's expenses
+month_end = (pd.Timestamp(selected_month) + pd.offsets.MonthEnd(0)).date()
+monthly_expenses = get_expenses(selected_month, month_end, columns=['amount', 'amount_eur', 'category'])
 
 # --- Budget Setting ---
 with st.expander("📝 Set/Update Budget", expanded=False):
@@ -60,45 +57,23 @@ display_currency = st.session_state.get('currency', 'EUR')
 conversion_rate = st.session_state.get('conversion_rate', 1.0)
 
 if not categories_df.empty:
-    # Prepare Data
-    # 1. Get all expense categories
-    budget_data = []
-    
-    # Calculate actual spend per category
-    spend_map = {}
-    if not monthly_expenses.empty:
-        monthly_expenses['amount_eur'] = monthly_expenses.get('amount_eur', monthly_expenses['amount']).fillna(monthly_expenses['amount'])
-        spend_series = monthly_expenses.groupby('category')['amount_eur'].sum()
-        spend_map = spend_series.to_dict()
-        
-    # Map budgets
-    budget_map = {}
-    if not budgets_df.empty:
-        for _, row in budgets_df.iterrows():
-            budget_map[row['category']] = row['budget_amount']
-            
-    # Combine
-    total_budget = 0
-    total_spent = 0
-    
-    for _, row in categories_df.iterrows():
-        cat_name = row['name']
-        budget_val = budget_map.get(cat_name, 0.0)
-        spent_val_eur = spend_map.get(cat_name, 0.0)
-        
-        # Convert to display
-        spent_val = spent_val_eur / conversion_rate
-        
-        if budget_val > 0 or spent_val > 0:
-            budget_data.append({
-                "Category": cat_name,
-                "Budget": budget_val,
-                "Spent": spent_val,
-                "Remaining": budget_val - spent_val,
-                "Progress": (spent_val / budget_val * 100) if budget_val > 0 else (100 if spent_val > 0 else 0)
-            })
-            total_budget += budget_val
-            total_spent += spent_val
+    # Budget vs actual for every expense category that has a budget or spend
+    status = analytics.budget_vs_actual(
+        budgets_df,
+        analytics.normalize_transactions(monthly_expenses),
+        conversion_rate,
+        categories=categories_df['name'].tolist(),
+        memo_key=('budget', selected_month)
+    )
+    total_budget = status['budget'].sum()
+    total_spent = status['spent'].sum()
+    budget_data = status.rename(columns={
+        'category': 'Category',
+        'budget': 'Budget',
+        'spent': 'Spent',
+        'remaining': 'Remaining',
+        'progress': 'Progress'
+    }).to_dict('records')
             
     # Display Totals
     m1, m2, m3 = st.columns(3)
@@ -134,3 +109,5 @@ if not categories_df.empty:
 
 else:
     st.warning("Please configure categories first.")
+
+finish_page_run()
@@ -2,8 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import datetime
-from core.finance_queries import get_categories, get_accounts, add_expense, get_expenses
+from core.finance_queries import get_categories, get_accounts, add_expense, get_expenses, get_transaction_months, export_transactions_csv
 from core.navigation import setup_navigation
+from core.supabase_client import get_authenticated_client
+from core.telemetry import finish_page_run
+from core.classifier import suggest_category, suggestion_names
+from core import analytics
 
 setup_navigation()
 
@@ -16,7 +20,18 @@ accounts_df = get_accounts()
 if categories_df.empty or accounts_df.empty:
     st.warning("⚠️ Please configure Categories and Accounts in 'Settings' first.")
 else:
+    def prefill_from_vendor():
+        # Pre-select category/account from how this vendor was booked before
+        suggestion = suggest_category(st.session_state.get('vendor_input'))
+        category_name, account_name = suggestion_names(suggestion, categories_df, accounts_df)
+        if category_name:
+            st.session_state['cat_select'] = category_name
+        if account_name:
+            st.session_state['acc_select'] = account_name
+
     with st.expander("➕ Add New Expense", expanded=True):
+        # Outside the form so typing a vendor can pre-fill the selectors below
+        vendor = st.text_input("Vendor (Optional)", key='vendor_input', on_change=prefill_from_vendor)
         with st.form("add_expense_form"):
             col1, col2 = st.columns(2)
             with col1:
@@ -31,7 +46,6 @@ else:
             with col2:
                 account = st.selectbox("Paid From (Account)", accounts_df['name'], key='acc_select')
                 payment_method = st.selectbox("Payment Method", ["card", "upi", "bank", "cash", "tikkie"])
-                vendor = st.text_input("Vendor (Optional)")
             
             description = st.text_area("Description")
             tags = st.text_input("Tags (comma separated, e.g. 'Cousin, Loan')")
@@ -52,46 +66,46 @@ else:
 # View Expenses
 with st.expander("📊 History & Analysis", expanded=False):
     st.subheader("Expense Analysis")
-    expenses = get_expenses()
+    # Only (year, month) pairs for the selectors; the selected month is fetched below
+    available_periods = get_transaction_months("expenses")
     
     # --- Currency Config ---
     display_currency = st.session_state.get('currency', 'EUR')
     conversion_rate = st.session_state.get('conversion_rate', 1.0)
     if conversion_rate == 0: conversion_rate = 1.0
     
-    if not expenses.empty:
-        # Pre-process
-        expenses['date'] = pd.to_datetime(expenses['date'])
-        expenses['month'] = expenses['date'].dt.month
-        expenses['year'] = expenses['date'].dt.year
-        expenses['amount_eur'] = expenses.get('amount_eur', expenses['amount']).fillna(expenses['amount'])
-        
+    if available_periods:
         # --- Filters ---
         col_f1, col_f2, col_f3 = st.columns(3)
         
         with col_f1:
-            unique_years = sorted(expenses['year'].unique(), reverse=True)
+            unique_years = sorted({year for year, _ in available_periods}, reverse=True)
             selected_year = st.selectbox("Year", unique_years)
             
         with col_f2:
             # Filter months available in selected year
-            available_months = sorted(expenses[expenses['year'] == selected_year]['month'].unique())
+            available_months = [month for year, month in available_periods if year == selected_year]
             # Default to latest month
             default_ix = len(available_months) - 1 if available_months else 0
             selected_month = st.selectbox("Month", available_months, index=default_ix, format_func=lambda x: datetime.date(1900, x, 1).strftime('%B'))
             
         with col_f3:
-            categories = ["All"] + sorted(expenses['category'].unique().tolist())
+            categories = ["All"] + (sorted(categories_df['name'].tolist()) if not categories_df.empty else [])
             selected_category = st.selectbox("Category Filter", categories)
             
-        # --- Apply Filters ---
-        mask = (expenses['year'] == selected_year) & (expenses['month'] == selected_month)
+        # --- Apply Filters (server-side) ---
+        month_start = datetime.date(int(selected_year), int(selected_month), 1)
+        month_end = (pd.Timestamp(month_start) + pd.offsets.MonthEnd(0)).date()
+        category_ids = None
         if selected_category != "All":
-            mask = mask & (expenses['category'] == selected_category)
+            category_ids = categories_df[categories_df['name'] == selected_category]['id'].tolist()
             
-        filtered_df = expenses[mask].copy()
+        filtered_df = get_expenses(month_start, month_end, category_ids=category_ids, columns=['date', 'amount', 'amount_eur', 'category', 'description', 'account', 'payment_method', 'vendor'])
         
         if not filtered_df.empty:
+            filtered_df = analytics.normalize_transactions(filtered_df)
+            memo_key = ('expenses', month_start, month_end, selected_category)
+            
             # --- Metrics ---
             total_spend_eur = filtered_df['amount_eur'].sum()
             total_spend_display = total_spend_eur / conversion_rate
@@ -115,7 +129,7 @@ with st.expander("📊 History & Analysis", expanded=False):
             
             with c1:
                 st.caption("Daily Trend")
-                daily_trend = filtered_df.groupby('date')['amount_eur'].sum().reset_index()
+                daily_trend = analytics.daily_totals(filtered_df, memo_key=memo_key)
                 daily_trend['amount_display'] = daily_trend['amount_eur'] / conversion_rate
                 fig_trend = px.bar(daily_trend, x='date', y='amount_display', color_discrete_sequence=['#FF4B4B'])
                 fig_trend.update_layout(xaxis_title=None, yaxis_title=None, margin=dict(t=0, b=0, l=0, r=0))
@@ -123,7 +137,7 @@ with st.expander("📊 History & Analysis", expanded=False):
                 
             with c2:
                 st.caption("Category Split")
-                cat_split = filtered_df.groupby('category')['amount_eur'].sum().reset_index()
+                cat_split = analytics.category_split(filtered_df, memo_key=memo_key)
                 cat_split['amount_display'] = cat_split['amount_eur'] / conversion_rate
                 fig_cat = px.pie(cat_split, values='amount_display', names='category', hole=0.4, color_discrete_sequence=px.colors.sequential.RdBu)
                 fig_cat.update_layout(margin=dict(t=0, b=0, l=0, r=0))
@@ -157,6 +171,17 @@ with st.expander("📊 History & Analysis", expanded=False):
             
         else:
             st.info("No expenses found for this selection.")
+
+        # The callable runs after this script run, without session state: bind the client now
+        export_client = get_authenticated_client()
+        st.download_button(
+            "⬇️ Export All Expenses (CSV)",
+            data=lambda: export_transactions_csv("expenses", client=export_client),
+            file_name="expenses.csv",
+            mime="text/csv"
+        )
     
     else:
         st.info("No expenses recorded yet.")
+
+finish_page_run()
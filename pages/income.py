@@ -2,8 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import datetime
-from core.finance_queries import get_categories, get_accounts, add_income, get_income
+from core.finance_queries import get_categories, get_accounts, add_income, get_income, get_transaction_months, export_transactions_csv
 from core.navigation import setup_navigation
+from core.supabase_client import get_authenticated_client
+from core.telemetry import finish_page_run
+from core import analytics
 
 setup_navigation()
 
@@ -48,44 +51,44 @@ else:
 # View Income
 with st.expander("📊 History & Analysis", expanded=False):
     st.subheader("Income Analysis")
-    income_data = get_income()
+    # Only (year, month) pairs for the selectors; the selected month is fetched below
+    available_periods = get_transaction_months("income")
     
     # --- Currency Config ---
     display_currency = st.session_state.get('currency', 'EUR')
     conversion_rate = st.session_state.get('conversion_rate', 1.0)
     if conversion_rate == 0: conversion_rate = 1.0
     
-    if not income_data.empty:
-        # Pre-process
-        income_data['date'] = pd.to_datetime(income_data['date'])
-        income_data['month'] = income_data['date'].dt.month
-        income_data['year'] = income_data['date'].dt.year
-        income_data['amount_eur'] = income_data.get('amount_eur', income_data['amount']).fillna(income_data['amount'])
-        
+    if available_periods:
         # --- Filters ---
         col_f1, col_f2, col_f3 = st.columns(3)
         
         with col_f1:
-            unique_years = sorted(income_data['year'].unique(), reverse=True)
+            unique_years = sorted({year for year, _ in available_periods}, reverse=True)
             selected_year = st.selectbox("Year", unique_years)
             
         with col_f2:
-            available_months = sorted(income_data[income_data['year'] == selected_year]['month'].unique())
+            available_months = [month for year, month in available_periods if year == selected_year]
             default_ix = len(available_months) - 1 if available_months else 0
             selected_month = st.selectbox("Month", available_months, index=default_ix, format_func=lambda x: datetime.date(1900, x, 1).strftime('%B'))
             
         with col_f3:
-            categories = ["All"] + sorted(income_data['category'].unique().tolist())
+            categories = ["All"] + (sorted(categories_df['name'].tolist()) if not categories_df.empty else [])
             selected_category = st.selectbox("Category Filter", categories)
             
-        # --- Apply Filters ---
-        mask = (income_data['year'] == selected_year) & (income_data['month'] == selected_month)
+        # --- Apply Filters (server-side) ---
+        month_start = datetime.date(int(selected_year), int(selected_month), 1)
+        month_end = (pd.Timestamp(month_start) + pd.offsets.MonthEnd(0)).date()
+        category_ids = None
         if selected_category != "All":
-            mask = mask & (income_data['category'] == selected_category)
+            category_ids = categories_df[categories_df['name'] == selected_category]['id'].tolist()
             
-        filtered_df = income_data[mask].copy()
+        filtered_df = get_income(month_start, month_end, category_ids=category_ids, columns=['date', 'amount', 'amount_eur', 'category', 'source', 'account', 'notes'])
         
         if not filtered_df.empty:
+            filtered_df = analytics.normalize_transactions(filtered_df)
+            memo_key = ('income', month_start, month_end, selected_category)
+            
             # --- Metrics ---
             total_income_eur = filtered_df['amount_eur'].sum()
             total_income_display = total_income_eur / conversion_rate
@@ -101,7 +104,7 @@ with st.expander("📊 History & Analysis", expanded=False):
             
             with c1:
                 st.caption("Income Trend")
-                daily_trend = filtered_df.groupby('date')['amount_eur'].sum().reset_index()
+                daily_trend = analytics.daily_totals(filtered_df, memo_key=memo_key)
                 daily_trend['amount_display'] = daily_trend['amount_eur'] / conversion_rate
                 fig_trend = px.bar(daily_trend, x='date', y='amount_display', color_discrete_sequence=['#00CC96'])
                 fig_trend.update_layout(xaxis_title=None, yaxis_title=None, margin=dict(t=0, b=0, l=0, r=0))
@@ -109,7 +112,7 @@ with st.expander("📊 History & Analysis", expanded=False):
                 
             with c2:
                 st.caption("Category Split")
-                cat_split = filtered_df.groupby('category')['amount_eur'].sum().reset_index()
+                cat_split = analytics.category_split(filtered_df, memo_key=memo_key)
                 cat_split['amount_display'] = cat_split['amount_eur'] / conversion_rate
                 fig_cat = px.pie(cat_split, values='amount_display', names='category', hole=0.4, color_discrete_sequence=px.colors.sequential.Emrld)
                 fig_cat.update_layout(margin=dict(t=0, b=0, l=0, r=0))
@@ -141,6 +144,17 @@ with st.expander("📊 History & Analysis", expanded=False):
             
         else:
             st.info("No income found for this selection.")
+
+        # The callable runs after this script run, without session state: bind the client now
+        export_client = get_authenticated_client()
+        st.download_button(
+            "⬇️ Export All Income (CSV)",
+            data=lambda: export_transactions_csv("income", client=export_client),
+            file_name="income.csv",
+            mime="text/csv"
+        )
     
     else:
         st.info("No income recorded yet.")
+
+finish_page_run()
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from core.finance_queries import get_categories, get_accounts, add_investment, get_investments
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 
@@ -54,3 +55,5 @@ if not inv_data.empty:
     st.dataframe(inv_data[display_cols], use_container_width=True)
 else:
     st.info("No investments recorded.")
+
+finish_page_run()
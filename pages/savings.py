@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from core.finance_queries import add_saving_goal, get_saving_goals
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 
@@ -44,3 +45,5 @@ if not goals.empty:
         st.divider()
 else:
     st.info("No savings goals set.")
+
+finish_page_run()
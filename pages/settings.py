@@ -3,6 +3,7 @@ import pandas as pd
 from core.finance_queries import add_account, add_category, get_accounts, get_categories
 from core.supabase_client import init_supabase
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 supabase = init_supabase()
@@ -81,7 +82,7 @@ with tab2:
         expense_cats = df_cats[df_cats['type'] == 'expense']
         
         if not expense_cats.empty:
-            from core.finance_queries import add_budget, get_budgets
+            from core.finance_queries import copy_budgets, get_budgets, save_budgets
             import datetime
             
             # Month Selector
@@ -115,16 +116,28 @@ with tab2:
                         )
                 
                 if st.form_submit_button("Save Budgets"):
-                    success_count = 0
-                    for cat_id, amount in budget_inputs.items():
-                        if amount > 0 or cat_id in budget_map: # Save if > 0 or if updating existing
-                             add_budget(cat_id, amount, selected_month)
-                             success_count += 1
-                    
-                    if success_count > 0:
-                        st.success(f"Updated budgets for {success_count} categories!")
+                    # Save if > 0 or if updating existing; one request for the whole form
+                    changed = {cat_id: amount for cat_id, amount in budget_inputs.items()
+                               if amount > 0 or cat_id in budget_map}
+                    if changed and save_budgets(selected_month, changed):
+                        st.success(f"Updated budgets for {len(changed)} categories!")
                         st.rerun()
+
+            # Copy to following months
+            if budget_map:
+                c1, c2, c3 = st.columns(3)
+                with c1:
+                    copy_months = st.number_input("Copy to next N months", min_value=1, max_value=24, value=1, step=1)
+                with c2:
+                    overwrite = st.checkbox("Overwrite budgets already set", value=False)
+                with c3:
+                    if st.button(f"Copy {selected_month} Budgets"):
+                        res = copy_budgets(selected_month, int(copy_months), overwrite=overwrite)
+                        if res is not None:
+                            st.success(f"Copied {len(res.data)} budgets to the next {int(copy_months)} month(s)!")
         else:
             st.info("No expense categories found to budget for.")
     else:
         st.info("Add categories first to set budgets.")
+
+finish_page_run()
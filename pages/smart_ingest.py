@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
-import json
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from core.ai_client import init_groq
-from core.finance_queries import get_categories, get_accounts, add_expense
+from core.ai_client import get_llm
+from core.extraction import (
+    DEFAULT_CONCURRENCY, build_extraction_chain, extract_batch, extract_one, model_name,
+    read_uploaded_snippet, results_to_frame, route_fast_path, split_snippets
+)
+from core.fast_parser import FAST_PATH_MIN_CONFIDENCE, fast_parse
+from core.classifier import suggest_category, suggestion_names
+from core.llm_cache import get_llm_cache
+from core.finance_queries import get_categories, get_accounts, add_expense, add_expenses_bulk
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 
@@ -18,96 +23,203 @@ def get_context():
     accs = get_accounts()['name'].tolist()
     return cats, accs
 
-# --- Text Input Only ---
-raw_text = st.text_area("Paste Receipt Text", height=150, placeholder="e.g. 'Uber ride on Oct 24 cost 15.50 euros'")
-if st.button("✨ Parse Text"):
-    if raw_text:
-        with st.spinner("Reading text..."):
-            try:
-                llm = init_groq() # Default text model
-                cats, accs = get_context()
-                
-                parser = JsonOutputParser()
-                prompt = PromptTemplate(
-                    template="""
-                    Extract details:
-                    - date (YYYY-MM-DD)
-                    - amount (float)
-                    - merchant (string)
-                    - category (choose from: {categories})
-                    - account (choose from: {accounts})
-                    - description (short summary)
-                    
-                    Text: {text}
-                    
-                    {format_instructions}
-                    """,
-                    input_variables=["text", "categories", "accounts"],
-                    partial_variables={"format_instructions": parser.get_format_instructions()}
-                )
-                
-                chain = prompt | llm | parser
-                result = chain.invoke({"text": raw_text, "categories": cats, "accounts": accs})
-                
-                st.session_state['parsed_data'] = result
-                st.success("Text Parsed!")
-            except Exception as e:
-                st.error(f"Text Error: {e}")
-
-# --- Review Section ---
-if 'parsed_data' in st.session_state:
-    st.divider()
-    st.subheader("Review & Save")
+def history_prefill(merchant, description, category=None, account=None):
+    """Category/account from the user's own booking history, falling back to the parsed values."""
+    suggestion = suggest_category(merchant, description)
+    hist_category, hist_account = suggestion_names(suggestion, get_categories('expense'), get_accounts())
+    return hist_category or category, hist_account or account
+
+mode = st.radio("Mode", ["Single", "Batch"], horizontal=True)
+
+if mode == "Single":
+    # --- Text Input Only ---
+    raw_text = st.text_area("Paste Receipt Text", height=150, placeholder="e.g. 'Uber ride on Oct 24 cost 15.50 euros'")
+    if st.button("✨ Parse Text"):
+        if raw_text:
+            with st.spinner("Reading text..."):
+                try:
+                    # Known notification templates are parsed locally; the LLM only sees the rest
+                    result = fast_parse(raw_text)
+                    if not result or result['confidence'] < FAST_PATH_MIN_CONFIDENCE:
+                        llm = get_llm("extraction") # Small model is enough for field extraction
+                        cats, accs = get_context()
+
+                        chain = build_extraction_chain(llm)
+                        result = extract_one(chain, raw_text, cats, accs, cache=get_llm_cache(), model=model_name(llm))
+
+                    st.session_state['parsed_data'] = result
+                    st.success("Text Parsed!")
+                except Exception as e:
+                    st.error(f"Text Error: {e}")
+
+    # --- Review Section ---
+    if 'parsed_data' in st.session_state:
+        st.divider()
+        st.subheader("Review & Save")
     
-    data = st.session_state['parsed_data']
+        data = st.session_state['parsed_data']
     
-    with st.form("review_form"):
-        col1, col2 = st.columns(2)
-        with col1:
-            # Handle date parsing safely
-            try:
-                default_date = pd.to_datetime(data.get('date', 'today')).date()
-            except:
-                default_date = pd.to_datetime('today').date()
+        with st.form("review_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                # Handle date parsing safely
+                try:
+                    default_date = pd.to_datetime(data.get('date', 'today')).date()
+                except:
+                    default_date = pd.to_datetime('today').date()
                 
-            date = st.date_input("Date", value=default_date)
-            col_amt, col_curr = st.columns([2, 1])
-            with col_amt:
-                amount = st.number_input("Amount", value=float(data.get('amount', 0.0)))
-            with col_curr:
-                currency = st.selectbox("Currency", ["EUR", "USD", "INR", "GBP"], index=0) # Default EUR
+                date = st.date_input("Date", value=default_date)
+                col_amt, col_curr = st.columns([2, 1])
+                with col_amt:
+                    amount = st.number_input("Amount", value=float(data.get('amount', 0.0)))
+                with col_curr:
+                    currencies = ["EUR", "USD", "INR", "GBP"]
+                    parsed_currency = data.get('currency')
+                    currency = st.selectbox("Currency", currencies, index=currencies.index(parsed_currency) if parsed_currency in currencies else 0)
             
-            merchant = st.text_input("Merchant", value=data.get('merchant', ''))
+                merchant = st.text_input("Merchant", value=data.get('merchant', ''))
         
-        with col2:
-            cats, accs = get_context()
+            with col2:
+                cats, accs = get_context()
+                parsed_category, parsed_account = history_prefill(
+                    data.get('merchant'), data.get('description'), data.get('category'), data.get('account')
+                )
             
-            # Try to match category/account
-            try:
-                cat_idx = cats.index(data.get('category'))
-            except:
-                cat_idx = 0
+                # Try to match category/account
+                try:
+                    cat_idx = cats.index(parsed_category)
+                except:
+                    cat_idx = 0
                 
-            try:
-                acc_idx = accs.index(data.get('account'))
-            except:
-                acc_idx = 0
+                try:
+                    acc_idx = accs.index(parsed_account)
+                except:
+                    acc_idx = 0
             
-            category = st.selectbox("Category", cats, index=cat_idx)
-            account = st.selectbox("Account", accs, index=acc_idx)
-            payment_method = st.selectbox("Payment Method", ["card", "upi", "bank", "cash", "tikkie"])
+                category = st.selectbox("Category", cats, index=cat_idx)
+                account = st.selectbox("Account", accs, index=acc_idx)
+                methods = ["card", "upi", "bank", "cash", "tikkie"]
+                parsed_method = data.get('payment_method')
+                payment_method = st.selectbox("Payment Method", methods, index=methods.index(parsed_method) if parsed_method in methods else 0)
             
-        description = st.text_area("Description", value=data.get('description', ''))
+            description = st.text_area("Description", value=data.get('description', ''))
         
-        submitted = st.form_submit_button("💾 Save Expense")
+            submitted = st.form_submit_button("💾 Save Expense")
         
-        if submitted:
-            # Get IDs
-            cat_id = int(get_categories()[get_categories()['name'] == category].iloc[0]['id'])
-            acc_id = int(get_accounts()[get_accounts()['name'] == account].iloc[0]['id'])
+            if submitted:
+                # Get IDs
+                cat_id = int(get_categories()[get_categories()['name'] == category].iloc[0]['id'])
+                acc_id = int(get_accounts()[get_accounts()['name'] == account].iloc[0]['id'])
             
-            res = add_expense(str(date), amount, cat_id, acc_id, description, payment_method, currency, merchant)
-            if res:
-                st.success("Saved successfully!")
-                del st.session_state['parsed_data']
+                res = add_expense(str(date), amount, cat_id, acc_id, description, payment_method, currency, merchant)
+                if res:
+                    st.success("Saved successfully!")
+                    del st.session_state['parsed_data']
+                    st.rerun()
+
+else:
+    # --- Batch Input ---
+    st.caption("One snippet per line, or separate multi-line snippets with a blank line.")
+    dump = st.text_area("Paste SMS / Email Dump", height=200)
+    files = st.file_uploader("Or upload exported messages", type=["txt", "eml"], accept_multiple_files=True)
+    concurrency = st.slider("Parallel requests", min_value=1, max_value=20, value=DEFAULT_CONCURRENCY)
+
+    if st.button("✨ Parse Batch"):
+        snippets = split_snippets(dump) + [read_uploaded_snippet(f.name, f.getvalue()) for f in files or []]
+        snippets = [s for s in snippets if s]
+        if snippets:
+            with st.spinner(f"Parsing {len(snippets)} snippets..."):
+                results, pending = route_fast_path(snippets)
+                llm = get_llm("extraction") if pending else None
+                if llm:
+                    cats, accs = get_context()
+                    chain = build_extraction_chain(llm)
+                    llm_results = extract_batch(
+                        chain, [snippets[i] for i in pending], cats, accs, max_concurrency=concurrency,
+                        cache=get_llm_cache(), model=model_name(llm)
+                    )
+                    for i, result in zip(pending, llm_results):
+                        results[i] = result
+                else:
+                    # Keep the fast-path parses; the rest are left for manual entry
+                    for i in pending:
+                        results[i] = RuntimeError("LLM unavailable; fill in manually")
+                batch_df = results_to_frame(snippets, results)
+                prefilled = [
+                    history_prefill(r.merchant, r.description, r.category, r.account)
+                    for r in batch_df.itertuples(index=False)
+                ]
+                batch_df['category'] = [c for c, _ in prefilled]
+                batch_df['account'] = [a for _, a in prefilled]
+                st.session_state['batch_parsed'] = batch_df
+
+    # Outcome of the last save, shown after the rerun that clears the grid
+    saved_notice = st.session_state.pop('batch_saved_notice', None)
+    if saved_notice:
+        st.success(saved_notice['success'])
+        if saved_notice['skipped']:
+            st.warning(f"Skipped {saved_notice['skipped']} rows without a date, mapped account or positive amount.")
+
+    # --- Batch Review Section ---
+    if 'batch_parsed' in st.session_state:
+        st.divider()
+        st.subheader("Review & Save")
+
+        batch_df = st.session_state['batch_parsed']
+        stats = get_llm_cache().stats()
+        st.caption(f"Extraction cache: {stats['entries']:,} entries, hit rate {stats['hit_rate']:.0%} this session")
+        fast = int(batch_df['parser'].fillna('').str.startswith('rules').sum())
+        st.caption(f"{fast} of {len(batch_df)} snippets parsed by the fast path without the LLM")
+        failed = int(batch_df['error'].notna().sum())
+        if failed:
+            st.warning(f"{failed} of {len(batch_df)} snippets could not be parsed; fill them in or leave them unticked.")
+
+        cats, accs = get_context()
+        edited = st.data_editor(
+            batch_df,
+            column_order=['save', 'date', 'amount', 'currency', 'merchant', 'category', 'account',
+                          'payment_method', 'description', 'parser', 'confidence', 'text', 'error'],
+            column_config={
+                'save': st.column_config.CheckboxColumn("Save"),
+                'date': st.column_config.DateColumn("Date"),
+                'amount': st.column_config.NumberColumn("Amount", min_value=0.0, format="%.2f"),
+                'currency': st.column_config.SelectboxColumn("Currency", options=["EUR", "USD", "INR", "GBP"]),
+                'category': st.column_config.SelectboxColumn("Category", options=cats),
+                'account': st.column_config.SelectboxColumn("Account", options=accs),
+                'payment_method': st.column_config.SelectboxColumn("Payment Method", options=["card", "upi", "bank", "cash", "tikkie"]),
+                'parser': st.column_config.TextColumn("Parsed By", disabled=True),
+                'confidence': st.column_config.ProgressColumn("Confidence", min_value=0.0, max_value=1.0),
+                'text': st.column_config.TextColumn("Original Text", disabled=True),
+                'error': st.column_config.TextColumn("Error", disabled=True),
+            },
+            hide_index=True,
+            use_container_width=True,
+            key="batch_editor"
+        )
+
+        source = st.selectbox("Source", ["sms", "email", "manual"])
+        if st.button("💾 Save Selected"):
+            to_save = edited[edited['save']]
+            cat_ids = get_categories('expense').set_index('name')['id']
+            acc_ids = get_accounts().set_index('name')['id']
+            rows = pd.DataFrame({
+                'date': to_save['date'],
+                'amount': to_save['amount'],
+                'currency': to_save['currency'],
+                'category_id': to_save['category'].map(cat_ids),
+                'account_id': to_save['account'].map(acc_ids),
+                'description': to_save['description'],
+                'payment_method': to_save['payment_method'],
+                'vendor': to_save['merchant'],
+                'source': source,
+            })
+            res = add_expenses_bulk(rows)
+            if res is not None:
+                saved = int(res.data or 0)
+                st.session_state['batch_saved_notice'] = {
+                    'success': f"Saved {saved} expenses!", 'skipped': len(to_save) - saved
+                }
+                del st.session_state['batch_parsed']
                 st.rerun()
+
+finish_page_run()
@@ -0,0 +1,70 @@
+import streamlit as st
+from core.finance_queries import get_accounts, get_categories
+from core.statement_importer import FORMATS, detect_format, import_statement
+from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
+
+setup_navigation()
+
+st.title("🏦 Statement Import")
+st.caption("Import a bank statement export (CSV, CAMT.053 XML or MT940) into expenses and income.")
+
+accounts_df = get_accounts()
+expense_cats = get_categories('expense')
+income_cats = get_categories('income')
+
+if accounts_df.empty:
+    st.warning("Add an account in Settings before importing statements.")
+    st.stop()
+
+uploaded = st.file_uploader("Statement File", type=["csv", "xml", "sta", "mt940", "940", "txt"])
+
+if uploaded is not None:
+    detected = detect_format(uploaded.name, uploaded.read(4096))
+    uploaded.seek(0)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = st.selectbox("Format", FORMATS, index=FORMATS.index(detected))
+        account_name = st.selectbox("Account", accounts_df['name'].tolist())
+    with col2:
+        exp_cat_name = st.selectbox("Default Expense Category", expense_cats['name'].tolist() if not expense_cats.empty else [])
+        inc_cat_name = st.selectbox("Default Income Category", income_cats['name'].tolist() if not income_cats.empty else [])
+
+    dayfirst = True
+    if fmt == 'csv':
+        dayfirst = st.checkbox("Dates are day-first (31/12/2024)", value=True)
+
+    if st.button("📥 Import Statement", type="primary"):
+        account_id = int(accounts_df.loc[accounts_df['name'] == account_name, 'id'].iloc[0])
+        exp_cat_id = int(expense_cats.loc[expense_cats['name'] == exp_cat_name, 'id'].iloc[0]) if exp_cat_name else None
+        inc_cat_id = int(income_cats.loc[income_cats['name'] == inc_cat_name, 'id'].iloc[0]) if inc_cat_name else None
+
+        progress = st.progress(0.0, text="Starting import...")
+        total_bytes = max(uploaded.size, 1)
+
+        def on_progress(summary):
+            # Position in the upload is a cheap proxy for progress through the file
+            done = min(uploaded.tell() / total_bytes, 1.0)
+            progress.progress(done, text=f"Imported {summary['rows']:,} rows in {summary['batches']} batches")
+
+        csv_options = {'dayfirst': dayfirst} if fmt == 'csv' else {}
+        summary = import_statement(
+            uploaded, fmt, account_id, exp_cat_id, inc_cat_id,
+            file_name=uploaded.name, on_progress=on_progress, **csv_options
+        )
+
+        if summary['status'] == 'completed':
+            progress.progress(1.0, text="Import complete")
+            st.success(
+                f"Imported {summary['expenses']:,} expenses and {summary['income']:,} income rows "
+                f"in {summary.get('seconds', 0)}s."
+            )
+            if summary['duplicates']:
+                st.caption(f"Skipped {summary['duplicates']:,} lines already imported for this account.")
+            if summary['skipped']:
+                st.caption(f"Skipped {summary['skipped']:,} zero or unreadable lines.")
+        else:
+            st.error(f"Import stopped after {summary['rows']:,} rows: {summary.get('error')}")
+
+finish_page_run()
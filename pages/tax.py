@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-from core.finance_queries import get_expenses, get_income
+from core.finance_queries import get_categories, get_expenses, get_income
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 
 setup_navigation()
 
@@ -13,27 +14,23 @@ with tab1:
     st.header("Tax Payments & Refunds")
     st.caption("Transactions with 'Tax', 'VAT', or 'BTW' in the category name.")
 
-    # Fetch Data
-    expenses = get_expenses()
-    income = get_income()
-
     # Filter for Tax-related items
     # We assume categories containing "Tax", "VAT", "BTW" are tax related.
-    # Case insensitive search.
+    # Case insensitive search; matching category ids are pushed down to the query.
     tax_keywords = ['tax', 'vat', 'btw', 'belasting']
     
-    tax_expenses = pd.DataFrame()
-    if not expenses.empty:
-        # Check if category column exists and has values
-        if 'category' in expenses.columns:
-            mask = expenses['category'].str.contains('|'.join(tax_keywords), case=False, na=False)
-            tax_expenses = expenses[mask]
+    categories = get_categories()
+    tax_category_ids = []
+    if not categories.empty:
+        mask = categories['name'].str.contains('|'.join(tax_keywords), case=False, na=False)
+        tax_category_ids = categories.loc[mask, 'id'].tolist()
 
+    # Fetch Data
+    tax_expenses = pd.DataFrame()
     tax_income = pd.DataFrame()
-    if not income.empty:
-        if 'category' in income.columns:
-            mask = income['category'].str.contains('|'.join(tax_keywords), case=False, na=False)
-            tax_income = income[mask]
+    if tax_category_ids:
+        tax_expenses = get_expenses(category_ids=tax_category_ids, columns=['date', 'amount', 'category', 'description'])
+        tax_income = get_income(category_ids=tax_category_ids, columns=['date', 'amount', 'category', 'source'])
 
     # Metrics
     total_tax_paid = tax_expenses['amount'].sum() if not tax_expenses.empty else 0
@@ -115,3 +112,5 @@ with tab2:
     c3.metric("Net Income", f"€{net_income:,.2f}")
     
     st.warning("⚠️ This is a simplified estimation for the Netherlands. Consult a tax advisor for accurate results.")
+
+finish_page_run()
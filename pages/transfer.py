@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from core.finance_queries import get_accounts, add_transfer
 from core.navigation import setup_navigation
+from core.telemetry import finish_page_run
 import datetime
 
 setup_navigation()
@@ -82,3 +83,5 @@ if not accounts_df.empty:
 
 else:
     st.warning("No accounts found. Please add accounts in the System module first.")
+
+finish_page_run()
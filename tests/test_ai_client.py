@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from core import ai_client
+
+
+def _llm():
+    return GenericFakeChatModel(messages=iter([AIMessage(content="You spent 120 euros on food")]))
+
+
+def test_stream_completion_records_latency():
+    metrics = {}
+    text = "".join(ai_client.stream_completion(_llm(), [HumanMessage(content="hi")], metrics))
+    assert text == "You spent 120 euros on food"
+    assert metrics['ttft_ms'] <= metrics['total_ms']
+    assert metrics['chars'] == len(text) and not metrics['cancelled']
+
+
+def test_closing_the_stream_marks_it_cancelled():
+    metrics = {}
+    stream = ai_client.stream_completion(_llm(), [HumanMessage(content="hi")], metrics)
+    next(stream)
+    stream.close()
+    assert metrics['cancelled'] and metrics['chunks'] == 1
+
+
+def test_gateway_fake_model_extracts_and_streams():
+    from core.extraction import build_extraction_chain, extract_one
+    gateway = ai_client.LLMGateway(fake=True)
+    llm = gateway.llm("extraction")
+    assert llm.model_name == ai_client.SMALL_MODEL
+    result = extract_one(build_extraction_chain(llm), "You paid €12.50 at Albert Heijn", ["Food"], ["Bank"])
+    assert result['amount'] == 12.5 and result['merchant'] == "Albert Heijn"
+
+    metrics = {}
+    text = "".join(ai_client.stream_completion(gateway.llm("chat"), [HumanMessage(content="hi")], metrics))
+    assert text.startswith("(offline)")
+    calls = gateway.metrics_frame()
+    assert calls['task'].tolist() == ["extraction", "chat"] and calls['streamed'].tolist() == [False, True]
+    assert gateway.client(ai_client.SMALL_MODEL) is gateway.client(ai_client.SMALL_MODEL)
+
+
+def test_gateway_coalesces_identical_inflight_requests():
+    import threading
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class SlowModel(FakeListChatModel):
+        def _call(self, *args, **kwargs):
+            import time
+            time.sleep(0.2)
+            return super()._call(*args, **kwargs)
+
+    gateway = ai_client.LLMGateway()
+    gateway._clients["slow"] = SlowModel(responses=["first", "second"])
+    llm = gateway.llm("chat", model="slow")
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(llm.invoke("same question").content)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert answers == ["first"] * 3
+    assert gateway.metrics_frame()['coalesced'].sum() == 2
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = ai_client.TokenBucket(rate_per_minute=600, capacity=2)  # 10 per second
+    assert bucket.acquire() == 0.0 and bucket.acquire() == 0.0
+    assert bucket.acquire() > 0.05
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from core import analytics
+
+
+def _frame(rows):
+    return analytics.normalize_transactions(pd.DataFrame(rows))
+
+
+expenses = _frame([
+    {"date": "2025-01-05", "amount": 10.0, "amount_eur": None, "category": "Food", "vendor": "Albert Heijn", "description": "groceries"},
+    {"date": "2025-02-10", "amount": 30.0, "amount_eur": 30.0, "category": "Rent", "vendor": None, "description": "February rent payment"},
+    {"date": "2025-02-11", "amount": 5.0, "amount_eur": 5.0, "category": "Food", "vendor": "Albert Heijn", "description": "snacks"},
+])
+income = _frame([
+    {"date": "2025-02-01", "amount": 100.0, "amount_eur": 100.0, "source": "Salary"},
+])
+
+
+def test_monthly_cash_flow_fills_empty_months():
+    cf = analytics.monthly_cash_flow(expenses, income, months=3, end_date="2025-02-28")
+    assert cf['Month'].tolist() == ["Dec 2024", "Jan 2025", "Feb 2025"]
+    assert cf['Expenses'].tolist() == [0.0, 10.0, 35.0]
+    assert cf['Net'].tolist() == [0.0, -10.0, 65.0]
+
+
+def test_period_totals_and_savings_rate():
+    totals = analytics.period_totals(expenses, income)
+    assert totals['expenses'] == 45.0
+    assert round(totals['savings_rate'], 6) == 55.0
+
+
+def test_top_merchants_falls_back_to_description():
+    top = analytics.top_merchants(expenses, n=2)
+    assert top['merchant_display'].tolist() == ["February rent paymen", "Albert Heijn"]
+
+
+def test_budget_vs_actual_with_categories():
+    budgets = pd.DataFrame([{"category": "Food", "budget_amount": 20.0}])
+    status = analytics.budget_vs_actual(budgets, expenses, 1.0, categories=["Food", "Rent", "Travel"])
+    status = status.set_index('category')
+    assert list(status.index) == ["Food", "Rent"]
+    assert status.loc["Food", 'progress'] == 75.0
+    assert status.loc["Rent", 'progress'] == 100.0
+
+
+def test_net_worth_converts_balances():
+    accounts = pd.DataFrame([{"balance": 100.0, "currency": "USD"}, {"balance": 50.0, "currency": "EUR"}])
+    assert analytics.net_worth(accounts, {"USD": 0.5, "EUR": 1.0}, 10.0) == 110.0
+
+
+def test_memo_is_keyed_by_query_not_frame_contents(monkeypatch):
+    user = type("User", (), {"id": "memo-user"})()
+    monkeypatch.setattr(analytics.st, "session_state", {"user": user})
+    calls = []
+
+    @analytics.memoized
+    def total(df):
+        calls.append(1)
+        return float(df['amount_eur'].sum())
+
+    assert total(expenses, memo_key=('expenses', '2025-02')) == 45.0
+    assert total(expenses.iloc[::-1], memo_key=('expenses', '2025-02')) == 45.0
+    assert total(income, memo_key=('income', '2025-02')) == 100.0
+    assert total(income) == 100.0  # no memo_key: always computed
+    assert len(calls) == 3
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime
+import pandas as pd
+from core import assistant_context
+from core.cache import DataCache
+
+TODAY = datetime.date(2025, 3, 31)
+
+
+def test_refresh_fetches_only_new_rows_after_a_write(monkeypatch):
+    cache = DataCache()
+    calls = []
+    expenses = pd.DataFrame([
+        {"id": 1, "date": "2025-03-02", "amount": 10.0, "amount_eur": 10.0, "description": "lunch", "category": "Food"},
+    ])
+    new_rows = pd.DataFrame([
+        {"id": 2, "date": "2025-03-30", "amount": 5.0, "amount_eur": None, "description": "coffee", "category": "Food"},
+    ])
+    monkeypatch.setattr(assistant_context, "get_data_cache", lambda: cache)
+    monkeypatch.setattr(assistant_context, "get_expenses", lambda *a, **k: calls.append("expenses") or expenses)
+    monkeypatch.setattr(assistant_context, "get_income", lambda *a, **k: calls.append("income") or pd.DataFrame())
+    monkeypatch.setattr(assistant_context, "get_accounts", lambda: calls.append("accounts") or pd.DataFrame())
+    monkeypatch.setattr(assistant_context, "iter_rows_after",
+                        lambda table, after_id, *a, **k: calls.append((table, after_id)) or iter([new_rows]))
+
+    ctx = assistant_context.AssistantContext()
+    ctx.refresh("u1", TODAY)
+    first = ctx.summary()
+    ctx.refresh("u1", TODAY)
+    assert ctx.summary() is first
+    assert calls == ["expenses", "income", "accounts"]
+
+    cache.bump("u1", "expenses")
+    ctx.refresh("u1", TODAY)
+    assert calls[-1] == ("expenses", 1)
+    assert "Total Expenses: 15.00 EUR" in ctx.summary()
+
+    # Next day the window slides past the 2 March row without any fetch
+    ctx.refresh("u1", TODAY + datetime.timedelta(days=2))
+    assert len(calls) == 4
+    assert "Total Expenses: 5.00 EUR" in ctx.summary()
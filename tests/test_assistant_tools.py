@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import pandas as pd
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+from core import assistant_tools
+
+
+class ScriptedLLM:
+    """Streams a tool call on the first turn and a text answer once a tool result is present."""
+
+    def bind_tools(self, tools):
+        return self
+
+    def stream(self, messages):
+        if not any(isinstance(m, ToolMessage) for m in messages):
+            yield AIMessageChunk(content="", tool_call_chunks=[{
+                "name": "spend_by_category", "args": '{"start_date": "2023-01-01", ', "id": "call_1", "index": 0}])
+            yield AIMessageChunk(content="", tool_call_chunks=[{
+                "name": None, "args": '"end_date": "2023-12-31"}', "id": None, "index": 0}])
+        else:
+            yield AIMessageChunk(content="You spent ")
+            yield AIMessageChunk(content="42.00 EUR.")
+
+
+def test_tool_round_trip_streams_final_answer(monkeypatch):
+    expenses = pd.DataFrame([
+        {"date": "2023-05-01", "amount": 30.0, "amount_eur": 30.0, "category": "Food"},
+        {"date": "2023-06-01", "amount": 12.0, "amount_eur": None, "category": "Transport"},
+    ])
+    seen = []
+    monkeypatch.setattr(assistant_tools, "get_expenses", lambda start, end, **k: seen.append((str(start), str(end))) or expenses)
+
+    messages = [HumanMessage(content="How much did I spend in 2023?")]
+    metrics = {}
+    text = "".join(assistant_tools.stream_with_tools(ScriptedLLM(), messages, metrics))
+
+    assert text == "You spent 42.00 EUR."
+    assert seen == [("2023-01-01", "2023-12-31")]
+    result = json.loads(messages[-1].content)
+    assert result['total'] == 42.0 and result['categories'][0] == {"category": "Food", "total": 30.0}
+    assert metrics['tool_calls'] == 1 and not metrics['cancelled']
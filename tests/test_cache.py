@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from core.cache import DataCache
+
+
+def test_write_invalidates_dependent_entries_only():
+    cache = DataCache()
+    df = pd.DataFrame({"amount": [1.0, 2.0]})
+    cache.put("u1", "expenses", cache.versions("u1", ("expenses",)), df)
+    cache.put("u1", "budgets", cache.versions("u1", ("budgets",)), df)
+
+    cache.bump("u1", "expenses")
+
+    assert cache.get("u1", "expenses", ("expenses",)) is None
+    assert cache.get("u1", "budgets", ("budgets",)) is df
+    # Other users are unaffected by u1's writes
+    cache.put("u2", "expenses", cache.versions("u2", ("expenses",)), df)
+    assert cache.get("u2", "expenses", ("expenses",)) is df
+
+
+def test_ttl_expiry():
+    cache = DataCache(ttl=0)
+    cache.put("u1", "k", (), pd.DataFrame({"a": [1]}))
+    assert cache.get("u1", "k", ()) is None
+
+
+def test_byte_budget_evicts_least_recently_used():
+    df = pd.DataFrame({"a": range(1000)})
+    size = int(df.memory_usage(deep=True).sum())
+    cache = DataCache(max_bytes=size * 2)
+    cache.put("u1", "a", (), df)
+    cache.put("u1", "b", (), df)
+    cache.get("u1", "a", ())
+    cache.put("u1", "c", (), df)
+
+    assert cache.get("u1", "b", ()) is None
+    assert cache.get("u1", "a", ()) is df
+    assert cache.stats()["bytes"] <= size * 2
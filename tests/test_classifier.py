@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+import pandas as pd
+from core import classifier
+
+
+def _index():
+    index = classifier.MerchantIndex()
+    index.learn(pd.DataFrame([
+        {"id": 1, "vendor": "ALBERT HEIJN 1234 B.V.", "description": "groceries", "category_id": 10, "account_id": 1},
+        {"id": 2, "vendor": "Albert Heijn", "description": "weekly shop", "category_id": 10, "account_id": 1},
+        {"id": 3, "vendor": "Albert Heijn", "description": "flowers", "category_id": 11, "account_id": 2},
+        {"id": 4, "vendor": "NS Reizigers", "description": "train ticket", "category_id": 20, "account_id": 1},
+    ]))
+    return index
+
+
+def test_vendor_history_wins_by_frequency():
+    suggestion = _index().suggest("Albert Heijn XL Amsterdam")
+    assert suggestion['category_id'] == 10 and suggestion['account_id'] == 1
+    assert suggestion['category_confidence'] >= classifier.SUGGESTION_MIN_CONFIDENCE
+
+
+def test_description_tokens_and_incremental_learning():
+    index = _index()
+    assert index.suggest(None, "train ticket to Utrecht")['category_id'] == 20
+    assert index.suggest("Bolt")['category_id'] is None
+    index.learn(pd.DataFrame([{"id": 5, "vendor": "Bolt", "description": "ride", "category_id": 20, "account_id": 2}]))
+    assert index.last_id == 5
+    assert index.suggest("bolt.eu")['category_id'] == 20
+
+
+def test_concurrent_refreshes_learn_each_row_once(monkeypatch):
+    user = type("User", (), {"id": "refresh-race"})()
+    monkeypatch.setattr(classifier.st, "session_state", {"user": user})
+    started = threading.Barrier(2)
+
+    def rows_after(table, after_id, columns):
+        time.sleep(0.05)  # both reruns are inside the refresh before either finishes
+        if after_id == 0:
+            yield pd.DataFrame([{"id": 1, "vendor": "Bolt", "description": "ride", "category_id": 20, "account_id": 2}])
+
+    monkeypatch.setattr(classifier, "iter_rows_after", rows_after)
+
+    def rerun():
+        started.wait()
+        classifier.get_merchant_index()
+
+    threads = [threading.Thread(target=rerun) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert classifier.get_merchant_index().vendor_categories["bolt"][20] == 1
@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+from langchain_core.runnables import RunnableLambda
+from core import extraction
+
+
+def _fake_llm(prompt):
+    text = prompt.to_string()
+    if "broken" in text:
+        return "not json"
+    return json.dumps({"date": "2025-03-01", "amount": 12.5, "merchant": "Uber", "category": "Transport"})
+
+
+def test_split_snippets_lines_and_blocks():
+    assert extraction.split_snippets("a\nb\n\n") == ["a", "b"]
+    assert extraction.split_snippets("a\nb\n\nc") == ["a\nb", "c"]
+
+
+def test_extract_batch_keeps_order_and_reports_failures():
+    chain = extraction.build_extraction_chain(RunnableLambda(_fake_llm))
+    snippets = ["Uber 12.50", "broken", "Uber again"]
+    results = extraction.extract_batch(chain, snippets, ["Transport"], ["Bank"], max_concurrency=2)
+    df = extraction.results_to_frame(snippets, results)
+    assert df['save'].tolist() == [True, False, True]
+    assert df['merchant'].tolist()[::2] == ["Uber", "Uber"]
+    assert df['error'].notna().tolist() == [False, True, False]
+
+
+def test_batch_uses_cache_and_dedupes_repeats():
+    from core.llm_cache import LLMCache
+    calls = []
+    chain = extraction.build_extraction_chain(RunnableLambda(lambda p: calls.append(1) or _fake_llm(p)))
+    cache = LLMCache(":memory:", max_entries=10)
+    snippets = ["Uber 12.50", "Uber  12.50", "Taxi 8"]
+    extraction.extract_batch(chain, snippets, ["Transport"], ["Bank"], cache=cache, model="m")
+    assert len(calls) == 2  # whitespace-normalized repeat is sent once
+    extraction.extract_batch(chain, snippets, ["Transport"], ["Bank"], cache=cache, model="m")
+    assert len(calls) == 2
+    extraction.extract_batch(chain, snippets[:1], ["Transport"], ["Bank"], cache=cache, model="other")
+    assert len(calls) == 3
+    assert cache.stats()["entries"] == 3
+
+
+def test_cache_evicts_least_recently_used():
+    from core.llm_cache import LLMCache
+    cache = LLMCache(":memory:", max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
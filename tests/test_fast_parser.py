@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime
+from core import fast_parser
+
+TODAY = datetime.date(2025, 3, 10)
+
+
+def test_bank_templates_are_confident():
+    upi = fast_parser.fast_parse("Rs.1,500.00 debited from a/c **5678 on 15-01-25 to VPA landlord@okhdfc (UPI Ref No 3)", TODAY)
+    assert (upi['amount'], upi['currency'], upi['date'], upi['merchant']) == (1500.0, 'INR', '2025-01-15', 'landlord@okhdfc')
+    assert upi['parser'] == 'rules:upi_debit' and upi['confidence'] >= fast_parser.FAST_PATH_MIN_CONFIDENCE
+
+    nl = fast_parser.fast_parse("Betaling van € 1.045,50 aan Jumbo op 02-11-2024", TODAY)
+    assert (nl['amount'], nl['merchant'], nl['date']) == (1045.5, 'Jumbo', '2024-11-02')
+
+
+def test_registered_template_and_low_confidence_fallback():
+    fast_parser.register_template('test_bank', r'TESTBANK: (?P<amount>[\d.]+) spent at (?P<merchant>\w+)', currency='GBP')
+    try:
+        parsed = fast_parser.fast_parse("TESTBANK: 9.99 spent at Tesco", TODAY)
+        assert (parsed['parser'], parsed['currency'], parsed['amount']) == ('rules:test_bank', 'GBP', 9.99)
+    finally:
+        fast_parser.TEMPLATES.pop()
+
+    vague = fast_parser.fast_parse("Bought groceries for about 30 euros", TODAY)
+    assert vague['confidence'] < fast_parser.FAST_PATH_MIN_CONFIDENCE
+    assert fast_parser.fast_parse("Dinner with friends", TODAY) is None
+
+
+def test_day_month_name_year_dates_and_unread_dates():
+    card = fast_parser.fast_parse("Your ICICI Bank Card XX4321 has been used for INR 2,100.00 at BIGBASKET on 03-Feb-25", TODAY)
+    assert (card['parser'], card['amount'], card['merchant'], card['date']) == ('rules:in_card_sms', 2100.0, 'BIGBASKET', '2025-02-03')
+    assert card['confidence'] >= fast_parser.FAST_PATH_MIN_CONFIDENCE
+
+    # A stated date the rules cannot read sends the text to the LLM instead of booking it today
+    unread = fast_parser.fast_parse("Your ICICI Bank Card XX4321 has been used for INR 2,100.00 at BIGBASKET on 3rd of Feb", TODAY)
+    assert unread['confidence'] < fast_parser.FAST_PATH_MIN_CONFIDENCE
+
+
+def test_credits_and_otps_are_not_expenses():
+    assert fast_parser.fast_parse("Rs.500.00 credited to a/c **1234 on 24-10-24 from VPA john@icici", TODAY) is None
+    assert fast_parser.fast_parse("Your OTP for transaction of Rs 500 at AMAZON is 123456", TODAY) is None
+    assert fast_parser.fast_parse("Refund of €12.50 from Bol.com processed", TODAY) is None
+
+    # Generic matches need a debit verb to skip the LLM
+    no_verb = fast_parser.fast_parse("INR 500.00 at AMAZON on 24-10-24", TODAY)
+    assert no_verb['parser'] == 'rules:generic' and no_verb['confidence'] < fast_parser.FAST_PATH_MIN_CONFIDENCE
+    debit = fast_parser.fast_parse("INR 500.00 spent at AMAZON on 24-10-24", TODAY)
+    assert debit['confidence'] >= fast_parser.FAST_PATH_MIN_CONFIDENCE
@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+import pytest
+from core.finance_queries import BULK_COLUMNS, prepare_bulk_transactions
+
+
+def test_prepare_bulk_transactions_drops_invalid_rows_and_converts():
+    df = pd.DataFrame({
+        "date": ["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04", "not a date", "2025-03-06"],
+        "amount": ["12.50", None, 0, -3, 5, 8],
+        "currency": ["usd", "EUR", "EUR", "EUR", "EUR", None],
+        "category_id": [1, 1, 1, 1, 1, None],
+        "account_id": [7, 7, 7, 7, 7, "7"],
+    })
+    rows, dropped = prepare_bulk_transactions(df, "expenses", rates={"USD": 0.9, "EUR": 1.0})
+
+    # Missing, zero and negative amounts and unreadable dates are dropped
+    assert dropped == 4
+    assert list(rows.columns) == BULK_COLUMNS["expenses"]
+    assert list(rows['date']) == ["2025-03-01", "2025-03-06"]
+    assert list(rows['currency']) == ["USD", "EUR"]
+    assert list(rows['amount_eur']) == pytest.approx([12.5 * 0.9, 8.0])
+    assert list(rows['account_id']) == [7, 7]
+    # A missing category is not invalid: the row is kept uncategorized
+    assert rows['category_id'].iloc[0] == 1 and pd.isna(rows['category_id'].iloc[1])
+    assert list(rows['source']) == ["manual", "manual"]
+
+
+def test_prepare_bulk_transactions_needs_an_account_and_handles_empty_input():
+    df = pd.DataFrame({"date": ["2025-03-01"], "amount": [5.0], "category_id": [1], "account_id": [None]})
+    rows, dropped = prepare_bulk_transactions(df, "income", rates={})
+    assert rows.empty and dropped == 1
+
+    rows, dropped = prepare_bulk_transactions(pd.DataFrame(), "income", rates={})
+    assert list(rows.columns) == BULK_COLUMNS["income"] and dropped == 0
@@ -0,0 +1,133 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime
+import io
+import pandas as pd
+import pytest
+from postgrest.exceptions import APIError
+from core import finance_queries
+from core.local_storage import LocalClient, LocalDatabase
+
+
+@pytest.fixture
+def local(monkeypatch):
+    db = LocalDatabase(":memory:")
+    anon = LocalClient(db)
+    auth = anon.auth.sign_up({"email": "a@example.com", "password": "pw", "options": {"data": {"full_name": "A"}}})
+    client = LocalClient.from_token(db, auth.session.access_token)
+    monkeypatch.setattr(finance_queries, "get_authenticated_client", lambda: client)
+    monkeypatch.setattr(finance_queries.st, "session_state", {"user": auth.user})
+    return client
+
+
+def test_finance_queries_run_against_the_local_backend(local):
+    food = local.table("categories").insert({"name": "Food", "type": "expense"}).execute().data[0]['id']
+    bank = local.table("accounts").insert({"name": "Bank", "type": "bank", "balance": 100.0, "currency": "USD"}).execute().data[0]['id']
+
+    finance_queries.add_expense(datetime.date(2025, 3, 1), 10.0, food, bank, "lunch", "card", currency="EUR")
+    rows = pd.DataFrame({"date": ["2025-03-02", "2025-03-03", "bad"], "amount": [5.0, 5.0, 1.0],
+                         "currency": "EUR", "account_id": bank, "category_id": food})
+    assert finance_queries.add_expenses_bulk(rows, rates={"EUR": 1.0}).data == 2
+
+    expenses = finance_queries.get_expenses(datetime.date(2025, 3, 2))
+    assert list(expenses['date'].dt.day) == [3, 2]
+    assert set(expenses['category']) == {"Food"} and set(expenses['account']) == {"Bank"}
+    # 20 EUR left the USD account at 0.92 EUR per USD
+    balance = finance_queries.get_accounts()['balance'].iloc[0]
+    assert balance == pytest.approx(100 - 20 / 0.92)
+    assert finance_queries.get_user_profile()['full_name'] == "A"
+
+
+def test_keyset_pages_and_user_scoping(local, monkeypatch):
+    bank = local.table("accounts").insert({"name": "Bank", "type": "bank", "balance": 0.0}).execute().data[0]['id']
+    local.rpc("record_income_bulk", {"p_rows": [
+        {"date": f"2025-01-{day:02d}", "amount": 1.0, "account_id": bank} for day in range(1, 8)
+    ]}).execute()
+
+    chunks = list(finance_queries.iter_transactions("income", columns=['amount'], page_size=3))
+    assert [len(c) for c in chunks] == [3, 3, 1]
+
+    stranger = LocalClient(local.db, "someone-else")
+    assert stranger.table("income").select("*").execute().data == []
+    with pytest.raises(APIError):
+        stranger.table("accounts").insert({"name": "Mine", "type": "bank", "user_id": local.user_id}).execute()
+    assert stranger.rpc("adjust_account_balance", {"p_account_id": bank, "p_amount_eur_delta": 5}).execute().data is None
+
+
+def test_admin_system_stats_requires_admin_role(local):
+    food = local.table("categories").insert({"name": "Food", "type": "expense"}).execute().data[0]['id']
+    local.table("expenses").insert({"date": "2025-03-01", "amount": 5.0, "category_id": food}).execute()
+    with pytest.raises(APIError):
+        local.rpc("admin_system_stats", {}).execute()
+    with pytest.raises(APIError):  # users cannot promote themselves
+        local.table("profiles").update({"role": "admin"}).eq("id", local.user_id).execute()
+
+    admin_auth = LocalClient(local.db).auth.sign_up({"email": "admin@lifeos.com", "password": "pw"})
+    admin = LocalClient.from_token(local.db, admin_auth.session.access_token)
+    with pytest.raises(APIError):  # the email alone grants nothing
+        admin.rpc("admin_system_stats", {}).execute()
+    local.db.set_role("admin@lifeos.com", "admin")
+    stats = admin.rpc("admin_system_stats", {"p_top_n": 5}).execute().data
+    assert stats['users']['total'] == 2 and stats['users']['active_30d'] == 1
+    assert stats['tables']['expenses'] == 1
+    assert stats['largest_ledgers'][0]['user_id'] == local.user_id and stats['largest_ledgers'][0]['total_rows'] == 1
+
+
+def test_keyset_page_seeks_the_composite_index(local):
+    query = (local.table("expenses").select("*, categories(name), accounts(name)")
+             .lte("date", "2025-03-01").or_("date.lt.2025-03-01,and(date.eq.2025-03-01,id.lt.50)")
+             .order("date", desc=True).order("id", desc=True).limit(1000))
+    sql, params = query.select_sql()
+    with local.db.transaction() as conn:
+        plan = " | ".join(row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "idx_expenses_user_date_id (user_id=? AND date<?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_save_and_copy_budgets_upsert_one_row_per_category_and_month(local):
+    food, rent = (local.table("categories").insert({"name": n, "type": "expense"}).execute().data[0]['id']
+                  for n in ("Food", "Rent"))
+    finance_queries.save_budgets("2025-01", {food: 100.0, rent: 800.0})
+    finance_queries.save_budgets("2025-01", {food: 150.0})
+    finance_queries.save_budgets("2025-02", {food: 90.0})
+
+    copied = finance_queries.copy_budgets("2025-01", months=2)
+    assert len(copied.data) == 3  # Feb food was already set and is kept
+
+    rows = local.table("budgets").select("month, category_id, budget_amount").execute().data
+    budgets = {(r['month'], r['category_id']): r['budget_amount'] for r in rows}
+    assert len(rows) == len(budgets) == 6
+    assert budgets[("2025-01", food)] == 150.0 and budgets[("2025-02", food)] == 90.0
+    assert budgets[("2025-03", food)] == 150.0 and budgets[("2025-03", rent)] == 800.0
+
+    finance_queries.copy_budgets("2025-01", months=1, overwrite=True)
+    assert local.table("budgets").select("budget_amount").eq("month", "2025-02").eq("category_id", food).single().execute().data['budget_amount'] == 150.0
+
+
+def test_export_uses_the_client_bound_in_the_script_run(local, monkeypatch):
+    local.table("expenses").insert({"date": "2025-03-01", "amount": 5.0, "description": "lunch"}).execute()
+    # Download callables run without session state, where only an anonymous client is available
+    monkeypatch.setattr(finance_queries, "get_authenticated_client", lambda: LocalClient(local.db))
+    assert finance_queries.export_transactions_csv("expenses") == ""
+    csv = finance_queries.export_transactions_csv("expenses", client=local)
+    assert "lunch" in csv and len(csv.strip().splitlines()) == 2
+
+
+def test_reimporting_a_statement_skips_stored_rows(local):
+    from core.statement_importer import import_statement
+    bank = local.table("accounts").insert({"name": "Bank", "type": "bank", "balance": 0.0}).execute().data[0]['id']
+    statement = ("Date,Amount,Description\n"
+                 "2025-03-01,-4.50,Coffee\n2025-03-01,-4.50,Coffee\n2025-03-02,1200.00,Salary\n2025-03-03,0,Fee\n")
+
+    # One row per batch: the second coffee must not match the first one this import just wrote
+    first = import_statement(io.BytesIO(statement.encode()), "csv", bank, batch_size=1)
+    assert (first['expenses'], first['income'], first['duplicates'], first['skipped']) == (2, 1, 0, 1)
+
+    again = import_statement(io.BytesIO((statement + "2025-03-04,-9.00,Lunch\n").encode()), "csv", bank)
+    assert (again['expenses'], again['income'], again['duplicates'], again['skipped']) == (1, 0, 3, 1)
+    assert len(local.table("expenses").select("id").execute().data) == 3
+
+    # Both stored coffees are matched, one for one, across batch boundaries
+    batched = import_statement(io.BytesIO(statement.encode()), "csv", bank, batch_size=1)
+    assert (batched['expenses'], batched['income'], batched['duplicates']) == (0, 0, 3)
@@ -0,0 +1,30 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import pandas as pd
+from core import statement_importer as si
+
+
+def test_csv_with_direction_column_and_decimal_comma():
+    data = "Datum;Naam / Omschrijving;Bedrag (EUR);Af Bij\n20240105;Albert Heijn;12,50;Af\n20240106;Employer;1.234,56;Bij\n"
+    batch = next(si.iter_statement_batches(io.BytesIO(data.encode()), 'csv'))
+    assert batch['amount'].tolist() == [-12.5, 1234.56]
+    assert batch['date'].tolist() == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-06")]
+
+
+def test_mt940_splits_into_expenses_and_income():
+    data = (b":20:STMT\n:60F:C240101EUR1000,00\n"
+            b":61:2401050105D12,50NTRFNONREF\n:86:/NAME/Albert Heijn/REMI/groceries\n"
+            b":61:240106C1234,56NTRFNONREF\n:86:/NAME/Employer/\n:62F:C240106EUR2222,06\n")
+    batch = next(si.iter_statement_batches(io.BytesIO(data), 'mt940'))
+    expenses, income = si.split_statement_batch(batch, account_id=1, expense_category_id=2, income_category_id=3)
+    assert expenses['vendor'].tolist() == ["Albert Heijn"]
+    assert expenses['amount'].tolist() == [12.5]
+    assert income['source'].tolist() == ["Employer"]
+
+
+def test_iso_dates_are_not_read_day_first():
+    data = "Date,Amount,Description\n2024-01-05,-10.00,coffee\n2024-01-20,-5.00,bread\n05/02/2024,-1.00,dayfirst\n"
+    batch = next(si.iter_statement_batches(io.BytesIO(data.encode()), 'csv', dayfirst=True))
+    assert batch['date'].tolist() == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-20"), pd.Timestamp("2024-02-05")]
@@ -0,0 +1,35 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime
+import pytest
+from benchmarks.synthetic_ledger import RATES_TO_EUR, generate_ledger, load_ledger
+from core.local_storage import LocalClient, LocalDatabase
+
+END = datetime.date(2025, 6, 30)
+
+
+def test_generation_is_deterministic_and_sized():
+    first = generate_ledger(2000, years=2, end_date=END, seed=7)
+    second = generate_ledger(2000, years=2, end_date=END, seed=7)
+    assert first['expenses'].equals(second['expenses'])
+    assert sum(len(first[t]) for t in ('expenses', 'income', 'investments')) == 2000
+    assert first['expenses']['date'].min().date() > datetime.date(2023, 6, 30)
+    assert set(first['expenses']['currency']) <= set(RATES_TO_EUR)
+    # 24 months of budgets for every expense category
+    assert first['budgets']['month'].nunique() == 24
+
+
+def test_loaded_balances_match_the_last_snapshot():
+    db = LocalDatabase(":memory:")
+    auth = LocalClient(db).auth.sign_up({"email": "bench@example.com", "password": "pw"})
+    client = LocalClient.from_token(db, auth.session.access_token)
+    ledger = generate_ledger(1000, years=1, end_date=END, seed=1)
+
+    written = load_ledger(client, ledger, batch_size=300)
+    assert written['expenses'] == len(ledger['expenses']) and written['budgets'] == len(ledger['budgets'])
+
+    balances = {row['name']: row['balance'] for row in client.table("accounts").select("name, balance").execute().data}
+    last = ledger['balance_history'].groupby('account')['balance'].last()
+    for name, balance in balances.items():
+        assert balance == pytest.approx(last[name], abs=0.05)
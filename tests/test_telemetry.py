@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import pytest
+from postgrest.exceptions import APIError
+from core import finance_queries
+from core.local_storage import LocalClient, LocalDatabase
+from core.telemetry import Telemetry, _payload_size, traced
+
+
+def test_traced_client_records_each_request(monkeypatch):
+    db = LocalDatabase(":memory:")
+    auth = LocalClient(db).auth.sign_up({"email": "a@example.com", "password": "pw"})
+    telemetry = Telemetry()
+    client = traced(LocalClient.from_token(db, auth.session.access_token), telemetry)
+    monkeypatch.setattr(finance_queries, "get_authenticated_client", lambda: client)
+    monkeypatch.setattr(finance_queries.st, "session_state", {"user": auth.user})
+
+    client.table("accounts").insert({"name": "Bank", "type": "bank", "balance": 1.0}).execute()
+    finance_queries.get_categories.__wrapped__("expense")
+    with pytest.raises(APIError):
+        client.rpc("missing_function", {"p_id": 1}).execute()
+
+    events = telemetry.events('query')
+    assert list(events['operation']) == ['insert', 'select', 'rpc']
+    assert events['name'].iloc[1] == "get_categories:categories"
+    assert events['filters'].iloc[1] == "select(*).eq(type, expense)"
+    assert events['rows'].iloc[0] == 1 and events['bytes'].iloc[0] > 0
+    assert events['error'].iloc[2].startswith("APIError")
+
+
+def test_percentiles_histogram_and_export():
+    telemetry = Telemetry(window=10)
+    for ms in range(1, 101):
+        telemetry.record('query', 'get_expenses:expenses', float(ms), rows=2)
+    telemetry.record('page', 'app.py', 300.0, queries=5)
+
+    stats = telemetry.percentiles().set_index('name')
+    # Percentiles cover the rolling window (last 10), totals the whole lifetime
+    assert stats.loc['get_expenses:expenses', 'p50_ms'] == pytest.approx(95.5)
+    assert stats.loc['get_expenses:expenses', 'count'] == 100
+    assert stats.loc['get_expenses:expenses', 'avg_rows'] == 2
+    histogram = telemetry.histogram('query', 'get_expenses:expenses').set_index('bucket')['count']
+    assert histogram['≤5 ms'] == 5 and histogram.sum() == 100
+
+    exported = json.loads(telemetry.export_json())
+    assert len(exported['events']) == 101 and exported['histograms']['page:app.py']['500'] == 1
+
+
+def test_payload_size_counts_every_row():
+    rows = [{"id": 1, "description": "a"}, {"id": 2, "description": "a much longer description €"}]
+    assert _payload_size(rows) == len('[{"id":1,"description":"a"},{"id":2,"description":"a much longer description €"}]'.encode())
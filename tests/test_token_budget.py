@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.messages import AIMessage, HumanMessage
+from core import token_budget
+
+
+def _history(turns):
+    history = []
+    for i in range(turns):
+        history.append(HumanMessage(content=f"Question {i}: " + "how much did I spend on groceries " * 20))
+        history.append(AIMessage(content=f"Answer {i}: " + "you spent about 120 euros last month " * 20))
+    return history
+
+
+def test_long_history_stays_under_ceiling_and_is_folded():
+    memory = token_budget.ChatMemory()
+    folded_batches = []
+
+    def summarize(previous, messages):
+        folded_batches.append(len(messages))
+        return f"{previous} [{len(messages)} turns]".strip()
+
+    history = _history(100)
+    ceiling = 3000
+    messages, usage = memory.build("You are an assistant.", history, summarize, max_tokens=ceiling)
+    assert usage['prompt_tokens'] <= ceiling - token_budget.RESPONSE_RESERVE_TOKENS
+    assert messages[-1] is history[-1]
+    assert folded_batches == [usage['folded_messages']] and memory.summarized == usage['folded_messages']
+    assert "Summary of the earlier conversation" in messages[0].content
+
+    # The next turn fits after the low-water trim, so no new summarization call is made
+    history.append(HumanMessage(content="And rent?"))
+    _, usage = memory.build("You are an assistant.", history, summarize, max_tokens=ceiling)
+    assert len(folded_batches) == 1 and usage['folded_messages'] == 0
+
+
+def test_oversized_question_is_truncated():
+    memory = token_budget.ChatMemory()
+    huge = HumanMessage(content="\n".join(["line with numbers 12345"] * 2000))
+    messages, usage = memory.build("sys", [huge], max_tokens=2000)
+    assert usage['prompt_tokens'] <= 2000 - token_budget.RESPONSE_RESERVE_TOKENS
+    assert messages[-1].content.endswith("[...truncated]")